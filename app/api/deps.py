@@ -1,6 +1,7 @@
-from typing import Generator, Optional
+import hashlib
+from typing import Any, Optional
 
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
@@ -11,30 +12,81 @@ from app.schemas.token import TokenPayload
 from app.core import security
 from app.core.config import settings
 from app.core.jwt_key_manager import jwt_key_manager
-from app.db.session import SessionLocal
+# get_db は app.db.session のものをそのまま公開します（セッションの作成元を1か所にするため）。
+from app.db.session import Database, get_database, get_db
+from app.services.auth_cache import active_users, token_cache
+
+# キーセットページネーションで次のページのカーソルを返すレスポンスヘッダー
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# 1行1件の JSON を逐次返すレスポンスのメディアタイプ
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def make_etag(*parts: Any) -> str:
+    """変更検知用の値から弱い ETag を作ります。"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match ヘッダーが etag に一致するかどうかを返します（弱い比較）。"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+def not_modified(request: Request, response: Response, etag: str, *, max_age: int = 0) -> Optional[Response]:
+    """
+    ETag と Cache-Control をレスポンスに設定します。
+    If-None-Match が一致した場合は、そのまま返せる 304 のレスポンスを返します。
+    """
+    headers = {"ETag": etag, "Cache-Control": f"max-age={max_age}" if max_age else "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+def event_etag(event_id: int, version: int) -> str:
+    """予約の ETag。版番号から作る強い ETag で、PUT の If-Match と比較します。"""
+    return f'"{event_id}.{version}"'
+
+def if_match_version(if_match: Optional[str], event_id: int) -> Optional[int]:
+    """
+    If-Match ヘッダーから、更新の前提とする版番号を取り出します。
+    ヘッダーがない場合と "*" の場合は None（版を問わない）を返します。
+    この予約の ETag が含まれていない場合（弱い ETag を含む）は 412 を送出します。
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    prefix = f'"{event_id}.'
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit():
+            return int(tag[len(prefix):-1])
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="If-Match には GET で取得した予約の ETag を指定してください。",
+    )
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login/access-token"
 )
 
-def get_db() -> Generator:
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
-
 async def get_current_user(
     request: Request,
-    db: Session = Depends(get_db), 
+    db: Database = Depends(get_database),
     token: str = Depends(reusable_oauth2)
 ) -> models.User:
     """
     Get the current user from the JWT token in the Authorization header.
     
+    Verified token payloads and active users are cached in-process
+    (see app/services/auth_cache.py), so a repeated token skips both the
+    signature check and the user query.
+    
     Args:
         request: The FastAPI request object
-        db: Database session
+        db: Database handle
         token: JWT token from the Authorization header
         
     Returns:
@@ -45,11 +97,15 @@ async def get_current_user(
     """
     try:
         # Verify the token using our security module
-        payload = security.verify_jwt_token(token)
+        payload = token_cache.verify(token, security.verify_jwt_token)
         token_data = TokenPayload(**payload)
         
-        # Get the user from the database
-        user = crud.user.get(db, id=token_data.sub)
+        # Get the user from the cache or the database
+        user = active_users.get(token_data.sub)
+        if user is None:
+            user = await db.run(crud.user.get, id=token_data.sub)
+            if user:
+                active_users.put(user)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
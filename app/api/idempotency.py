@@ -0,0 +1,196 @@
+"""
+Idempotency-Key ヘッダーによる、予約の作成・更新の再試行の重複防止。
+
+クライアントが同じキーで同じリクエストを再送した場合は、最初のリクエストのレスポンス（ステータスと本文）を
+そのまま返し、予約の処理（日付ロック・重複チェック）は行いません。返し直したレスポンスには
+``Idempotent-Replayed: true`` ヘッダーが付きます。
+
+* キーの確認は主キーでの1回の SELECT で、日付ロックを取る前に行います。
+* 最初のリクエストの処理中に同じキーで届いたリクエストは 409（Retry-After 付き）、
+  同じキーで内容の違うリクエストは 422 になります。
+* 保存するのは 2xx と 4xx（409 の重複・404 など）のレスポンスです。5xx・503（混雑）で終わった場合は保存せず、再試行を受け付けます。
+* 予約を作成・更新したレスポンスは、予約と同じトランザクションで保存します（CRUD の before_commit）。
+  予約だけがコミットされてレスポンスが残らない（再試行で二重に予約される）ことはありません。
+* 処理中のまま IDEMPOTENCY_PENDING_SECONDS 秒を過ぎたキーは同じキーの再試行が引き継ぎます。
+  引き継がれた元のリクエストはレスポンスを保存できないため、予約をロールバックして 409 を返します。
+* レスポンスは IDEMPOTENCY_KEY_TTL_SECONDS 秒保存され、期限切れの行は各ワーカーが定期的に削除します。
+"""
+import hashlib
+import time as timer
+from typing import Any, Callable, Mapping, Optional
+
+import orjson
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.api.responses import event_to_dict
+from app.core import metrics
+from app.core.config import settings
+from app.db.session import Database
+from app.models.event import CalendarEvent
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_last_purge = float("-inf")
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """パスのパラメータとリクエスト本文から、同じキーの再送かどうかを比べるためのハッシュを作ります。"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.model_dump_json() if isinstance(part, BaseModel) else str(part)
+        digest.update(data.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _json_body(content: Any) -> bytes:
+    # Starlette の JSONResponse と同じ（区切りの空白なし・非 ASCII をエスケープしない）JSON になります。
+    return orjson.dumps(jsonable_encoder(content))
+
+
+def _in_progress() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"同じ {IDEMPOTENCY_KEY_HEADER} のリクエストを処理中です。しばらくしてから再度お試しください。",
+        headers={"Retry-After": "1"},
+    )
+
+
+class IdempotentRequest:
+    """
+    エンドポイントの処理を ``async with`` で囲んで使います。キーが指定されていない場合は何もしません。
+
+        async with IdempotentRequest(db, key, "POST /events", request_fingerprint(event_in)) as idem:
+            if idem.replay is not None:
+                return idem.replay
+            event = await db.run(crud.event.create_with_overlap_check, ..., before_commit=idem.before_commit)
+            return await idem.respond(event)
+    """
+
+    def __init__(self, db: Database, key: Optional[str], scope: str, fingerprint: str):
+        self.db = db
+        self.key = key
+        self.scope = scope
+        self.fingerprint = fingerprint
+        self.replay: Optional[Response] = None
+        # claim で受け取った claim_token（キーがない・処理を終えた場合は None）
+        self._token: Optional[str] = None
+        # 予約と同じトランザクションで保存したレスポンスの本文
+        self._body: Optional[bytes] = None
+
+    async def __aenter__(self) -> "IdempotentRequest":
+        if self.key is None:
+            return self
+        stored = await self.db.run(crud.idempotency_key.get, scope=self.scope, key=self.key)
+        if stored is None:
+            await self._maybe_purge()
+            self._token = await self.db.run(
+                crud.idempotency_key.claim,
+                scope=self.scope,
+                key=self.key,
+                request_hash=self.fingerprint,
+                pending_seconds=settings.IDEMPOTENCY_PENDING_SECONDS,
+            )
+            if self._token is not None:
+                return self
+            # 同時に届いた同じキーのリクエストが先に登録しました。
+            stored = await self.db.run(crud.idempotency_key.get, scope=self.scope, key=self.key)
+        if stored is not None and stored.request_hash != self.fingerprint:
+            metrics.idempotency_requests.inc(self.scope, "mismatch")
+            raise HTTPException(
+                status_code=422,
+                detail=f"この {IDEMPOTENCY_KEY_HEADER} は別の内容のリクエストですでに使われています。",
+            )
+        if stored is None or stored.status_code is None:
+            metrics.idempotency_requests.inc(self.scope, "in_progress")
+            raise _in_progress()
+        metrics.idempotency_requests.inc(self.scope, "replayed")
+        self.replay = Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"},
+        )
+        return self
+
+    @property
+    def before_commit(self) -> Optional[Callable[[Session, CalendarEvent], None]]:
+        """CRUD の before_commit に渡すフック（キーがなければ None）。"""
+        return self._complete_in_transaction if self._token is not None else None
+
+    def _complete_in_transaction(self, db: Session, event: CalendarEvent) -> None:
+        # 予約のトランザクション内（スレッドプール・run_sync の中）で呼ばれます。
+        db.flush()
+        # 採番された ID とサーバー側の既定値（created_at など）を読み込みます。
+        db.refresh(event)
+        # response_model=Event による通常の経路と同じ JSON です（app.api.responses を参照）。
+        body = orjson.dumps(event_to_dict(event), option=orjson.OPT_UTC_Z)
+        stored = crud.idempotency_key.complete_in_session(
+            db,
+            scope=self.scope,
+            key=self.key,
+            claim_token=self._token,
+            status_code=200,
+            body=body,
+            ttl_seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+        )
+        if not stored:
+            # 処理に時間がかかり、期限切れのキーを同じキーの再試行が引き継ぎました。
+            db.rollback()
+            self._token = None
+            metrics.idempotency_requests.inc(self.scope, "superseded")
+            raise _in_progress()
+        self._body = body
+
+    async def respond(self, event: CalendarEvent, headers: Optional[Mapping[str, str]] = None) -> Any:
+        """
+        作成・更新したイベントのレスポンスを返します（キーがなければイベントをそのまま返します）。
+        本文は before_commit で予約と同時に保存済みです。headers は最初のレスポンスにだけ付きます。
+        """
+        token, self._token = self._token, None
+        if token is None:
+            return event
+        body = self._body
+        if body is None:
+            # before_commit を渡さずに呼び出した場合は、コミットの後で保存します。
+            body = orjson.dumps(event_to_dict(event), option=orjson.OPT_UTC_Z)
+            await self._store(token, 200, body)
+        metrics.idempotency_requests.inc(self.scope, "stored")
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._token is None:
+            return
+        token, self._token = self._token, None
+        if isinstance(exc, HTTPException) and exc.status_code < 500:
+            await self._store(token, exc.status_code, _json_body({"detail": exc.detail}))
+            metrics.idempotency_requests.inc(self.scope, "stored")
+        else:
+            await self.db.run(
+                crud.idempotency_key.release, scope=self.scope, key=self.key, claim_token=token
+            )
+            metrics.idempotency_requests.inc(self.scope, "released")
+
+    async def _store(self, token: str, status_code: int, body: bytes) -> None:
+        await self.db.run(
+            crud.idempotency_key.complete,
+            scope=self.scope,
+            key=self.key,
+            claim_token=token,
+            status_code=status_code,
+            body=body,
+            ttl_seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+        )
+
+    async def _maybe_purge(self) -> None:
+        global _last_purge
+        now = timer.monotonic()
+        if now - _last_purge < settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+            return
+        _last_purge = now
+        await self.db.run(crud.idempotency_key.purge_expired)
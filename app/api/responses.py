@@ -0,0 +1,80 @@
+"""
+イベント一覧のレスポンスを高速に組み立てるためのヘルパー。
+
+``response_model=List[Event]`` による通常の経路では、1件ごとに Event スキーマの検証
+（日時の型変換バリデータを含む）と JSON 用の変換が行われます。
+ここでは ORM オブジェクトの属性から直接 dict を作り、orjson でエンコードします。
+出力は通常の経路と1バイトも違わない JSON になります（scripts/benchmark_event_serialization.py で確認できます）。
+
+Accept ヘッダーが MessagePack を求めていて msgpack がインストールされている場合は、
+同じ内容を MessagePack で返します（日付・時刻は JSON と同じ文字列表現です）。
+"""
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import orjson
+from fastapi import Request, Response
+
+from app.models.event import CalendarEvent
+
+try:
+    import msgpack
+except ImportError:  # msgpack は任意の依存です
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def event_to_dict(obj: CalendarEvent) -> Dict[str, Any]:
+    """ORM オブジェクトを Event スキーマと同じフィールド順・型の dict に変換します。"""
+    return {
+        "event_date": obj.event_date.date(),
+        "start_time": obj.start_time.time(),
+        "end_time": obj.end_time.time(),
+        "representative_name": obj.representative_name,
+        "phone_number": obj.phone_number,
+        "num_adults": obj.num_adults,
+        "num_children": obj.num_children,
+        "notes": obj.notes,
+        "plan": obj.plan,
+        "is_holiday": obj.is_holiday,
+        "holiday_name": obj.holiday_name,
+        "id": obj.id,
+        "created_at": obj.created_at,
+        "updated_at": obj.updated_at,
+        "user_id": obj.user_id,
+        "version": obj.version,
+    }
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return orjson.dumps(value, option=orjson.OPT_UTC_Z)[1:-1].decode()
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+
+def wants_msgpack(request: Request) -> bool:
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def event_list_response(
+    request: Request,
+    events: Sequence[CalendarEvent],
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    イベントの一覧を JSON（または MessagePack）のレスポンスにします。
+    エンドポイントで Response 引数に設定したヘッダーは自動では引き継がれないため、headers で渡してください。
+    """
+    rows: List[Dict[str, Any]] = [event_to_dict(obj) for obj in events]
+    if wants_msgpack(request):
+        body = msgpack.packb(rows, default=_msgpack_default)
+        return Response(content=body, media_type=MSGPACK_MEDIA_TYPES[0], headers=headers)
+    # pydantic と同じく、UTC の日時は "+00:00" ではなく "Z" で出力します。
+    body = orjson.dumps(rows, option=orjson.OPT_UTC_Z)
+    return Response(content=body, media_type="application/json", headers=headers)
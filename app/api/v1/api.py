@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 
 from app.api.v1.endpoints import auth, events, holidays, users
-from app.api.v1.endpoints import weekly_holidays, business_hours
+from app.api.v1.endpoints import weekly_holidays, business_hours, diagnostics, calendar
 
 api_router = APIRouter()
 
@@ -11,4 +11,7 @@ api_router.include_router(users.router, prefix="/users", tags=["ユーザー"])
 api_router.include_router(events.router, prefix="/events", tags=["予約・イベント"])
 api_router.include_router(holidays.router, prefix="/holidays", tags=["休日設定"])
 api_router.include_router(weekly_holidays.router, prefix="/weekly-holidays", tags=["定休日ルール"])
-api_router.include_router(business_hours.router, prefix="/business-hours", tags=["営業時間"])
\ No newline at end of file
+api_router.include_router(business_hours.router, prefix="/business-hours", tags=["営業時間"])
+# /calendar/month などのパスを持つため、プレフィックスなしで登録します。
+api_router.include_router(calendar.router, tags=["カレンダー"])
+api_router.include_router(diagnostics.router, prefix="/diagnostics", tags=["診断"])
\ No newline at end of file
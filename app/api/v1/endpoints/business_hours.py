@@ -1,11 +1,13 @@
 from datetime import time as Time
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
-from app.db.session import get_db
+from app.api import deps
+from app.core.config import settings
+from app.db.session import Database, get_database
 from app.crud.crud_business import business_hours
+from app.services.rules_cache import business_rules_cache
 from app.schemas.business import (
     BusinessHours as BusinessHoursSchema,
     BusinessHoursCreate,
@@ -17,9 +19,9 @@ from app.schemas.business import (
 router = APIRouter()
 
 @router.post("/set-unified", response_model=List[BusinessHoursSchema], tags=["営業時間"])
-def set_unified_business_hours(
+async def set_unified_business_hours(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     payload: BusinessHoursUnifiedSet,
 ):
     """
@@ -30,16 +32,16 @@ def set_unified_business_hours(
     if payload.open_time >= payload.close_time:
         raise HTTPException(status_code=400, detail="開店時間は閉店時間より前に設定してください。")
         
-    items = business_hours.set_unified_hours(
-        db, open_time=payload.open_time, close_time=payload.close_time
+    items = await db.run(
+        business_hours.set_unified_hours, open_time=payload.open_time, close_time=payload.close_time
     )
     return items
 
 
 @router.put("/", response_model=List[BusinessHoursSchema], tags=["営業時間"])
-def upsert_all_business_hours(
+async def upsert_all_business_hours(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     payload: BusinessHoursBatchUpdate,
 ):
     """
@@ -53,36 +55,57 @@ def upsert_all_business_hours(
             raise HTTPException(status_code=400, detail=f"曜日 '{item.weekday}' の開店時間は閉店時間より前に設定してください。")
         weekdays.add(item.weekday)
         
-    items = business_hours.batch_upsert(db, items=payload.items)
+    items = await db.run(business_hours.batch_upsert, items=payload.items)
     return items
 
 
 @router.get("/", response_model=List[BusinessHoursSchema], tags=["営業時間"])
-def list_business_hours(
-    db: Session = Depends(get_db),
+async def list_business_hours(
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_database),
 ):
-    """全曜日の営業時間の一覧を取得します（公開）。"""
-    items = db.query(business_hours.model).order_by(business_hours.model.weekday.asc()).all()
+    """
+    全曜日の営業時間の一覧を取得します（公開）。
+    If-None-Match が前回の ETag と一致し、設定が変わっていなければ 304 を返します。
+    """
+    rules = await db.run(business_rules_cache.get)
+    cached = deps.not_modified(
+        request, response, deps.make_etag("business_hours", rules.version),
+        max_age=settings.CONFIG_CACHE_MAX_AGE_SECONDS,
+    )
+    if cached is not None:
+        return cached
+    items = await db.run(business_hours.get_all)
     return items
 
 @router.get("/{weekday}", response_model=BusinessHoursSchema, tags=["営業時間"])
-def get_business_hours_by_weekday(
+async def get_business_hours_by_weekday(
     *,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_database),
     weekday: int,
 ):
     """【個別取得用】曜日を指定して営業時間を取得します（公開）。"""
     if weekday < 0 or weekday > 6:
         raise HTTPException(status_code=400, detail="曜日は0（月曜）から6（日曜）の間で指定してください。")
-    item = business_hours.get_by_weekday(db, weekday=weekday)
+    rules = await db.run(business_rules_cache.get)
+    cached = deps.not_modified(
+        request, response, deps.make_etag("business_hours", weekday, rules.version),
+        max_age=settings.CONFIG_CACHE_MAX_AGE_SECONDS,
+    )
+    if cached is not None:
+        return cached
+    item = await db.run(business_hours.get_by_weekday, weekday=weekday)
     if not item:
         raise HTTPException(status_code=404, detail="この曜日の営業時間設定は見つかりません。")
     return item
 
 @router.put("/{weekday}", response_model=BusinessHoursSchema, tags=["営業時間"])
-def upsert_business_hours(
+async def upsert_business_hours(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     weekday: int,
     payload: BusinessHoursCreate,
 ):
@@ -93,8 +116,8 @@ def upsert_business_hours(
         raise HTTPException(status_code=400, detail="URLの曜日とリクエストボディの曜日が一致しません。")
     if payload.open_time >= payload.close_time:
         raise HTTPException(status_code=400, detail="開店時間は閉店時間より前に設定してください。")
-    item = business_hours.upsert_by_weekday(
-        db,
+    item = await db.run(
+        business_hours.upsert_by_weekday,
         weekday=payload.weekday,
         open_time=payload.open_time,
         close_time=payload.close_time,
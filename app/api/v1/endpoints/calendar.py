@@ -0,0 +1,84 @@
+import calendar
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app import crud
+from app.api import deps
+from app.core.query_budget import query_budget
+from app.db.session import Database, get_database
+from app.schemas.calendar import DaySummary, MonthSummary
+from app.services.event_export import iter_event_rows
+from app.services.ics import iter_ics
+from app.services.rules_cache import business_rules_cache
+
+# カレンダー表示は集計済みの値や1回の範囲検索から組み立てます（営業ルールのキャッシュの更新時のみ最大3回加わります）。
+router = APIRouter(dependencies=[Depends(query_budget(4))])
+
+@router.get("/calendar/month", response_model=MonthSummary)
+async def read_month(
+    *,
+    db: Database = Depends(get_database),
+    year: int = Query(..., ge=1, le=9999, description="年"),
+    month: int = Query(..., ge=1, le=12, description="月"),
+):
+    """
+    月表示用に、指定した月の日ごとの予約数・予約時間・人数・休日を取得します（公開）。
+    予約の作成・更新・削除のたびに更新される日ごとの集計を読むため、予約を1件ずつ取得する必要はありません。
+    """
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    rows = await db.run(crud.daily_summary.get_range, start_date=first, end_date=last)
+    rules = await db.run(business_rules_cache.get)
+
+    by_day = {row.day: row for row in rows}
+    days = []
+    for offset in range(last.day):
+        day = first + timedelta(days=offset)
+        row = by_day.get(day)
+        summary = DaySummary(
+            date=day,
+            weekday=day.weekday(),
+            is_closed=rules.closed[day.weekday()],
+        )
+        if row is not None:
+            summary.booking_count = row.booking_count
+            summary.booked_minutes = row.booked_minutes
+            summary.total_guests = row.total_guests
+            summary.is_holiday = row.holiday_count > 0
+        days.append(summary)
+    return MonthSummary(year=year, month=month, days=days)
+
+@router.get(
+    "/calendar.ics",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/calendar": {}}}, 304: {"description": "前回から変更なし"}},
+)
+async def read_ics_feed(
+    request: Request,
+    db: Database = Depends(get_database),
+    start_date: Optional[date] = Query(None, description="開始日（省略時は最初の予約から）"),
+    end_date: Optional[date] = Query(None, description="終了日（省略時は最後の予約まで）"),
+):
+    """
+    予約と休日を iCalendar 形式で取得します（公開）。カレンダーアプリの購読用です。
+    ETag は期間内の件数と最終更新日時から作られ、If-None-Match が一致すればフィードを生成せずに 304 を返します。
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="開始日は終了日より前に設定してください。")
+
+    count, last_modified = await db.run(
+        crud.event.get_change_marker, start_date=start_date, end_date=end_date
+    )
+    etag = deps.make_etag("ics", start_date, end_date, count, last_modified)
+    response = StreamingResponse(
+        iter_ics(iter_event_rows(start_date=start_date, end_date=end_date)),
+        media_type="text/calendar",
+        headers={"Content-Disposition": 'inline; filename="calendar.ics"'},
+    )
+    cached = deps.not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return response
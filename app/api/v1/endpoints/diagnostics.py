@@ -0,0 +1,44 @@
+from fastapi import APIRouter
+
+from app.db.locks import booking_lock
+from app.db.pool import pool_status
+from app.db.session import async_engine, async_replica_engine, engine, pool_stats, replica_engine
+from app.services.auth_cache import active_users, token_cache
+from app.services.rules_cache import business_rules_cache
+from app.services.version_cache import resource_versions
+
+router = APIRouter()
+
+@router.get("/cache")
+def read_cache_stats():
+    """プロセス内キャッシュのヒット数・ミス数を取得します（このワーカーの値）。"""
+    return {
+        "business_rules": business_rules_cache.stats(),
+        "resource_versions": resource_versions.stats(),
+        "auth_tokens": token_cache.stats(),
+        "auth_users": active_users.stats(),
+    }
+
+
+@router.get("/locks")
+def read_lock_stats():
+    """予約の日付ロックの方式と、取得数・競合数・タイムアウト数・待ち時間を取得します（このワーカーの値）。"""
+    return {
+        "backend": booking_lock.name,
+        **booking_lock.stats.as_dict(),
+    }
+
+
+@router.get("/pool")
+def read_pool_stats():
+    """
+    DB の接続プール（読み取りレプリカを含む）の設定・現在の使用状況と、接続・取り出し・無効化の回数、取り出しの待ち時間を取得します（このワーカーの値）。
+    """
+    engines = {"sync": engine}
+    if async_engine is not None:
+        engines["async"] = async_engine.sync_engine
+    if replica_engine is not None:
+        engines["replica"] = replica_engine
+    if async_replica_engine is not None:
+        engines["async_replica"] = async_replica_engine.sync_engine
+    return {name: pool_status(e, pool_stats[name]) for name, e in engines.items()}
@@ -1,93 +1,345 @@
 from datetime import date, datetime, time
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from app import crud, models
-from app.schemas.event import Event, EventCreate, EventUpdate
-from app.db.session import get_db
+from app.api import deps
+from app.api.idempotency import IDEMPOTENCY_KEY_HEADER, IdempotentRequest, request_fingerprint
+from app.api.responses import event_list_response
+from app.core.config import settings
+from app.core.metrics import record_conflict
+from app.crud.crud_event import EventVersionMismatch
+from app.core.query_budget import query_budget
+from app.schemas.availability import AvailabilitySlot, DayAvailability
+from app.schemas.event import (
+    Event,
+    EventCreate,
+    EventUpdate,
+    EventBatchCreate,
+    EventBatchItemResult,
+    EventBatchResult,
+)
+from app.db.session import Database, get_database
+from app.services.availability import LAST_MINUTE, compute_availability
+from app.services.event_export import iter_csv, iter_event_rows, iter_ndjson
+from app.services.rules_cache import business_rules_cache
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Event])
-def read_events(
-    db: Session = Depends(get_db),
+# 空き枠検索で一度に指定できる最大日数
+MAX_AVAILABILITY_DAYS = 366
+
+# クエリ予算（QUERY_BUDGET_ENABLED のときにチェック）
+# 営業ルールのキャッシュの更新で最大3回、MySQL/PostgreSQL の日付ロックの取得・解放で2回、
+# その日の最初の予約で日ごとの集計行の作成に4回（SAVEPOINT を含む）、休日の変更で休日設定の更新番号に1回の SQL が加わります。
+# 枠モード（BOOKING_SLOT_MODE）では日付ロックと範囲検索の代わりに枠の登録（削除と INSERT）が加わるため、合計は超えません。
+RULES_REFRESH_QUERIES = 3
+WRITE_EXTRA_QUERIES = 2 + 4 + 1
+# Idempotency-Key を指定した場合は、キーの確認・登録、予約のトランザクション内での読み直し・応答の保存と、
+# 期限切れの行の削除で最大5回増えます。
+IDEMPOTENCY_QUERIES = 4 + 1
+
+IDEMPOTENCY_KEY_DESCRIPTION = "再送時に同じ値を指定すると、最初のリクエストのレスポンスを返します（二重予約の防止）。"
+
+@router.get("/", response_model=List[Event], dependencies=[Depends(query_budget(1))])
+async def read_events(
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_database),
     skip: int = 0,
     limit: int = 100,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    cursor: Optional[str] = Query(None, description="前のページのレスポンスヘッダー X-Next-Cursor の値"),
 ):
     """
     予約・予定（イベント）の一覧を取得します（公開）。
     日付範囲を指定してフィルタリングすることも可能です。
+    一覧は開始日時の昇順で、続きがある場合はレスポンスヘッダー X-Next-Cursor に次のページのカーソルが返されます。
+    Accept: application/msgpack を指定すると MessagePack で返します（サーバーに msgpack がある場合）。
+    """
+    if skip:
+        if cursor:
+            raise HTTPException(status_code=400, detail="skip と cursor は同時に指定できません。")
+        if start_date and end_date:
+            events = await db.run(
+                crud.event.get_events_in_date_range,
+                start_date=start_date, end_date=end_date, skip=skip, limit=limit,
+            )
+        else:
+            events = await db.run(crud.event.get_multi, skip=skip, limit=limit)
+        return event_list_response(request, events)
+
+    try:
+        if start_date and end_date:
+            events, next_cursor = await db.run(
+                crud.event.get_page_in_date_range,
+                start_date=start_date, end_date=end_date, cursor=cursor, limit=limit,
+            )
+        else:
+            events, next_cursor = await db.run(crud.event.get_page, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[deps.NEXT_CURSOR_HEADER] = next_cursor
+    return event_list_response(request, events, headers=response.headers)
+
+@router.get(
+    "/availability",
+    response_model=List[DayAvailability],
+    dependencies=[Depends(query_budget(1 + RULES_REFRESH_QUERIES))],
+)
+async def read_availability(
+    db: Database = Depends(get_database),
+    start_date: date = Query(..., description="検索開始日"),
+    end_date: date = Query(..., description="検索終了日"),
+    duration: int = Query(..., ge=1, le=LAST_MINUTE, description="枠の長さ（分）"),
+    step: int = Query(15, ge=1, le=LAST_MINUTE, description="枠の開始時刻の刻み（分）"),
+):
+    """
+    指定した期間の予約可能な空き枠を日ごとに取得します（公開）。
+    定休日・営業時間・既存の予約は、予約作成時と同じルールで判定されます。
+    枠モード（BOOKING_SLOT_MODE）では duration と step を予約枠の長さの倍数に切り上げ、
+    開始時刻を枠の区切りに揃えます（返した枠は、そのまま予約できます）。
     """
-    if start_date and end_date:
-        events = crud.event.get_events_in_date_range(
-            db, start_date=start_date, end_date=end_date, skip=skip, limit=limit
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="開始日は終了日より前に設定してください。")
+    if (end_date - start_date).days + 1 > MAX_AVAILABILITY_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"検索期間は{MAX_AVAILABILITY_DAYS}日以内で指定してください。",
+        )
+
+    intervals = await db.run(
+        crud.event.get_intervals_in_date_range, start_date=start_date, end_date=end_date
+    )
+    rules = await db.run(business_rules_cache.get)
+
+    # 計算は CPU 処理なので、イベントループを塞がないようスレッドプールで実行します。
+    days = await run_in_threadpool(
+        compute_availability,
+        start_date=start_date,
+        end_date=end_date,
+        duration=duration,
+        step=step,
+        intervals=intervals,
+        closed_weekdays=rules.closed_weekdays,
+        hours_by_weekday={
+            wd: (bh.open_time, bh.close_time) for wd, bh in rules.hours_by_weekday.items()
+        },
+        slot_minutes=settings.BOOKING_SLOT_MINUTES if settings.BOOKING_SLOT_MODE else 1,
+    )
+    return [
+        DayAvailability(
+            date=day["date"],
+            weekday=day["weekday"],
+            is_closed=day["is_closed"],
+            slots=[AvailabilitySlot(start_time=s, end_time=e) for s, e in day["slots"]],
         )
+        for day in days
+    ]
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {deps.NDJSON_MEDIA_TYPE: {}, "text/csv": {}}}},
+)
+async def export_events(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="出力形式"),
+    start_date: Optional[date] = Query(None, description="開始日（省略時は最初の予約から）"),
+    end_date: Optional[date] = Query(None, description="終了日（省略時は最後の予約まで）"),
+):
+    """
+    予約・予定（イベント）を開始日時順にエクスポートします（公開）。
+    行はDBから少しずつ読み出しながら逐次返すため、長い期間でもサーバーのメモリ使用量は一定です。
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="開始日は終了日より前に設定してください。")
+
+    batches = iter_event_rows(start_date=start_date, end_date=end_date)
+    if format == "csv":
+        body, media_type = iter_csv(batches), "text/csv"
     else:
-        events = crud.event.get_multi(db, skip=skip, limit=limit)
-    return events
+        body, media_type = iter_ndjson(batches), deps.NDJSON_MEDIA_TYPE
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="events.{format}"'},
+    )
 
-@router.post("/", response_model=Event)
-def create_event(
+@router.post(
+    "/",
+    response_model=Event,
+    dependencies=[
+        Depends(query_budget(4 + RULES_REFRESH_QUERIES + WRITE_EXTRA_QUERIES + IDEMPOTENCY_QUERIES))
+    ],
+)
+async def create_event(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     event_in: EventCreate,
+    idempotency_key: Optional[str] = Header(
+        None, alias=IDEMPOTENCY_KEY_HEADER, max_length=255, description=IDEMPOTENCY_KEY_DESCRIPTION
+    ),
 ):
     """
     新しい予約・予定（イベント）を作成します（公開）。
     作成されたイベントは特定のユーザーには紐付きません。
+    Idempotency-Key を指定した再送には、最初のリクエストのレスポンスを返します。
     """
-    try:
-        event = crud.event.create_with_overlap_check(db=db, obj_in=event_in)
-        return event
-    except ValueError as e:
-        # 時間の重複、または不正な時間範囲が指定された場合
-        raise HTTPException(status_code=409, detail=str(e))
+    async with IdempotentRequest(
+        db, idempotency_key, "POST /events", request_fingerprint(event_in)
+    ) as idem:
+        if idem.replay is not None:
+            return idem.replay
+        try:
+            event = await db.run(
+                crud.event.create_with_overlap_check,
+                obj_in=event_in,
+                before_commit=idem.before_commit,
+            )
+        except ValueError as e:
+            # 時間の重複、または不正な時間範囲が指定された場合
+            record_conflict(str(e))
+            raise HTTPException(status_code=409, detail=str(e))
+        return await idem.respond(event)
+
+# ORM の INSERT は、MySQL では採番された ID を得るため1件ずつ実行されるので、件数に比例して SQL が増えます。
+@router.post(
+    "/batch",
+    response_model=EventBatchResult,
+    dependencies=[Depends(query_budget(None, n_plus_one_threshold=0))],
+)
+async def create_events_batch(
+    *,
+    db: Database = Depends(get_database),
+    batch_in: EventBatchCreate,
+):
+    """
+    複数の予約・予定をまとめて作成します（公開）。
+    日付ごとのロックは1回だけ取得され、既存の予約とバッチ内の予約同士の重複がまとめてチェックされます。
+    atomic=true（既定）では1件でもエラーがあれば409を返し、何も登録しません。
+    """
+    outcomes = await db.run(
+        crud.event.create_batch_with_overlap_check, items=batch_in.items, atomic=batch_in.atomic
+    )
+    items = []
+    for idx, (event, error) in enumerate(outcomes):
+        if event is not None:
+            items.append(EventBatchItemResult(index=idx, status="created", event=event))
+        elif error is not None:
+            record_conflict(error)
+            items.append(EventBatchItemResult(index=idx, status="rejected", error=error))
+        else:
+            items.append(EventBatchItemResult(index=idx, status="skipped"))
+    result = EventBatchResult(
+        atomic=batch_in.atomic,
+        created=sum(1 for item in items if item.status == "created"),
+        rejected=sum(1 for item in items if item.status == "rejected"),
+        items=items,
+    )
+    if batch_in.atomic and result.rejected:
+        raise HTTPException(status_code=409, detail=jsonable_encoder(result))
+    return result
 
-@router.put("/{event_id}", response_model=Event)
-def update_event(
+@router.put(
+    "/{event_id}",
+    response_model=Event,
+    dependencies=[
+        Depends(query_budget(4 + RULES_REFRESH_QUERIES + WRITE_EXTRA_QUERIES + IDEMPOTENCY_QUERIES))
+    ],
+)
+async def update_event(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
+    response: Response,
     event_id: int,
     event_in: EventUpdate,
+    if_match: Optional[str] = Header(
+        None, alias="If-Match", description="GET で取得した ETag。指定すると、その版から変わっていない場合だけ更新します。"
+    ),
+    idempotency_key: Optional[str] = Header(
+        None, alias=IDEMPOTENCY_KEY_HEADER, max_length=255, description=IDEMPOTENCY_KEY_DESCRIPTION
+    ),
 ):
     """
     既存の予約・予定を更新します（公開）。
     更新時にも重複チェックや営業時間チェックが行われます。
+    If-Match を指定した場合、ほかの端末が先に更新していれば 412 を返します（行はロックしません）。
+    Idempotency-Key を指定した再送には、最初のリクエストのレスポンスを返します。
     """
-    try:
-        event = crud.event.update_with_overlap_check(db=db, event_id=event_id, obj_in=event_in)
-        return event
-    except ValueError as e:
-        detail = str(e)
-        if detail == "Event not found":
-            raise HTTPException(status_code=404, detail="イベントが見つかりません。")
-        raise HTTPException(status_code=409, detail=detail)
+    expected_version = deps.if_match_version(if_match, event_id)
+    async with IdempotentRequest(
+        db, idempotency_key, "PUT /events/{event_id}", request_fingerprint(event_id, if_match, event_in)
+    ) as idem:
+        if idem.replay is not None:
+            return idem.replay
+        try:
+            event = await db.run(
+                crud.event.update_with_overlap_check,
+                event_id=event_id,
+                obj_in=event_in,
+                expected_version=expected_version,
+                before_commit=idem.before_commit,
+            )
+        except EventVersionMismatch as e:
+            # If-Match なしの更新が、読み込みから書き込みまでの間に追い越された場合は 409 です。
+            headers = None
+            if e.current_version is not None:
+                headers = {"ETag": deps.event_etag(event_id, e.current_version)}
+            raise HTTPException(
+                status_code=412 if if_match is not None else 409, detail=str(e), headers=headers
+            )
+        except ValueError as e:
+            detail = str(e)
+            if detail == "Event not found":
+                raise HTTPException(status_code=404, detail="イベントが見つかりません。")
+            record_conflict(detail)
+            raise HTTPException(status_code=409, detail=detail)
+        etag = deps.event_etag(event.id, event.version)
+        response.headers["ETag"] = etag
+        return await idem.respond(event, headers={"ETag": etag})
 
-@router.get("/{event_id}", response_model=Event)
-def read_event(
+@router.get("/{event_id}", response_model=Event, dependencies=[Depends(query_budget(1))])
+async def read_event(
     *,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_database),
     event_id: int,
 ):
-    """IDを指定して特定の予約・予定を取得します（公開）。"""
-    event = crud.event.get(db=db, id=event_id)
+    """
+    IDを指定して特定の予約・予定を取得します（公開）。
+    レスポンスの ETag を PUT の If-Match に指定すると、ほかの端末での更新を上書きせずに済みます。
+    """
+    event = await db.run(crud.event.get, id=event_id)
     if not event:
         raise HTTPException(status_code=404, detail="イベントが見つかりません。")
+    cached = deps.not_modified(request, response, deps.event_etag(event.id, event.version))
+    if cached is not None:
+        return cached
     return event
 
-@router.delete("/{event_id}", response_model=Event)
-def delete_event(
+@router.delete(
+    "/{event_id}",
+    response_model=Event,
+    dependencies=[Depends(query_budget(3 + WRITE_EXTRA_QUERIES))],
+)
+async def delete_event(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     event_id: int,
 ):
     """予約・予定を削除します（公開）。"""
-    event = crud.event.get(db=db, id=event_id)
+    event = await db.run(crud.event.get, id=event_id)
     if not event:
         raise HTTPException(status_code=404, detail="イベントが見つかりません。")
-    event = crud.event.remove(db=db, id=event_id)
+    try:
+        event = await db.run(crud.event.remove, id=event_id)
+    except EventVersionMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e))
     return event
\ No newline at end of file
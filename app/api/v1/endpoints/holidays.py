@@ -1,63 +1,96 @@
 from datetime import date
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 
 from app import crud, models
+from app.api import deps
+from app.api.idempotency import IDEMPOTENCY_KEY_HEADER, IdempotentRequest, request_fingerprint
+from app.api.responses import event_list_response
+from app.core.config import settings
+from app.core.metrics import record_conflict
+from app.crud.crud_event import EventVersionMismatch
 from app.schemas.event import Event, EventCreate
-from app.db.session import get_db
+from app.db.session import Database, get_database
+from app.services.version_cache import HOLIDAYS, resource_versions
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Event])
-def read_holidays(
+async def read_holidays(
     *,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_database),
     start_date: date,
     end_date: date,
 ):
     """
     指定した期間内の休日設定を取得します（公開）。
+    If-None-Match が前回の ETag と一致し、休日設定が変わっていなければ 304 を返します。
     """
-    holidays = crud.event.get_holidays_in_date_range(
-        db, start_date=start_date, end_date=end_date
+    version = await db.run(resource_versions.get, HOLIDAYS)
+    cached = deps.not_modified(
+        request, response, deps.make_etag(HOLIDAYS, start_date, end_date, version),
+        max_age=settings.CONFIG_CACHE_MAX_AGE_SECONDS,
     )
-    return holidays
+    if cached is not None:
+        return cached
+    holidays = await db.run(
+        crud.event.get_holidays_in_date_range, start_date=start_date, end_date=end_date
+    )
+    return event_list_response(request, holidays, headers=response.headers)
 
 @router.post("/", response_model=Event)
-def create_holiday(
+async def create_holiday(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     holiday_in: EventCreate,
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias=IDEMPOTENCY_KEY_HEADER,
+        max_length=255,
+        description="再送時に同じ値を指定すると、最初のリクエストのレスポンスを返します。",
+    ),
 ):
     """
     新しい休日を設定します（公開）。
+    Idempotency-Key を指定した再送には、最初のリクエストのレスポンスを返します。
     """
     holiday_in.is_holiday = True
-    # Use overlap-safe creation but skip business rules for holidays
-    try:
-        holiday = crud.event.create_with_overlap_check(
-            db=db,
-            obj_in=holiday_in,
-            skip_business_rules=True,
-        )
-        return holiday
-    except ValueError as e:
-        # Conflict (e.g., overlapping holiday) or invalid time range
-        raise HTTPException(status_code=409, detail=str(e))
+    async with IdempotentRequest(
+        db, idempotency_key, "POST /holidays", request_fingerprint(holiday_in)
+    ) as idem:
+        if idem.replay is not None:
+            return idem.replay
+        # Use overlap-safe creation but skip business rules for holidays
+        try:
+            holiday = await db.run(
+                crud.event.create_with_overlap_check,
+                obj_in=holiday_in,
+                skip_business_rules=True,
+                before_commit=idem.before_commit,
+            )
+        except ValueError as e:
+            # Conflict (e.g., overlapping holiday) or invalid time range
+            record_conflict(str(e))
+            raise HTTPException(status_code=409, detail=str(e))
+        return await idem.respond(holiday)
 
 @router.delete("/{holiday_id}", response_model=Event)
-def delete_holiday(
+async def delete_holiday(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     holiday_id: int,
 ):
     """
     休日設定を削除します（公開）。
     """
-    holiday = crud.event.get(db=db, id=holiday_id)
+    holiday = await db.run(crud.event.get, id=holiday_id)
     if not holiday or not holiday.is_holiday:
         raise HTTPException(status_code=404, detail="Holiday not found")
-    holiday = crud.event.remove(db=db, id=holiday_id)
+    try:
+        holiday = await db.run(crud.event.remove, id=holiday_id)
+    except EventVersionMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e))
     return holiday
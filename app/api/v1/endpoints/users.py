@@ -1,68 +1,110 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 
 from app import crud
+from app.schemas.event import Event
 from app.schemas.user import User as UserSchema, UserCreate, UserUpdate
 from app.api import deps
+from app.api.responses import event_list_response
+from app.core.password_pool import password_hasher
+from app.db.session import Database, get_database
 
 router = APIRouter()
 
 @router.get("/", response_model=List[UserSchema])
-def read_users(
-    db: Session = Depends(deps.get_db),
+async def read_users(
+    response: Response,
+    db: Database = Depends(get_database),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="前のページのレスポンスヘッダー X-Next-Cursor の値"),
 ):
-    """ユーザー情報の一覧を取得します（認証不要）。"""
-    return crud.user.get_multi(db, skip=skip, limit=limit)
+    """
+    ユーザー情報の一覧を取得します（認証不要）。
+    続きがある場合はレスポンスヘッダー X-Next-Cursor に次のページのカーソルが返されます。
+    """
+    if skip:
+        if cursor:
+            raise HTTPException(status_code=400, detail="skip と cursor は同時に指定できません。")
+        return await db.run(crud.user.get_multi, skip=skip, limit=limit)
+    try:
+        users, next_cursor = await db.run(crud.user.get_page, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[deps.NEXT_CURSOR_HEADER] = next_cursor
+    return users
 
 @router.post("/", response_model=UserSchema)
-def create_user(
+async def create_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: Database = Depends(get_database),
     user_in: UserCreate,
 ):
-    """新しいユーザーを作成します（認証不要）。"""
-    user = crud.user.get_by_email(db, email=user_in.email)
+    """
+    新しいユーザーを作成します（認証不要）。
+    パスワードのハッシュ化は専用のプロセスプールで行い、混み合っている場合は 503 を返します。
+    """
+    user = await db.run(crud.user.get_by_email, email=user_in.email)
     if user:
         raise HTTPException(status_code=400, detail="このメールアドレスは既に使用されています。")
-    return crud.user.create(db, obj_in=user_in)
+    hashed_password = await password_hasher.hash(user_in.password)
+    return await db.run(crud.user.create, obj_in=user_in, hashed_password=hashed_password)
 
 @router.get("/me")
-def read_user_me():
+async def read_user_me():
     """（利用不可）認証が無効化されているため、このエンドポイントは使用できません。"""
     raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Authentication is disabled")
 
 @router.put("/me")
-def update_user_me():
+async def update_user_me():
     """（利用不可）認証が無効化されているため、このエンドポイントは使用できません。"""
     raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Authentication is disabled")
 
 @router.get("/{user_id}", response_model=UserSchema)
-def read_user_by_id(
+async def read_user_by_id(
     user_id: int,
-    db: Session = Depends(deps.get_db),
+    db: Database = Depends(get_database),
 ):
     """IDを指定して特定のユーザー情報を取得します（認証不要）。"""
-    user = crud.user.get(db, id=user_id)
+    user = await db.run(crud.user.get, id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="ユーザーが見つかりません。")
     return user
 
+@router.get("/{user_id}/events", response_model=List[Event])
+async def read_user_events(
+    request: Request,
+    response: Response,
+    user_id: int,
+    db: Database = Depends(get_database),
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="前のページのレスポンスヘッダー X-Next-Cursor の値"),
+):
+    """指定したユーザーに紐付く予約・予定を開始日時の昇順で取得します（認証不要）。"""
+    try:
+        events, next_cursor = await db.run(
+            crud.event.get_page_by_owner, user_id=user_id, cursor=cursor, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[deps.NEXT_CURSOR_HEADER] = next_cursor
+    return event_list_response(request, events, headers=response.headers)
+
 @router.delete("/{user_id}", response_model=UserSchema)
-def delete_user(
+async def delete_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: Database = Depends(get_database),
     user_id: int,
 ):
     """
     IDを指定してユーザーを削除します（公開API）。
     注意：実際のアプリケーションでは管理者権限で保護すべきです。
     """
-    user = crud.user.get(db=db, id=user_id)
+    user = await db.run(crud.user.get, id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="ユーザーが見つかりません。")
-    deleted_user = crud.user.remove(db=db, id=user_id)
+    deleted_user = await db.run(crud.user.remove, id=user_id)
     return deleted_user
\ No newline at end of file
@@ -1,12 +1,16 @@
 from datetime import date, timedelta, time as Time
-from typing import List
+from typing import List, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from app.api import deps
-from app.db.session import get_db
-from app.crud.crud_business import weekly_holiday_rule, business_hours
+from app.core.config import settings
+from app.core.query_budget import query_budget
+from app.db.session import Database, get_database
+from app.crud.crud_business import weekly_holiday_rule
+from app.services.rules_cache import business_rules_cache
+from app.services.weekly_occurrences import iter_weekly_occurrences
 from app.schemas.business import (
     WeeklyHolidayRule as WeeklyHolidayRuleSchema,
     WeeklyHolidayRuleCreate,
@@ -17,63 +21,71 @@ from app.schemas.business import (
 router = APIRouter()
 
 @router.get("/", response_model=List[WeeklyHolidayRuleSchema])
-def list_rules(
-    db: Session = Depends(get_db),
+async def list_rules(
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_database),
 ):
-    """有効な定休日ルールの一覧を取得します（公開）。"""
-    return weekly_holiday_rule.get_active(db)
+    """
+    有効な定休日ルールの一覧を取得します（公開）。
+    If-None-Match が前回の ETag と一致し、設定が変わっていなければ 304 を返します。
+    """
+    rules = await db.run(business_rules_cache.get)
+    cached = deps.not_modified(
+        request, response, deps.make_etag("weekly_holidays", rules.version),
+        max_age=settings.CONFIG_CACHE_MAX_AGE_SECONDS,
+    )
+    if cached is not None:
+        return cached
+    return list(rules.rules)
 
 @router.post("/", response_model=WeeklyHolidayRuleSchema)
-def create_rule(
+async def create_rule(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     rule_in: WeeklyHolidayRuleCreate,
 ):
     """新しい定休日ルールを作成します（公開）。"""
-    return weekly_holiday_rule.create(db, obj_in=rule_in)
+    return await db.run(weekly_holiday_rule.create, obj_in=rule_in)
 
 @router.delete("/{rule_id}", response_model=WeeklyHolidayRuleSchema)
-def deactivate_rule(
+async def deactivate_rule(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     rule_id: int,
 ):
     """定休日ルールを無効化します（公開）。"""
-    rule = weekly_holiday_rule.deactivate(db, id=rule_id)
+    rule = await db.run(weekly_holiday_rule.deactivate, id=rule_id)
     if not rule:
         raise HTTPException(status_code=404, detail="ルールが見つかりません。")
     return rule
 
-@router.get("/occurrences", response_model=List[WeeklyHolidayOccurrence])
-def list_occurrences(
+@router.get(
+    "/occurrences",
+    response_model=List[WeeklyHolidayOccurrence],
+    # 日数によらず、キャッシュした営業ルールだけから計算します（キャッシュの更新時のみ最大3回）。
+    dependencies=[Depends(query_budget(3))],
+    responses={200: {"content": {deps.NDJSON_MEDIA_TYPE: {}}}},
+)
+async def list_occurrences(
     *,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     start_date: date,
     end_date: date,
+    format: Literal["json", "ndjson"] = Query(
+        "json", description="ndjson を指定すると1行1件の NDJSON で逐次返します（複数年の期間向け）"
+    ),
 ):
     """指定した期間内に、定休日が実際に発生する日付の一覧を取得します。"""
     if start_date > end_date:
         raise HTTPException(status_code=400, detail="開始日は終了日より前に設定してください。")
 
-    rules = weekly_holiday_rule.get_active(db)
-    results: List[WeeklyHolidayOccurrence] = []
-
-    delta = timedelta(days=1)
-    day = start_date
-    while day <= end_date:
-        weekday = day.weekday()  # 0=月 ... 6=日
-        for r in rules:
-            if r.weekday == weekday:
-                bh = business_hours.get_by_weekday(db, weekday=weekday)
-                results.append(
-                    WeeklyHolidayOccurrence(
-                        date=day,
-                        weekday=weekday,
-                        name=r.name,
-                        open_time=bh.open_time if bh else None,
-                        close_time=bh.close_time if bh else None,
-                    )
-                )
-        day += delta
-
-    return results
\ No newline at end of file
+    rules = await db.run(business_rules_cache.get)
+    occurrences = iter_weekly_occurrences(rules, start_date=start_date, end_date=end_date)
+    if format == "ndjson":
+        lines = (
+            WeeklyHolidayOccurrence(**item).model_dump_json() + "\n"
+            for item in occurrences
+        )
+        return StreamingResponse(lines, media_type=deps.NDJSON_MEDIA_TYPE)
+    return [WeeklyHolidayOccurrence(**item) for item in occurrences]
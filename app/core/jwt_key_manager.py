@@ -1,52 +1,216 @@
+"""
+JWT signing key ring shared by all worker processes.
+
+Keys are stored in a JSON file (JWT_KEY_RING_FILE) so that every uvicorn worker
+signs and verifies with the same keys, and each token names its signing key in
+the ``kid`` header.
+
+Lifecycle of a key:
+- it signs new tokens for KEY_ROTATION_DAYS after it is created
+- a new key then takes over signing, while the old key keeps verifying for
+  JWT_KEY_OVERLAP_MINUTES (by default the access token lifetime), so tokens
+  issued just before a rotation stay valid until they expire on their own
+- after the overlap window the key is dropped from the ring
+
+Rotation is lazy: the first worker that needs to sign after the signing period
+has ended takes an exclusive lock on ``<file>.lock``, re-reads the ring (another
+worker may already have rotated) and adds a new key. A worker that sees an
+unknown ``kid`` re-reads the file before rejecting the token.
+
+Verified token payloads are cached per worker (``app.services.auth_cache``).
+The cache is cleared whenever this worker rotates or re-reads a changed ring,
+so a key retired early with ``rotate(force=True)`` stops being accepted from
+cached payloads. A worker that does not re-read the ring keeps its cached
+payloads for at most AUTH_TOKEN_CACHE_TTL_SECONDS.
+
+With JWT_KEY_RING_FILE set to an empty string the ring is kept in memory only,
+which is only suitable for a single process.
+"""
+import json
+import os
 import secrets
+import tempfile
+import threading
 import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime, timedelta
-from typing import Tuple, Optional
+from typing import Dict, Iterator, Optional, Tuple
+
+from jose import JWTError
+
+from app.core.config import settings
+from app.services.auth_cache import token_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker
+    fcntl = None
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    secret: str
+    created_at: float
+    # New tokens are signed with this key until sign_until (UNIX time);
+    # tokens signed with it are accepted until verify_until.
+    sign_until: float
+    verify_until: float
+
 
 class JWTKeyManager:
-    _instance = None
-    _current_key: str
-    _key_expiry: datetime
-    _key_lifetime: timedelta
     _key_length: int = 32  # 256 bits
 
-    def __new__(cls, key_lifetime_days: int = 30):
-        if cls._instance is None:
-            cls._instance = super(JWTKeyManager, cls).__new__(cls)
-            cls._key_lifetime = timedelta(days=key_lifetime_days)
-            cls._rotate_key()
-        return cls._instance
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        rotation: timedelta = timedelta(days=30),
+        overlap: timedelta = timedelta(days=1),
+    ):
+        self.path = path or None
+        self.rotation = rotation
+        self.overlap = overlap
+        self._keys: Dict[str, SigningKey] = {}
+        self._mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+
+    # ---------- storage ----------
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if self.path is None or fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
 
-    @classmethod
-    def _generate_key(cls) -> str:
+    def _read(self) -> Dict[str, SigningKey]:
+        if self.path is None:
+            return dict(self._keys)
+        try:
+            with open(self.path) as fh:
+                self._mtime_ns = os.fstat(fh.fileno()).st_mtime_ns
+                data = json.load(fh)
+        except FileNotFoundError:
+            return {}
+        return {item["kid"]: SigningKey(**item) for item in data.get("keys", [])}
+
+    def _write(self, keys: Dict[str, SigningKey]) -> None:
+        if self.path is None:
+            return
+        # Write to a temporary file (mode 0600) and rename it, so readers never see a partial ring.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".jwt_keys.")
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump({"keys": [asdict(key) for key in keys.values()]}, fh, indent=2)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _reload_if_changed(self) -> None:
+        """Re-read the ring if another process has written it since the last read."""
+        if self.path is None:
+            return
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime_ns != self._mtime_ns:
+            with self._lock:
+                self._keys = self._read()
+            token_cache.clear()
+
+    # ---------- keys ----------
+    def _generate_key(self, now: float) -> SigningKey:
         """Generate a new secure random key"""
-        return secrets.token_urlsafe(cls._key_length)
+        sign_until = now + self.rotation.total_seconds()
+        return SigningKey(
+            kid=secrets.token_hex(8),
+            secret=secrets.token_urlsafe(self._key_length),
+            created_at=now,
+            sign_until=sign_until,
+            verify_until=sign_until + self.overlap.total_seconds(),
+        )
 
-    @classmethod
-    def _rotate_key(cls):
-        """Rotate to a new key"""
-        cls._current_key = cls._generate_key()
-        cls._key_expiry = datetime.utcnow() + cls._key_lifetime
+    @staticmethod
+    def _signing_key(keys: Dict[str, SigningKey], now: float) -> Optional[SigningKey]:
+        usable = [key for key in keys.values() if key.created_at <= now < key.sign_until]
+        return max(usable, key=lambda key: key.created_at, default=None)
+
+    def rotate(self, *, force: bool = False) -> SigningKey:
+        """
+        Add a new signing key if the current one has reached the end of its signing period
+        (or always, with force=True). The previous key keeps verifying for the overlap window.
+        Keys whose overlap window has passed are removed, and the cached token payloads are cleared.
+        """
+        with self._lock, self._file_lock():
+            now = time.time()
+            keys = self._read()
+            current = self._signing_key(keys, now)
+            if current is None or force:
+                if current is not None:
+                    keys[current.kid] = replace(
+                        current, sign_until=now, verify_until=now + self.overlap.total_seconds()
+                    )
+                current = self._generate_key(now)
+                keys[current.kid] = current
+                keys = {kid: key for kid, key in keys.items() if key.verify_until > now}
+                self._write(keys)
+                if self.path is not None:
+                    self._mtime_ns = os.stat(self.path).st_mtime_ns
+                token_cache.clear()
+            self._keys = keys
+            return current
 
-    @classmethod
-    def get_current_key(cls) -> Tuple[str, datetime]:
+    def get_signing_key(self) -> SigningKey:
         """
-        Get the current key and its expiry time.
-        Automatically rotates the key if it has expired.
+        Get the key that signs new tokens.
+        Automatically rotates the key if its signing period has ended.
         """
-        if datetime.utcnow() >= cls._key_expiry:
-            cls._rotate_key()
-        return cls._current_key, cls._key_expiry
+        now = time.time()
+        key = self._signing_key(self._keys, now)
+        if key is None:
+            self._reload_if_changed()
+            key = self._signing_key(self._keys, now) or self.rotate()
+        return key
 
-    @classmethod
-    def get_key_for_verification(cls, key_id: Optional[str] = None) -> str:
+    def get_current_key(self) -> Tuple[str, datetime]:
         """
-        Get a key for verification.
-        In a distributed system, you would use the key_id to get the correct key.
-        For simplicity, we're just returning the current key here.
+        Get the current key and the time until which tokens signed with it are accepted.
+        Kept for callers that do not need the key id.
         """
-        current_key, _ = cls.get_current_key()
-        return current_key
+        key = self.get_signing_key()
+        return key.secret, datetime.fromtimestamp(key.verify_until)
+
+    def get_key_for_verification(self, key_id: Optional[str] = None) -> str:
+        """
+        Get the key that signed a token, by the ``kid`` from its header.
+        Tokens without a ``kid`` (issued before key ids were introduced) are checked
+        against the current signing key.
+
+        Raises:
+            JWTError: If the key is unknown or has been retired
+        """
+        if key_id is None:
+            return self.get_signing_key().secret
+        key = self._keys.get(key_id)
+        if key is None:
+            self._reload_if_changed()
+            key = self._keys.get(key_id)
+        if key is None or time.time() >= key.verify_until:
+            raise JWTError("Unknown or retired signing key")
+        return key.secret
+
 
-# Initialize with default 30-day key rotation
-jwt_key_manager = JWTKeyManager()
+jwt_key_manager = JWTKeyManager(
+    path=settings.JWT_KEY_RING_FILE,
+    rotation=timedelta(days=settings.KEY_ROTATION_DAYS),
+    overlap=timedelta(minutes=settings.JWT_KEY_OVERLAP_MINUTES),
+)
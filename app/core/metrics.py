@@ -0,0 +1,343 @@
+"""
+プロセス内のメトリクス（Prometheus のテキスト形式で ``/metrics`` に公開）。
+
+* HTTP: ルート（パスのテンプレート）ごとのリクエスト数と処理時間のヒストグラム
+* DB: SQLAlchemy のエンジンイベントで数えたクエリ数・処理時間（全体と1リクエストあたり）
+* 予約: 409 になった理由ごとの件数、日付ロックの待ち時間
+* パスワード処理: プロセスプールの上限・待ち件数・処理時間（app/core/password_pool.py で登録）
+* 接続プール: 使用中・待機中・オーバーフローの接続数
+
+値はワーカープロセスごとに保持されます。複数ワーカーの構成では、Prometheus 側で合算してください。
+"""
+import abc
+import threading
+import time as timer
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric(abc.ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """(メトリクス名, ラベル名, ラベル値, 値) を返します。"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labelnames, labelvalues, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            yield self.name, self.labelnames, labelvalues, value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # ラベル値 -> [各バケットの件数（累積ではない）..., +Inf の件数, 合計]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        pos = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labelvalues)
+            if counts is None:
+                counts = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            counts[pos] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        names = self.labelnames + ("le",)
+        for labelvalues, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", names, labelvalues + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, labelvalues, counts[-1]
+            yield f"{self.name}_count", self.labelnames, labelvalues, cumulative
+
+
+class CallbackGauge(Metric):
+    """出力のたびに関数を呼び出して値を取得するゲージ。関数は (ラベル値, 値) の一覧を返します。"""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Iterable[Tuple[LabelValues, float]]],
+    ):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def samples(self):
+        for labelvalues, value in self.callback():
+            yield self.name, self.labelnames, labelvalues, value
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+)
+http_request_duration = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+)
+db_queries = registry.register(Counter("db_queries_total", "SQL statements executed."))
+db_query_duration = registry.register(
+    Histogram("db_query_duration_seconds", "SQL statement execution time.", buckets=QUERY_BUCKETS)
+)
+db_queries_per_request = registry.register(
+    Histogram(
+        "db_queries_per_request", "SQL statements executed per HTTP request.", ("route",), buckets=COUNT_BUCKETS
+    )
+)
+db_time_per_request = registry.register(
+    Histogram(
+        "db_time_per_request_seconds", "Total SQL execution time per HTTP request.", ("route",), buckets=QUERY_BUCKETS
+    )
+)
+booking_conflicts = registry.register(
+    Counter("booking_conflicts_total", "Booking requests rejected with 409, by reason.", ("reason",))
+)
+booking_lock_wait = registry.register(
+    Histogram(
+        "booking_lock_wait_seconds", "Time spent waiting for a booking date lock.", ("backend", "outcome"),
+        buckets=QUERY_BUCKETS + (2.5, 5.0, 10.0),
+    )
+)
+db_pool_checkout_wait = registry.register(
+    Histogram(
+        "db_pool_checkout_wait_seconds", "Time to get a connection from the pool (including opening one).",
+        ("engine",), buckets=QUERY_BUCKETS + (2.5, 5.0, 10.0, 30.0),
+    )
+)
+db_pool_invalidations = registry.register(
+    Counter("db_pool_invalidations_total", "Pooled connections invalidated, by kind.", ("engine", "kind"))
+)
+password_hash_duration = registry.register(
+    Histogram(
+        "password_hash_duration_seconds", "Password hash/verify time including the wait for a worker.",
+        ("operation", "outcome"),
+    )
+)
+password_hash_rejected = registry.register(
+    Counter(
+        "password_hash_rejected_total", "Password hash/verify requests rejected (queue_full or timeout).",
+        ("operation", "reason"),
+    )
+)
+idempotency_requests = registry.register(
+    Counter(
+        "idempotency_requests_total",
+        "Requests with an Idempotency-Key, by outcome (stored, replayed, mismatch, in_progress, released, superseded).",
+        ("scope", "outcome"),
+    )
+)
+
+# 予約が 409 になったときのメッセージと、メトリクスの理由ラベルの対応
+CONFLICT_REASONS = {
+    "選択された日付は定休日です。": "closed_day",
+    "時間は営業時間外です。": "outside_business_hours",
+    "その時間枠はすでに予約されています。": "overlap",
+    "過去の日付には予約できません。": "past_date",
+    "過去の日付には変更できません。": "past_date",
+    "終了時刻は開始時刻より後に設定してください。": "invalid_time_range",
+    "開始・終了時刻が予約枠の区切りに合っていません。": "unaligned_slot",
+}
+
+
+def record_conflict(message: str) -> None:
+    """予約が拒否された理由を記録します。"""
+    booking_conflicts.inc(CONFLICT_REASONS.get(message, "other"))
+
+
+# ---------- リクエストごとの集計 ----------
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+# スレッドプールや AsyncSession.run_sync で実行される処理にも、呼び出し元のコンテキストが引き継がれます。
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(timer.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = timer.perf_counter() - started.pop()
+    db_queries.inc()
+    db_query_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+
+
+def _handle_error(exception_context) -> None:
+    # 失敗した文では after_cursor_execute が呼ばれないため、開始時刻を捨てます。
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """エンジンにクエリ数・処理時間の計測を追加します。"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def register_pool_gauges(engines: Dict[str, Engine]) -> None:
+    """接続プールの状態をゲージとして登録します。QueuePool 以外（NullPool など）のプールは対象外です。"""
+
+    def collect(method: str) -> Callable[[], List[Tuple[LabelValues, float]]]:
+        def callback() -> List[Tuple[LabelValues, float]]:
+            values = []
+            for label, engine in engines.items():
+                fn = getattr(engine.pool, method, None)
+                if fn is not None:
+                    values.append(((label,), fn()))
+            return values
+        return callback
+
+    for method, help in (
+        ("checkedout", "Connections currently checked out of the pool."),
+        ("checkedin", "Idle connections in the pool."),
+        ("overflow", "Connections opened beyond pool_size (negative while the pool is not full)."),
+        ("size", "Configured pool size."),
+    ):
+        registry.register(CallbackGauge(f"db_pool_{method}", help, ("engine",), collect(method)))
+
+
+# ---------- HTTP ----------
+class MetricsMiddleware:
+    """
+    リクエストごとの処理時間・ステータス・DBクエリ数を記録する ASGI ミドルウェア。
+    ルートのラベルにはパスのテンプレート（例: /api/v1/events/{event_id}）を使い、どのルートにも一致しないリクエストは
+    "unmatched" にまとめます。
+    """
+
+    def __init__(self, app, *, routes_app=None, exclude_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.routes_app = routes_app
+        self.exclude_paths = set(exclude_paths)
+        self._route_paths: Optional[Dict[Any, str]] = None
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            routes = getattr(self.routes_app, "routes", [])
+            self._route_paths = {
+                route.endpoint: route.path for route in routes if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats = RequestStats()
+        token = current_request.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = timer.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = timer.perf_counter() - started
+            current_request.reset(token)
+            route = self._route_label(scope)
+            method = scope["method"]
+            http_requests.inc(method, route, str(status_code))
+            http_request_duration.observe(elapsed, method, route)
+            db_queries_per_request.observe(stats.queries, route)
+            db_time_per_request.observe(stats.query_seconds, route)
@@ -0,0 +1,166 @@
+"""
+パスワードのハッシュ化・照合を、リクエストを処理するスレッドとは別のプロセスプールで実行します。
+
+bcrypt は1回あたり数百ミリ秒の CPU を使うため、スレッドプールで実行するとその間 GIL を取り合い、
+予約などほかのリクエストの処理が遅れます。専用のプロセスプール（PASSWORD_HASH_WORKERS）で実行し、
+実行中＋待ちの件数が上限（ワーカー数 + PASSWORD_HASH_QUEUE_LIMIT）を超えた場合や
+PASSWORD_HASH_TIMEOUT_SECONDS 以内に終わらない場合は PasswordHashBusy を送出します（API では 503）。
+
+同期の処理（db.run で実行される CRUD など）からは verify_sync を使います。呼び出したスレッドは結果を待ちますが、
+bcrypt 自体はプロセスプールで実行され、上限とタイムアウトも同じです。
+
+PASSWORD_HASH_WORKERS=0 の場合はプロセスを使わず、専用のスレッド1つで実行します（上限のチェックは同じです）。
+"""
+import asyncio
+import multiprocessing
+import threading
+import time as timer
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_password
+
+
+class PasswordHashBusy(Exception):
+    """パスワード処理の待ちが上限を超えた、またはタイムアウトした場合に送出されます。"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"パスワード処理が混み合っています（{reason}）。")
+        self.reason = reason
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, queue_limit: int, timeout: float) -> None:
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def capacity(self) -> int:
+        return max(self.workers, 1) + self.queue_limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """ワーカーの空きを待っている件数。"""
+        return max(0, self._in_flight - max(self.workers, 1))
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.workers <= 0:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-hash")
+                else:
+                    # サーバーのスレッドが持つロックを引き継がないよう、fork ではなく spawn で起動します。
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+            return self._executor
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise PasswordHashBusy("queue_full")
+            self._in_flight += 1
+
+    def _done(self, _future: Any = None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _submit(self, operation: str, fn: Callable[..., Any], *args: Any) -> Future:
+        try:
+            self._reserve()
+        except PasswordHashBusy:
+            metrics.password_hash_rejected.inc(operation, "queue_full")
+            raise
+        try:
+            future: Future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._done()
+            raise
+        # タイムアウトしてもワーカーでの処理は止まらないため、実際に終わった時点で件数を戻します。
+        future.add_done_callback(self._done)
+        return future
+
+    async def _run(self, operation: str, fn: Callable[..., Any], *args: Any) -> Any:
+        future = self._submit(operation, fn, *args)
+        started = timer.perf_counter()
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            metrics.password_hash_rejected.inc(operation, "timeout")
+            raise PasswordHashBusy("timeout")
+        finally:
+            metrics.password_hash_duration.observe(timer.perf_counter() - started, operation, outcome)
+
+    def _run_sync(self, operation: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """_run と同じ上限・タイムアウト・メトリクスで、呼び出したスレッドを結果が出るまで待たせます。"""
+        future = self._submit(operation, fn, *args)
+        started = timer.perf_counter()
+        outcome = "error"
+        try:
+            result = future.result(timeout=self.timeout)
+            outcome = "ok"
+            return result
+        except FutureTimeoutError:
+            outcome = "timeout"
+            metrics.password_hash_rejected.inc(operation, "timeout")
+            raise PasswordHashBusy("timeout")
+        finally:
+            metrics.password_hash_duration.observe(timer.perf_counter() - started, operation, outcome)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, password, hashed_password)
+
+    def verify_sync(self, password: str, hashed_password: str) -> bool:
+        return self._run_sync("verify", verify_password, password, hashed_password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def gauges(self) -> Dict[str, float]:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+)
+
+
+def _gauge(key: str) -> Callable[[], List[Tuple[Tuple[str, ...], float]]]:
+    return lambda: [((), password_hasher.gauges()[key])]
+
+
+for _key, _help in (
+    ("workers", "Worker processes for password hashing (0 = a single thread)."),
+    ("queue_limit", "Password hash requests allowed to wait for a free worker."),
+    ("in_flight", "Password hash requests running or waiting."),
+    ("queue_depth", "Password hash requests waiting for a free worker."),
+):
+    metrics.registry.register(metrics.CallbackGauge(f"password_hash_{_key}", _help, (), _gauge(_key)))
@@ -0,0 +1,189 @@
+"""
+リクエストごとの SQL の実行回数チェック（開発・テスト向け）。
+
+* リクエスト中に実行された SQL を数え、文の形（リテラル値や IN の要素数を除いた SQL）ごとに集計します。
+* 同じ形の文が N+1 のしきい値以上の回数実行された場合は、N+1 の疑いとして報告します。
+* ルーターやエンドポイントに ``dependencies=[Depends(query_budget(3))]`` と書くと、そのルートで許可する
+  SQL の回数（クエリ予算）を宣言できます。ルーターとエンドポイントの両方で宣言した場合はエンドポイント側が優先されます。
+
+違反は警告としてログに出力します。QUERY_BUDGET_STRICT を有効にすると、リクエストの終了時に QueryBudgetExceeded を
+送出するため、TestClient を使うテストやベンチマークはその場で失敗します。
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+|\?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    SQL 文から値の違いを取り除いた「形」を返します。
+    プレースホルダーの書き方（?、%s、:name など）とリテラル値は ? に、IN (?, ?, ...) は IN (...) にまとめます。
+    """
+    text = _STRING_LITERAL.sub("?", statement)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _PLACEHOLDER_LIST.sub("(...)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class QueryBudgetExceeded(Exception):
+    """厳格モードで、クエリ予算の超過または N+1 の疑いが見つかった場合に送出されます。"""
+
+    def __init__(self, name: str, problems: List[str]):
+        super().__init__(f"{name}: " + "; ".join(problems))
+        self.name = name
+        self.problems = problems
+
+
+@dataclass
+class QueryLog:
+    """1つのリクエスト（または track_queries の範囲）で実行された SQL の集計。"""
+
+    name: str
+    budget: Optional[int] = None
+    n_plus_one_threshold: int = 0
+    shapes: Counter = field(default_factory=Counter)
+
+    @property
+    def total(self) -> int:
+        return sum(self.shapes.values())
+
+    def record(self, statement: str) -> None:
+        self.shapes[fingerprint(statement)] += 1
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        """N+1 の疑いがある文の形と回数を、回数の多い順に返します。"""
+        if self.n_plus_one_threshold <= 0:
+            return []
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= self.n_plus_one_threshold]
+
+    def problems(self) -> List[str]:
+        problems = []
+        if self.budget is not None and self.total > self.budget:
+            problems.append(f"{self.total} queries (budget {self.budget})")
+        for shape, n in self.repeated():
+            problems.append(f"possible N+1: {n}x {shape[:200]}")
+        return problems
+
+
+current_log: ContextVar[Optional[QueryLog]] = ContextVar("current_query_log", default=None)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    log = current_log.get()
+    if log is not None:
+        log.record(statement)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """エンジンで実行される SQL を、実行中のリクエストの QueryLog に記録するようにします。"""
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def check(log: QueryLog, *, strict: bool) -> None:
+    """予算の超過と N+1 の疑いを報告します。strict の場合は QueryBudgetExceeded を送出します。"""
+    problems = log.problems()
+    if not problems:
+        return
+    if strict:
+        raise QueryBudgetExceeded(log.name, problems)
+    for problem in problems:
+        logger.warning("[query budget] %s: %s", log.name, problem)
+
+
+@contextmanager
+def track_queries(
+    name: str,
+    *,
+    budget: Optional[int] = None,
+    n_plus_one_threshold: int = 0,
+    strict: bool = False,
+) -> Iterator[QueryLog]:
+    """
+    範囲内で実行された SQL を集計し、終了時に check します。
+    HTTP を通さない処理（CRUD の呼び出しやベンチマークのケース）にも使えます。
+    """
+    log = QueryLog(name=name, budget=budget, n_plus_one_threshold=n_plus_one_threshold)
+    token = current_log.set(log)
+    try:
+        yield log
+    finally:
+        current_log.reset(token)
+    check(log, strict=strict)
+
+
+def query_budget(max_queries: Optional[int], *, n_plus_one_threshold: Optional[int] = None):
+    """
+    ルートで許可する SQL の回数を宣言する依存関係を返します。
+    例: ``@router.get("/", dependencies=[Depends(query_budget(3))])``
+    max_queries に None を指定すると回数を制限しません。n_plus_one_threshold に 0 を指定すると
+    N+1 の報告をしません（件数に比例して文が増えることが分かっているルート向け）。
+    チェックが無効な場合（QueryBudgetMiddleware がない場合）は何もしません。
+    """
+
+    async def declare_query_budget() -> None:
+        log = current_log.get()
+        if log is not None:
+            log.budget = max_queries
+            if n_plus_one_threshold is not None:
+                log.n_plus_one_threshold = n_plus_one_threshold
+
+    return declare_query_budget
+
+
+class QueryBudgetMiddleware:
+    """
+    リクエストごとに QueryLog を用意し、レスポンスの送信後に予算と N+1 をチェックする ASGI ミドルウェア。
+    予算を宣言していないルートには default_budget（None なら無制限）を使います。
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        default_budget: Optional[int] = None,
+        n_plus_one_threshold: int = 0,
+        strict: bool = False,
+        exclude_paths: Tuple[str, ...] = ("/metrics",),
+    ):
+        self.app = app
+        self.default_budget = default_budget
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.strict = strict
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        log = QueryLog(
+            name=f"{scope['method']} {scope['path']}",
+            budget=self.default_budget,
+            n_plus_one_threshold=self.n_plus_one_threshold,
+        )
+        token = current_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_log.reset(token)
+        route = scope.get("route")
+        if route is not None:
+            log.name = f"{scope['method']} {route.path}"
+        check(log, strict=self.strict)
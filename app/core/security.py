@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta
 from typing import Any, Optional, Union
 from jose import jwt
@@ -5,7 +6,9 @@ from passlib.context import CryptContext
 from app.core.config import settings
 from .jwt_key_manager import jwt_key_manager
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS
+)
 
 def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -25,22 +28,23 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     
-    # Get the current key and its expiry time
-    secret_key, key_expiry = jwt_key_manager.get_current_key()
+    # Get the current signing key from the shared key ring
+    signing_key = jwt_key_manager.get_signing_key()
     
     # Include key expiry in the token payload for verification
     to_encode = {
         "exp": expire,
         "sub": str(subject),
-        "key_exp": int(key_expiry.timestamp()),  # Add key expiry timestamp
-        "iat": int(datetime.utcnow().timestamp())  # Issued at
+        "key_exp": int(signing_key.verify_until),  # Add key expiry timestamp
+        "iat": int(time.time())  # Issued at
     }
     
-    # Encode the token with the current key
+    # Encode the token with the current key, naming the key in the kid header
     encoded_jwt = jwt.encode(
         to_encode,
-        secret_key,
-        algorithm=settings.ALGORITHM
+        signing_key.secret,
+        algorithm=settings.ALGORITHM,
+        headers={"kid": signing_key.kid},
     )
     return encoded_jwt
 
@@ -83,7 +87,7 @@ def verify_jwt_token(token: str) -> dict:
         JWTError: If the token is invalid or expired
     """
     try:
-        # Get the unverified header to check for key ID (if using multiple keys)
+        # Get the unverified header to find the signing key (kid)
         unverified_header = jwt.get_unverified_header(token)
         key_id = unverified_header.get('kid')
         
@@ -99,7 +103,7 @@ def verify_jwt_token(token: str) -> dict:
         
         # Additional verification for key expiry if needed
         key_expiry = payload.get('key_exp')
-        if key_expiry and datetime.utcnow().timestamp() > key_expiry:
+        if key_expiry and time.time() > key_expiry:
             raise jwt.ExpiredSignatureError('Key has expired')
             
         return payload
@@ -3,10 +3,16 @@
 from .crud_user import user
 from .crud_event import event
 from .crud_business import weekly_holiday_rule, business_hours
+from .crud_daily_summary import daily_summary
+from .crud_idempotency import idempotency_key
+from .crud_booked_slot import booked_slot
 
 __all__ = [
     "user",
     "event",
     "weekly_holiday_rule",
     "business_hours",
+    "daily_summary",
+    "idempotency_key",
+    "booked_slot",
 ]
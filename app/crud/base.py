@@ -1,8 +1,9 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.crud.pagination import decode_cursor, encode_cursor
 from app.db.base_class import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -25,7 +26,24 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        return db.query(self.model).order_by(self.model.id.asc()).offset(skip).limit(limit).all()
+
+    def get_page(
+        self, db: Session, *, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        id の昇順でキーセットページネーションを行います。
+        直前のページの ``next_cursor`` を渡すと続きを返し、最後のページでは ``next_cursor`` が None になります。
+        """
+        query = db.query(self.model)
+        if cursor:
+            (last_id,) = decode_cursor(cursor, (int,))
+            query = query.filter(self.model.id > last_id)
+        rows = query.order_by(self.model.id.asc()).limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor([rows[-1].id])
+        return rows, None
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
@@ -0,0 +1,123 @@
+import math
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.booked_slot import BookedSlot
+from app.models.event import CalendarEvent
+
+MINUTES_PER_DAY = 24 * 60
+# rebuild で一度に INSERT する行数
+_INSERT_CHUNK = 1000
+
+@dataclass
+class SlotRebuildResult:
+    events: int = 0
+    slots: int = 0
+    # 区切りに合っていない（外側に丸めて登録した）予約の ID
+    unaligned: List[int] = field(default_factory=list)
+    # 枠が重なったため登録しなかった予約の (ID, 先に枠を使っている予約の ID)
+    conflicts: List[Tuple[int, int]] = field(default_factory=list)
+
+class CRUDBookedSlot:
+    """
+    booked_slots の読み書き。
+    occupy・release は呼び出し元のトランザクション内で実行され、予約の変更と同時にコミットされます。
+    """
+
+    def __init__(self, minutes: int, *, validate: bool = True):
+        # アプリの import 時には枠モードが有効な場合だけ検証します（無効なら使わない設定のため）。
+        if validate and (minutes <= 0 or MINUTES_PER_DAY % minutes):
+            raise ValueError(f"BOOKING_SLOT_MINUTES には 1440 の約数を指定してください（{minutes}）。")
+        self.minutes = minutes
+
+    @staticmethod
+    def _minute_of_day(dt: datetime) -> float:
+        return (dt - datetime.combine(dt.date(), time.min)).total_seconds() / 60
+
+    def is_aligned(self, start_dt: datetime, end_dt: datetime) -> bool:
+        return all(self._minute_of_day(dt) % self.minutes == 0 for dt in (start_dt, end_dt))
+
+    def slot_range(self, start_dt: datetime, end_dt: datetime) -> Tuple[date, range]:
+        """
+        予定が占有する (日付, 枠の番号の範囲) を返します。
+        区切りに合っていない時刻（休日設定や枠モードより前の予約）は外側に丸めます。
+        """
+        day = start_dt.date()
+        end_minute = (end_dt - datetime.combine(day, time.min)).total_seconds() / 60
+        first = math.floor(self._minute_of_day(start_dt) / self.minutes)
+        last = math.ceil(min(end_minute, MINUTES_PER_DAY) / self.minutes)
+        return day, range(first, max(last, first + 1))
+
+    def occupy(self, db: Session, obj: CalendarEvent) -> None:
+        """予定の枠を登録します。ほかの予定が使っている枠があれば IntegrityError になります。"""
+        if obj.id is None:
+            db.flush()
+        day, indexes = self.slot_range(obj.start_time, obj.end_time)
+        # 同時に登録する処理どうしが逆順に待ち合わないよう、枠は番号順に INSERT します。
+        db.execute(
+            insert(BookedSlot),
+            [{"slot_date": day, "slot_index": index, "event_id": obj.id} for index in indexes],
+        )
+
+    def release(self, db: Session, *, event_id: int) -> None:
+        db.execute(
+            delete(BookedSlot)
+            .where(BookedSlot.event_id == event_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    def replace(self, db: Session, obj: CalendarEvent) -> None:
+        """時間を変更した予定の枠を登録し直します。"""
+        self.release(db, event_id=obj.id)
+        self.occupy(db, obj)
+
+    def rebuild(
+        self, db: Session, *, start_date: Optional[date] = None, end_date: Optional[date] = None
+    ) -> SlotRebuildResult:
+        """
+        指定期間（省略時は全期間）の枠を calendar_events から作り直します（コミットは呼び出し元が行います）。
+        開始日時の早い予約を優先し、枠が重なる予約は登録せずに conflicts に返します。
+        """
+        result = SlotRebuildResult()
+        stmt = delete(BookedSlot).execution_options(synchronize_session=False)
+        query = db.query(
+            CalendarEvent.id, CalendarEvent.start_time, CalendarEvent.end_time, CalendarEvent.is_holiday
+        )
+        if start_date is not None:
+            stmt = stmt.where(BookedSlot.slot_date >= start_date)
+            query = query.filter(CalendarEvent.event_date >= datetime.combine(start_date, time.min))
+        if end_date is not None:
+            stmt = stmt.where(BookedSlot.slot_date <= end_date)
+            query = query.filter(
+                CalendarEvent.event_date < datetime.combine(end_date + timedelta(days=1), time.min)
+            )
+        db.execute(stmt)
+
+        owners: Dict[Tuple[date, int], int] = {}
+        rows: List[dict] = []
+        for row in query.order_by(CalendarEvent.start_time.asc(), CalendarEvent.id.asc()).yield_per(_INSERT_CHUNK):
+            result.events += 1
+            if not row.is_holiday and not self.is_aligned(row.start_time, row.end_time):
+                result.unaligned.append(row.id)
+            day, indexes = self.slot_range(row.start_time, row.end_time)
+            owner = next((owners[(day, i)] for i in indexes if (day, i) in owners), None)
+            if owner is not None:
+                result.conflicts.append((row.id, owner))
+                continue
+            for index in indexes:
+                owners[(day, index)] = row.id
+                rows.append({"slot_date": day, "slot_index": index, "event_id": row.id})
+
+        for offset in range(0, len(rows), _INSERT_CHUNK):
+            db.execute(insert(BookedSlot), rows[offset:offset + _INSERT_CHUNK])
+        result.slots = len(rows)
+        return result
+
+booked_slot = CRUDBookedSlot(
+    minutes=settings.BOOKING_SLOT_MINUTES, validate=settings.BOOKING_SLOT_MODE
+)
@@ -1,5 +1,5 @@
 from datetime import date, timedelta, time
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from sqlalchemy.orm import Session
 
@@ -11,18 +11,41 @@ from app.schemas.business import (
     BusinessHoursCreate,
     BusinessHoursUpdate,
 )
+from app.services.rules_cache import business_rules_cache
+
+# 定休日ルール・営業時間への書き込みは、コミット前に business_rules_cache.invalidate を呼び出して
+# 更新番号を上げ、各ワーカーの営業ルールキャッシュに変更を伝えます。
 
 # ---------- WeeklyHolidayRule CRUD ----------
 class CRUDWeeklyHolidayRule(CRUDBase[WeeklyHolidayRule, WeeklyHolidayRuleCreate, WeeklyHolidayRuleUpdate]):
     def get_active(self, db: Session) -> List[WeeklyHolidayRule]:
         return db.query(WeeklyHolidayRule).filter(WeeklyHolidayRule.active == True).all()
 
+    def create(self, db: Session, *, obj_in: WeeklyHolidayRuleCreate) -> WeeklyHolidayRule:
+        business_rules_cache.invalidate(db)
+        return super().create(db, obj_in=obj_in)
+
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: WeeklyHolidayRule,
+        obj_in: Union[WeeklyHolidayRuleUpdate, Dict[str, Any]]
+    ) -> WeeklyHolidayRule:
+        business_rules_cache.invalidate(db)
+        return super().update(db, db_obj=db_obj, obj_in=obj_in)
+
+    def remove(self, db: Session, *, id: int) -> WeeklyHolidayRule:
+        business_rules_cache.invalidate(db)
+        return super().remove(db, id=id)
+
     def deactivate(self, db: Session, *, id: int) -> Optional[WeeklyHolidayRule]:
         rule = db.query(WeeklyHolidayRule).get(id)
         if not rule:
             return None
         rule.active = False
         db.add(rule)
+        business_rules_cache.invalidate(db)
         db.commit()
         db.refresh(rule)
         return rule
@@ -31,9 +54,30 @@ weekly_holiday_rule = CRUDWeeklyHolidayRule(WeeklyHolidayRule)
 
 # ---------- BusinessHours CRUD ----------
 class CRUDBusinessHours(CRUDBase[BusinessHours, BusinessHoursCreate, BusinessHoursUpdate]):
+    def get_all(self, db: Session) -> List[BusinessHours]:
+        return db.query(BusinessHours).order_by(BusinessHours.weekday.asc()).all()
+
     def get_by_weekday(self, db: Session, *, weekday: int) -> Optional[BusinessHours]:
         return db.query(BusinessHours).filter(BusinessHours.weekday == weekday).first()
 
+    def create(self, db: Session, *, obj_in: BusinessHoursCreate) -> BusinessHours:
+        business_rules_cache.invalidate(db)
+        return super().create(db, obj_in=obj_in)
+
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: BusinessHours,
+        obj_in: Union[BusinessHoursUpdate, Dict[str, Any]]
+    ) -> BusinessHours:
+        business_rules_cache.invalidate(db)
+        return super().update(db, db_obj=db_obj, obj_in=obj_in)
+
+    def remove(self, db: Session, *, id: int) -> BusinessHours:
+        business_rules_cache.invalidate(db)
+        return super().remove(db, id=id)
+
     def upsert_by_weekday(self, db: Session, *, weekday: int, open_time, close_time) -> BusinessHours:
         bh = self.get_by_weekday(db, weekday=weekday)
         if bh:
@@ -42,11 +86,12 @@ class CRUDBusinessHours(CRUDBase[BusinessHours, BusinessHoursCreate, BusinessHou
         else:
             bh = BusinessHours(weekday=weekday, open_time=open_time, close_time=close_time)
             db.add(bh)
+        business_rules_cache.invalidate(db)
         db.commit()
         db.refresh(bh)
         return bh
 
-def batch_upsert(self, db: Session, *, items: List[BusinessHoursCreate]) -> List[BusinessHours]:
+    def batch_upsert(self, db: Session, *, items: List[BusinessHoursCreate]) -> List[BusinessHours]:
         """
         営業時間設定を一括で入れ替えます。
         既存の全設定を削除し、新しい設定を挿入します。
@@ -66,6 +111,7 @@ def batch_upsert(self, db: Session, *, items: List[BusinessHoursCreate]) -> List
             ]
             
             db.add_all(new_hours_list)
+            business_rules_cache.invalidate(db)
             db.commit()
 
             # 挿入したデータを返却
@@ -74,7 +120,7 @@ def batch_upsert(self, db: Session, *, items: List[BusinessHoursCreate]) -> List
             db.rollback() # エラーが発生した場合は処理を元に戻す
             raise e
 
-def set_unified_hours(self, db: Session, *, open_time: time, close_time: time) -> List[BusinessHours]:
+    def set_unified_hours(self, db: Session, *, open_time: time, close_time: time) -> List[BusinessHours]:
         """
         全曜日の営業時間設定を、指定された単一の時間で統一します。
         既存の全設定を削除し、月曜から日曜までの新しい設定を挿入します。
@@ -90,6 +136,7 @@ def set_unified_hours(self, db: Session, *, open_time: time, close_time: time) -
             ]
             
             db.add_all(unified_hours_list)
+            business_rules_cache.invalidate(db)
             db.commit()
 
             return unified_hours_list
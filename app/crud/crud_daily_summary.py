@@ -0,0 +1,140 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.daily_summary import DailySummary
+from app.models.event import CalendarEvent
+
+# (予約数, 予約分数, 人数, 休日数) の増減
+Delta = Tuple[int, int, int, int]
+
+def event_delta(
+    *,
+    is_holiday: bool,
+    start_time: datetime,
+    end_time: datetime,
+    num_adults: Optional[int],
+    num_children: Optional[int],
+    sign: int = 1,
+) -> Delta:
+    """予定1件が日ごとの集計に与える増減を返します。削除・変更前の値を取り消す場合は sign=-1 を指定します。"""
+    if is_holiday:
+        return (0, 0, 0, sign)
+    minutes = int((end_time - start_time).total_seconds() // 60)
+    guests = (num_adults or 0) + (num_children or 0)
+    return (sign, sign * minutes, sign * guests, 0)
+
+class CRUDDailySummary:
+    """
+    daily_summary の読み書き。
+    apply は呼び出し元のトランザクション内で実行され、予約の変更と同時にコミットされます。
+    """
+
+    def get_range(self, db: Session, *, start_date: date, end_date: date) -> List[DailySummary]:
+        return (
+            db.query(DailySummary)
+            .filter(DailySummary.day >= start_date, DailySummary.day <= end_date)
+            .order_by(DailySummary.day.asc())
+            .all()
+        )
+
+    def apply(self, db: Session, changes: Iterable[Tuple[date, Delta]]) -> None:
+        """
+        日ごとの増減を加算します。
+        集計行がまだない日（rebuild 前から存在する日など）は、変更を flush した上でその日の予定から集計し直して作成します。
+        """
+        totals: Dict[date, List[int]] = {}
+        for day, delta in changes:
+            acc = totals.setdefault(day, [0, 0, 0, 0])
+            for i, value in enumerate(delta):
+                acc[i] += value
+
+        for day, (bookings, minutes, guests, holidays) in sorted(totals.items()):
+            if not (bookings or minutes or guests or holidays):
+                continue
+            stmt = (
+                update(DailySummary)
+                .where(DailySummary.day == day)
+                .values(
+                    booking_count=DailySummary.booking_count + bookings,
+                    booked_minutes=DailySummary.booked_minutes + minutes,
+                    total_guests=DailySummary.total_guests + guests,
+                    holiday_count=DailySummary.holiday_count + holidays,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if db.execute(stmt).rowcount == 0:
+                db.flush()
+                computed = self._compute(db, start_date=day, end_date=day)
+                try:
+                    with db.begin_nested():
+                        db.add(self._row(day, computed.get(day, (0, 0, 0, 0))))
+                except IntegrityError:
+                    # 日付ロックを取らない枠モード（BOOKING_SLOT_MODE）では、同じ日の最初の予約が同時に
+                    # 集計行を作ることがあります。先に作られた行には、まだコミットされていないこの変更は含まれません。
+                    db.execute(stmt)
+
+    @staticmethod
+    def _row(day: date, values: Delta) -> DailySummary:
+        return DailySummary(
+            day=day,
+            booking_count=values[0],
+            booked_minutes=values[1],
+            total_guests=values[2],
+            holiday_count=values[3],
+        )
+
+    @staticmethod
+    def _compute(
+        db: Session, *, start_date: Optional[date] = None, end_date: Optional[date] = None
+    ) -> Dict[date, Delta]:
+        """calendar_events から日ごとの集計を計算します。期間を省略した場合は全期間です。"""
+        query = db.query(
+            CalendarEvent.event_date,
+            CalendarEvent.start_time,
+            CalendarEvent.end_time,
+            CalendarEvent.num_adults,
+            CalendarEvent.num_children,
+            CalendarEvent.is_holiday,
+        )
+        if start_date is not None:
+            query = query.filter(CalendarEvent.event_date >= datetime.combine(start_date, time.min))
+        if end_date is not None:
+            query = query.filter(
+                CalendarEvent.event_date < datetime.combine(end_date + timedelta(days=1), time.min)
+            )
+
+        totals: Dict[date, List[int]] = {}
+        for row in query.yield_per(1000):
+            delta = event_delta(
+                is_holiday=row.is_holiday,
+                start_time=row.start_time,
+                end_time=row.end_time,
+                num_adults=row.num_adults,
+                num_children=row.num_children,
+            )
+            acc = totals.setdefault(row.event_date.date(), [0, 0, 0, 0])
+            for i, value in enumerate(delta):
+                acc[i] += value
+        return {day: tuple(values) for day, values in totals.items()}
+
+    def rebuild(
+        self, db: Session, *, start_date: Optional[date] = None, end_date: Optional[date] = None
+    ) -> int:
+        """指定期間（省略時は全期間）の集計を calendar_events から作り直し、作成した行数を返します。"""
+        stmt = delete(DailySummary)
+        if start_date is not None:
+            stmt = stmt.where(DailySummary.day >= start_date)
+        if end_date is not None:
+            stmt = stmt.where(DailySummary.day <= end_date)
+        db.execute(stmt.execution_options(synchronize_session=False))
+
+        computed = self._compute(db, start_date=start_date, end_date=end_date)
+        db.add_all(self._row(day, values) for day, values in sorted(computed.items()))
+        db.commit()
+        return len(computed)
+
+daily_summary = CRUDDailySummary()
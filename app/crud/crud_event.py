@@ -1,26 +1,139 @@
-from datetime import datetime, date, time
-from typing import List, Optional
+from bisect import bisect_left, insort
+from contextlib import nullcontext
+from datetime import datetime, date, time, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy import text, and_, not_, or_
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
 
+from app.core.config import settings
 from app.crud.base import CRUDBase
+from app.crud.crud_booked_slot import booked_slot
+from app.crud.crud_daily_summary import Delta, daily_summary, event_delta
+from app.crud.pagination import decode_cursor, encode_cursor
+from app.db.locks import booking_lock
 from app.models.event import CalendarEvent
 from app.schemas.event import EventCreate, EventUpdate
-from app.models.business import WeeklyHolidayRule, BusinessHours
+from app.services.conflict_index import conflict_index
+from app.services.rules_cache import BusinessRules, business_rules_cache
+from app.services.version_cache import HOLIDAYS, resource_versions
+
+def _day_bounds(start_date: date, end_date: date) -> Tuple[datetime, datetime]:
+    """[start_date 0:00, end_date の翌日 0:00) の半開区間を返します。"""
+    return (
+        datetime.combine(start_date, time.min),
+        datetime.combine(end_date + timedelta(days=1), time.min),
+    )
+
+class EventVersionMismatch(Exception):
+    """
+    予約の版番号が、読み込んだ（または If-Match で指定された）版と一致しない場合に送出されます。
+    ほかの端末が先に更新・削除したことを表します。current_version は分かる場合だけ設定されます。
+    """
+
+    def __init__(self, current_version: Optional[int] = None):
+        super().__init__("他の操作で予約が更新されています。取得し直してから再度お試しください。")
+        self.current_version = current_version
 
 class CRUDEvent(CRUDBase[CalendarEvent, EventCreate, EventUpdate]):
+    # 範囲検索のクエリは、calendar_events の複合インデックス
+    # (event_date, start_time, end_time) / (is_holiday, event_date) / (user_id, start_time) / (start_time, id)
+    # の先頭列に対する等価条件・範囲条件になるように組み立てます。
+    def query_in_date_range(self, db: Session, *, start_date: date, end_date: date) -> Query:
+        range_start, range_end = _day_bounds(start_date, end_date)
+        return db.query(self.model).filter(
+            self.model.event_date >= range_start,
+            self.model.event_date < range_end,
+        )
+
+    def query_holidays_in_date_range(self, db: Session, *, start_date: date, end_date: date) -> Query:
+        range_start, range_end = _day_bounds(start_date, end_date)
+        return db.query(self.model).filter(
+            self.model.is_holiday == True,
+            self.model.event_date >= range_start,
+            self.model.event_date < range_end,
+        )
+
+    def query_by_owner(self, db: Session, *, user_id: int) -> Query:
+        return db.query(self.model).filter(self.model.user_id == user_id)
+
+    def query_conflicts(
+        self,
+        db: Session,
+        *,
+        start_dt: datetime,
+        end_dt: datetime,
+        exclude_id: Optional[int] = None,
+    ) -> Query:
+        """[start_dt, end_dt) と重なる同じ日のイベントを検索するクエリ。"""
+        day_start, day_end = _day_bounds(start_dt.date(), start_dt.date())
+        query = db.query(self.model).filter(
+            self.model.event_date >= day_start,
+            self.model.event_date < day_end,
+            self.model.start_time < end_dt,
+            self.model.end_time > start_dt,
+        )
+        if exclude_id is not None:
+            query = query.filter(self.model.id != exclude_id)
+        return query
+
+    def _keyset_page(
+        self, query: Query, *, cursor: Optional[str], limit: int
+    ) -> Tuple[List[CalendarEvent], Optional[str]]:
+        """(start_time, id) の昇順でキーセットページネーションを行います。"""
+        if cursor:
+            last_start, last_id = decode_cursor(cursor, (datetime, int))
+            query = query.filter(
+                or_(
+                    self.model.start_time > last_start,
+                    and_(self.model.start_time == last_start, self.model.id > last_id),
+                )
+            )
+        rows = (
+            query.order_by(self.model.start_time.asc(), self.model.id.asc())
+            .limit(limit + 1)
+            .all()
+        )
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor([rows[-1].start_time, rows[-1].id])
+        return rows, None
+
+    def get_multi(
+        self, db: Session, *, skip: int = 0, limit: int = 100
+    ) -> List[CalendarEvent]:
+        return (
+            db.query(self.model)
+            .order_by(self.model.start_time.asc(), self.model.id.asc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def get_page(
+        self, db: Session, *, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[CalendarEvent], Optional[str]]:
+        return self._keyset_page(db.query(self.model), cursor=cursor, limit=limit)
+
     def get_multi_by_owner(
         self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100
     ) -> List[CalendarEvent]:
         return (
-            db.query(self.model)
-            .filter(CalendarEvent.user_id == user_id)
+            self.query_by_owner(db, user_id=user_id)
+            .order_by(self.model.start_time.asc(), self.model.id.asc())
             .offset(skip)
             .limit(limit)
             .all()
         )
 
+    def get_page_by_owner(
+        self, db: Session, *, user_id: int, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[CalendarEvent], Optional[str]]:
+        query = self.query_by_owner(db, user_id=user_id)
+        return self._keyset_page(query, cursor=cursor, limit=limit)
+
     def get_events_in_date_range(
         self,
         db: Session,
@@ -30,16 +143,32 @@ class CRUDEvent(CRUDBase[CalendarEvent, EventCreate, EventUpdate]):
         skip: int = 0,
         limit: int = 100
     ) -> List[CalendarEvent]:
-        start_dt = datetime.combine(start_date, time.min)
-        end_dt = datetime.combine(end_date, time.max)
         return (
-            db.query(self.model)
-            .filter(CalendarEvent.event_date.between(start_dt, end_dt))
+            self.query_in_date_range(db, start_date=start_date, end_date=end_date)
+            .order_by(self.model.start_time.asc(), self.model.id.asc())
             .offset(skip)
             .limit(limit)
             .all()
         )
 
+    def get_page_in_date_range(
+        self,
+        db: Session,
+        *,
+        start_date: date,
+        end_date: date,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Tuple[List[CalendarEvent], Optional[str]]:
+        # event_date と start_time は常に同じ日時なので、範囲条件を start_time に付けて
+        # (start_time, id) のインデックスで範囲の絞り込みと並べ替えを同時に行います。
+        range_start, range_end = _day_bounds(start_date, end_date)
+        query = db.query(self.model).filter(
+            self.model.start_time >= range_start,
+            self.model.start_time < range_end,
+        )
+        return self._keyset_page(query, cursor=cursor, limit=limit)
+
     def get_holidays_in_date_range(
         self,
         db: Session,
@@ -47,83 +176,235 @@ class CRUDEvent(CRUDBase[CalendarEvent, EventCreate, EventUpdate]):
         start_date: date,
         end_date: date
     ) -> List[CalendarEvent]:
-        start_dt = datetime.combine(start_date, time.min)
-        end_dt = datetime.combine(end_date, time.max)
-        return (
-            db.query(self.model)
-            .filter(CalendarEvent.is_holiday == True)
-            .filter(CalendarEvent.event_date.between(start_dt, end_dt))
+        return self.query_holidays_in_date_range(
+            db, start_date=start_date, end_date=end_date
+        ).all()
+
+    def get_intervals_in_date_range(
+        self,
+        db: Session,
+        *,
+        start_date: date,
+        end_date: date
+    ) -> List[Tuple[datetime, datetime]]:
+        """期間内の全イベント（休日を含む）の (開始日時, 終了日時) を、ORMオブジェクトを作らずに取得します。"""
+        range_start, range_end = _day_bounds(start_date, end_date)
+        rows = (
+            db.query(self.model.start_time, self.model.end_time)
+            .filter(
+                self.model.event_date >= range_start,
+                self.model.event_date < range_end,
+            )
             .all()
         )
+        return [(row.start_time, row.end_time) for row in rows]
+
+    def query_last_modified(self, db: Session) -> Query:
+        """全期間の最終更新日時。ix_calendar_events_updated_at の末尾を読むだけで求まります。"""
+        return db.query(func.max(self.model.updated_at))
+
+    def get_change_marker(
+        self,
+        db: Session,
+        *,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Tuple[int, Optional[datetime]]:
+        """
+        期間内（省略時は全期間）の (件数, 最終更新日時) を返します。
+        作成・更新・削除のいずれかがあれば値が変わるため、ETag の元として使えます。
+        """
+        if start_date is None and end_date is None:
+            # 件数と同じ SELECT にすると max がインデックスで求まらなくなるため、別々に実行します。
+            count = db.query(func.count(self.model.id)).scalar()
+            return count, self.query_last_modified(db).scalar()
+        query = db.query(func.count(self.model.id), func.max(self.model.updated_at))
+        if start_date is not None:
+            query = query.filter(self.model.event_date >= datetime.combine(start_date, time.min))
+        if end_date is not None:
+            query = query.filter(
+                self.model.event_date < datetime.combine(end_date + timedelta(days=1), time.min)
+            )
+        count, last_modified = query.one()
+        return count, last_modified
 
     def _combine_dt(self, d: date, t: time) -> datetime:
         return datetime.combine(d, t)
 
+    def _find_conflict(
+        self,
+        db: Session,
+        *,
+        start_dt: datetime,
+        end_dt: datetime,
+        exclude_id: Optional[int] = None,
+    ) -> Optional[CalendarEvent]:
+        """
+        [start_dt, end_dt) と重なるイベントを返します。日付ロックを取得した状態で呼び出してください。
+        重複判定インデックスが有効な場合はまずインデックスを二分探索し、重なりが見つかればその行だけを主キーで確認します。
+        見つからなければ、SKIP_DB_CHECK のときはそのまま None を返し、それ以外は範囲検索で ID だけを確認します
+        （複合インデックスだけで判定でき、重なりがあった場合にだけ行を読み込みます）。
+        """
+        day = start_dt.date()
+        if settings.CONFLICT_INDEX_ENABLED:
+            if settings.CONFLICT_INDEX_VERIFY:
+                conflict_index.verify_day(db, day)
+            conflict_id = conflict_index.find_conflict(
+                db, start=start_dt, end=end_dt, exclude_id=exclude_id
+            )
+            if conflict_id is not None:
+                conflict = (
+                    db.query(self.model)
+                    .filter(self.model.id == conflict_id)
+                    .with_for_update()
+                    .first()
+                )
+                if conflict and conflict.start_time < end_dt and conflict.end_time > start_dt:
+                    return conflict
+                # 他のワーカーで変更・削除済み。読み直してDBで判定します。
+                conflict_index.invalidate(day)
+            elif settings.CONFLICT_INDEX_SKIP_DB_CHECK:
+                return None
+            else:
+                missed_id = (
+                    self.query_conflicts(db, start_dt=start_dt, end_dt=end_dt, exclude_id=exclude_id)
+                    .with_entities(self.model.id)
+                    .with_for_update()
+                    .limit(1)
+                    .scalar()
+                )
+                if missed_id is None:
+                    return None
+                # インデックスが見逃した重なり（他ワーカーの書き込み）なので、その日を読み直させます。
+                conflict_index.invalidate(day)
+                return db.get(self.model, missed_id)
+
+        conflict = (
+            self.query_conflicts(db, start_dt=start_dt, end_dt=end_dt, exclude_id=exclude_id)
+            .with_for_update()
+            .first()
+        )
+        return conflict
+
+    def _day_lock(self, db: Session, keys, timeout: Optional[float], *, slot_mode: bool):
+        """日付ロック。枠モードでは重複を booked_slots の一意制約で検出するため、ロックを取りません。"""
+        if slot_mode:
+            return nullcontext()
+        return booking_lock.acquire(db, keys, timeout=timeout)
+
+    @staticmethod
+    def _check_slot_alignment(start_dt: datetime, end_dt: datetime) -> None:
+        if not booked_slot.is_aligned(start_dt, end_dt):
+            raise ValueError("開始・終了時刻が予約枠の区切りに合っていません。")
+
+    @staticmethod
+    def _occupy_slots(db: Session, obj: CalendarEvent, *, replace: bool = False) -> None:
+        """
+        枠モードで予定の枠を登録します。ほかの予定が使っている枠があればトランザクションを取り消し、
+        重複のエラー（ValueError）にします。
+        """
+        try:
+            if replace:
+                booked_slot.replace(db, obj)
+            else:
+                booked_slot.occupy(db, obj)
+        except IntegrityError:
+            db.rollback()
+            raise ValueError("その時間枠はすでに予約されています。")
+
+    @staticmethod
+    def _commit_indexed(
+        db: Session,
+        added: Iterable[CalendarEvent] = (),
+        removed: Iterable[Tuple[int, datetime, datetime]] = (),
+    ) -> None:
+        """
+        コミットし、重複判定インデックスに added の区間を加え、removed の (ID, 開始, 終了) を取り除きます。
+        MySQL・PostgreSQL の日付ロックはコミットで解放されるため、追加はコミットの前（ロックを保持している間）に行います。
+        削除はコミットの後に行います。それまで残る古い区間は、見つかった重なりを主キーで確認するため誤判定になりません。
+        コミットに失敗した場合は、区間を追加した日を破棄して読み直させます。
+        """
+        if not settings.CONFLICT_INDEX_ENABLED:
+            db.commit()
+            return
+        db.flush()
+        added = {(obj.id, obj.start_time, obj.end_time) for obj in added}
+        removed = set(removed)
+        # 変わっていない区間はそのまま残します。
+        added, removed = added - removed, removed - added
+        for event_id, start, end in added:
+            conflict_index.add(event_id, start, end)
+        try:
+            db.commit()
+        except BaseException:
+            for _, start, _ in added:
+                conflict_index.invalidate(start.date())
+            raise
+        for event_id, start, end in removed:
+            conflict_index.remove(event_id, start.date(), start, end)
+
     def create_with_overlap_check(
         self,
         db: Session,
         *,
         obj_in: EventCreate,
-        lock_timeout_sec: int = 5,
+        lock_timeout_sec: Optional[float] = None,
         skip_business_rules: bool | None = None,
+        before_commit: Optional[Callable[[Session, CalendarEvent], None]] = None,
     ) -> CalendarEvent:
+        """
+        予約を作成します（休日設定は重なる休日に統合します）。
+        before_commit は作成・統合したイベントを引数にコミットの直前に呼ばれ、同じトランザクションで書き込みができます。
+        """
         
         # 予約日が過去の日付でないかチェック
         if obj_in.event_date < date.today():
             raise ValueError("過去の日付には予約できません。")
 
+        # 枠モードでも、休日設定は既存の休日との統合のため日付ロックと範囲検索を使います。
+        slot_mode = settings.BOOKING_SLOT_MODE and not getattr(obj_in, "is_holiday", False)
         lock_key = f"event:{obj_in.event_date.isoformat()}"
-        db.execute(text("SELECT GET_LOCK(:k, :t)"), {"k": lock_key, "t": lock_timeout_sec})
-        try:
+        with self._day_lock(db, lock_key, lock_timeout_sec, slot_mode=slot_mode):
             start_dt = self._combine_dt(obj_in.event_date, obj_in.start_time)
             end_dt = self._combine_dt(obj_in.event_date, obj_in.end_time)
 
             if end_dt <= start_dt:
                 raise ValueError("終了時刻は開始時刻より後に設定してください。")
+            if slot_mode:
+                self._check_slot_alignment(start_dt, end_dt)
 
             if skip_business_rules is None:
                 skip_business_rules = bool(getattr(obj_in, "is_holiday", False))
 
             if not skip_business_rules:
-                weekday = start_dt.weekday()
-                rule = (
-                    db.query(WeeklyHolidayRule)
-                    .filter(WeeklyHolidayRule.active == True, WeeklyHolidayRule.weekday == weekday)
-                ).first()
-                if rule:
-                    raise ValueError("選択された日付は定休日です。")
-
-                bh = db.query(BusinessHours).filter(BusinessHours.weekday == weekday).first()
-                if bh:
-                    if not (bh.open_time <= start_dt.time() and end_dt.time() <= bh.close_time):
-                        raise ValueError("時間は営業時間外です。")
-            
-            day_start = datetime.combine(start_dt.date(), time.min)
-            day_end = datetime.combine(start_dt.date(), time.max)
-
-            conflict = (
-                db.query(self.model)
-                .filter(self.model.event_date.between(day_start, day_end))
-                .filter(
-                    not_(
-                        or_(
-                            self.model.end_time <= start_dt,
-                            self.model.start_time >= end_dt,
-                        )
-                    )
+                self._validate_business_rules(
+                    business_rules_cache.get(db), start_dt=start_dt, end_dt=end_dt
                 )
-                .with_for_update()
-                .first()
-            )
+            
+            conflict = None if slot_mode else self._find_conflict(db, start_dt=start_dt, end_dt=end_dt)
 
             if conflict:
                 if getattr(obj_in, "is_holiday", False) and getattr(conflict, "is_holiday", False):
+                    summary_changes = [self._summary_delta(conflict, sign=-1)]
+                    original = (conflict.id, conflict.start_time, conflict.end_time)
                     conflict.holiday_name = obj_in.holiday_name or conflict.holiday_name
                     conflict.event_date = start_dt
                     conflict.start_time = start_dt
                     conflict.end_time = end_dt
                     db.add(conflict)
-                    db.commit()
+                    try:
+                        if settings.BOOKING_SLOT_MODE:
+                            self._occupy_slots(db, conflict, replace=True)
+                        summary_changes.append(self._summary_delta(conflict))
+                        daily_summary.apply(db, summary_changes)
+                        resource_versions.bump(db, HOLIDAYS)
+                        if before_commit is not None:
+                            before_commit(db, conflict)
+                        self._commit_indexed(db, [conflict], [original])
+                    except StaleDataError:
+                        # 枠モードの更新・削除は日付ロックを取らないため、統合先の休日が先に変更されることがあります。
+                        db.rollback()
+                        raise ValueError("統合先の休日が他の操作で変更されました。再度お試しください。")
                     db.refresh(conflict)
                     return conflict
                 raise ValueError("その時間枠はすでに予約されています。")
@@ -142,16 +423,39 @@ class CRUDEvent(CRUDBase[CalendarEvent, EventCreate, EventUpdate]):
                 holiday_name=obj_in.holiday_name,
             )
             db.add(db_obj)
-            db.commit()
+            if settings.BOOKING_SLOT_MODE:
+                self._occupy_slots(db, db_obj)
+            daily_summary.apply(db, [self._summary_delta(db_obj)])
+            if db_obj.is_holiday:
+                resource_versions.bump(db, HOLIDAYS)
+            if before_commit is not None:
+                before_commit(db, db_obj)
+            self._commit_indexed(db, [db_obj])
             db.refresh(db_obj)
             return db_obj
-        finally:
-            db.execute(text("SELECT RELEASE_LOCK(:k)"), {"k": lock_key})
 
-    def update_with_overlap_check(self, db: Session, *, event_id: int, obj_in: EventUpdate, lock_timeout_sec: int = 5) -> CalendarEvent:
+    def update_with_overlap_check(
+        self,
+        db: Session,
+        *,
+        event_id: int,
+        obj_in: EventUpdate,
+        expected_version: Optional[int] = None,
+        lock_timeout_sec: Optional[float] = None,
+        before_commit: Optional[Callable[[Session, CalendarEvent], None]] = None,
+    ) -> CalendarEvent:
+        """
+        予約を更新します。行はロックせず、UPDATE ... WHERE id = ? AND version = ? で書き込みます。
+        expected_version（If-Match の版）と違う場合や、読み込んだ後にほかの処理が更新していた場合は
+        EventVersionMismatch を送出します。
+        before_commit は create_with_overlap_check と同じく、コミットの直前に同じトランザクションで呼ばれます。
+        枠モードでは日付ロックと範囲検索を行わず、枠を登録し直して重複を検出します。
+        """
         db_obj = db.query(self.model).get(event_id)
         if not db_obj:
             raise ValueError("Event not found")
+        if expected_version is not None and db_obj.version != expected_version:
+            raise EventVersionMismatch(db_obj.version)
 
         cur_date = db_obj.event_date.date()
         cur_start_dt = db_obj.start_time
@@ -166,47 +470,30 @@ class CRUDEvent(CRUDBase[CalendarEvent, EventCreate, EventUpdate]):
         new_start_t = obj_in.start_time if obj_in.start_time is not None else cur_start_dt.time()
         new_end_t = obj_in.end_time if obj_in.end_time is not None else cur_end_dt.time()
 
-        lock_key = f"event:{new_date.isoformat()}"
-        db.execute(text("SELECT GET_LOCK(:k, :t)"), {"k": lock_key, "t": lock_timeout_sec})
-        try:
+        slot_mode = settings.BOOKING_SLOT_MODE
+        is_holiday = obj_in.is_holiday if obj_in.is_holiday is not None else db_obj.is_holiday
+        # 日付を移動する場合は、移動元の日の集計も変わるため両方の日をロックします。
+        lock_keys = [f"event:{day.isoformat()}" for day in sorted({cur_date, new_date})]
+        with self._day_lock(db, lock_keys, lock_timeout_sec, slot_mode=slot_mode):
             start_dt = datetime.combine(new_date, new_start_t)
             end_dt = datetime.combine(new_date, new_end_t)
             if end_dt <= start_dt:
                 raise ValueError("終了時刻は開始時刻より後に設定してください。")
+            if slot_mode and not is_holiday:
+                self._check_slot_alignment(start_dt, end_dt)
 
-            weekday = start_dt.weekday()
-            rule = (
-                db.query(WeeklyHolidayRule)
-                .filter(WeeklyHolidayRule.active == True, WeeklyHolidayRule.weekday == weekday)
-            ).first()
-            if rule:
-                raise ValueError("選択された日付は定休日です。")
-
-            bh = db.query(BusinessHours).filter(BusinessHours.weekday == weekday).first()
-            if bh:
-                if not (bh.open_time <= start_dt.time() and end_dt.time() <= bh.close_time):
-                    raise ValueError("時間は営業時間外です。")
-
-            day_start = datetime.combine(start_dt.date(), time.min)
-            day_end = datetime.combine(start_dt.date(), time.max)
-            conflict = (
-                db.query(self.model)
-                .filter(self.model.event_date.between(day_start, day_end))
-                .filter(self.model.id != event_id)
-                .filter(
-                    not_(
-                        or_(
-                            self.model.end_time <= start_dt,
-                            self.model.start_time >= end_dt,
-                        )
-                    )
-                )
-                .with_for_update()
-                .first()
+            self._validate_business_rules(
+                business_rules_cache.get(db), start_dt=start_dt, end_dt=end_dt
+            )
+
+            conflict = None if slot_mode else self._find_conflict(
+                db, start_dt=start_dt, end_dt=end_dt, exclude_id=event_id
             )
             if conflict:
                 raise ValueError("その時間枠はすでに予約されています。")
 
+            summary_changes = [self._summary_delta(db_obj, sign=-1)]
+            was_holiday = db_obj.is_holiday
             db_obj.event_date = start_dt
             db_obj.start_time = start_dt
             db_obj.end_time = end_dt
@@ -220,10 +507,280 @@ class CRUDEvent(CRUDBase[CalendarEvent, EventCreate, EventUpdate]):
                     setattr(db_obj, field, val)
 
             db.add(db_obj)
-            db.commit()
+            summary_changes.append(self._summary_delta(db_obj))
+            try:
+                if slot_mode and (db_obj.start_time, db_obj.end_time) != (cur_start_dt, cur_end_dt):
+                    self._occupy_slots(db, db_obj, replace=True)
+                daily_summary.apply(db, summary_changes)
+                if was_holiday or db_obj.is_holiday:
+                    resource_versions.bump(db, HOLIDAYS)
+                if before_commit is not None:
+                    before_commit(db, db_obj)
+                self._commit_indexed(db, [db_obj], [(event_id, cur_start_dt, cur_end_dt)])
+            except StaleDataError:
+                db.rollback()
+                raise EventVersionMismatch()
             db.refresh(db_obj)
             return db_obj
-        finally:
-            db.execute(text("SELECT RELEASE_LOCK(:k)"), {"k": lock_key})
+
+    def _validate_business_rules(
+        self,
+        rules: BusinessRules,
+        *,
+        start_dt: datetime,
+        end_dt: datetime,
+    ) -> None:
+        """定休日・営業時間のルールを検証します。違反していれば ValueError を送出します。"""
+        weekday = start_dt.weekday()
+        if rules.closed[weekday]:
+            raise ValueError("選択された日付は定休日です。")
+        bh = rules.hours[weekday]
+        if bh:
+            if not (bh.open_time <= start_dt.time() and end_dt.time() <= bh.close_time):
+                raise ValueError("時間は営業時間外です。")
+
+    def create_batch_with_overlap_check(
+        self,
+        db: Session,
+        *,
+        items: List[EventCreate],
+        atomic: bool = True,
+        lock_timeout_sec: Optional[float] = None,
+    ) -> List[Tuple[Optional[CalendarEvent], Optional[str]]]:
+        """
+        複数の予約をまとめて作成します。
+
+        日付ごとのロックは1回だけ取得し、定休日・営業時間は1回の読み込みで全件を判定します。
+        既存の予約との重複と、バッチ内の予約同士の重複は日付ごとに1回の走査で検出し、
+        受け付けた予約は1つのトランザクションで登録します。
+        休日の項目は create_with_overlap_check と同じく、最初に重なる予定が休日（既存・バッチ内の先の項目）なら
+        その休日に統合します（統合した項目の結果は統合後のイベントです）。
+        枠モードでもロックと走査は行い、あわせて枠を登録します（ロックを取らない単体の予約との重複は枠で検出します）。
+
+        Returns:
+            items と同じ順序の (作成したイベント, エラーメッセージ) のリスト。
+            atomic=True で1件でもエラーがあれば何も登録せず、エラーのない項目は (None, None) になります。
+        """
+        today = date.today()
+        results: List[Tuple[Optional[CalendarEvent], Optional[str]]] = [(None, None)] * len(items)
+        spans: Dict[int, Tuple[datetime, datetime]] = {}
+
+        for idx, obj_in in enumerate(items):
+            if obj_in.event_date < today:
+                results[idx] = (None, "過去の日付には予約できません。")
+                continue
+            start_dt = self._combine_dt(obj_in.event_date, obj_in.start_time)
+            end_dt = self._combine_dt(obj_in.event_date, obj_in.end_time)
+            if end_dt <= start_dt:
+                results[idx] = (None, "終了時刻は開始時刻より後に設定してください。")
+                continue
+            if settings.BOOKING_SLOT_MODE and not obj_in.is_holiday:
+                try:
+                    self._check_slot_alignment(start_dt, end_dt)
+                except ValueError as e:
+                    results[idx] = (None, str(e))
+                    continue
+            spans[idx] = (start_dt, end_dt)
+
+        rules = business_rules_cache.get(db)
+        for idx, (start_dt, end_dt) in list(spans.items()):
+            if items[idx].is_holiday:
+                continue
+            try:
+                self._validate_business_rules(rules, start_dt=start_dt, end_dt=end_dt)
+            except ValueError as e:
+                results[idx] = (None, str(e))
+                del spans[idx]
+
+        # デッドロックを避けるため、ロックは日付順に取得します。
+        days = sorted({start_dt.date() for start_dt, _ in spans.values()})
+        lock_keys = [f"event:{day.isoformat()}" for day in days]
+        with booking_lock.acquire(db, lock_keys, timeout=lock_timeout_sec):
+            # 占有区間 (開始, 終了, 番号)。番号で owners から区間の持ち主を引きます。
+            occupied: Dict[date, List[Tuple[datetime, datetime, int]]] = {day: [] for day in days}
+            # (休日か, 既存の行の ID, バッチの項目の番号)
+            owners: List[Tuple[bool, Optional[int], Optional[int]]] = []
+            if days:
+                existing = (
+                    db.query(
+                        self.model.id, self.model.start_time, self.model.end_time, self.model.is_holiday
+                    )
+                    .filter(
+                        or_(
+                            *[
+                                and_(
+                                    self.model.event_date >= day_start,
+                                    self.model.event_date < day_end,
+                                )
+                                for day_start, day_end in (_day_bounds(day, day) for day in days)
+                            ]
+                        )
+                    )
+                    .with_for_update()
+                    .all()
+                )
+                for row in existing:
+                    occupied[row.start_time.date()].append((row.start_time, row.end_time, len(owners)))
+                    owners.append((bool(row.is_holiday), row.id, None))
+                for intervals in occupied.values():
+                    intervals.sort()
+
+            # 休日の項目は、単体の作成と同じく重なる休日（既存の行・先のバッチの項目）に統合します。
+            # 統合先の既存の行 ID → 統合後の (開始, 終了, 休日名)。休日名が None なら元の名前のままです。
+            row_merges: Dict[int, Tuple[datetime, datetime, Optional[str]]] = {}
+            holiday_names: Dict[int, Optional[str]] = {}
+            # 統合した項目の番号 → (統合先の行 ID, 統合先の項目の番号)
+            merged_into: Dict[int, Tuple[Optional[int], Optional[int]]] = {}
+
+            # 先に指定された項目を優先し、受け付けた項目はその日の占有区間に加えていきます。
+            for idx in sorted(spans):
+                start_dt, end_dt = spans[idx]
+                intervals = occupied[start_dt.date()]
+                pos = bisect_left(intervals, (end_dt,))
+                overlaps = [entry for entry in intervals[:pos] if entry[1] > start_dt]
+                if not overlaps:
+                    insort(intervals, (start_dt, end_dt, len(owners)))
+                    owners.append((bool(items[idx].is_holiday), None, idx))
+                    continue
+                del spans[idx]
+                target = overlaps[0]
+                target_holiday, row_id, target_idx = owners[target[2]]
+                if not (items[idx].is_holiday and target_holiday):
+                    results[idx] = (None, "その時間枠はすでに予約されています。")
+                    continue
+                intervals.remove(target)
+                insort(intervals, (start_dt, end_dt, target[2]))
+                if row_id is not None:
+                    name = items[idx].holiday_name or row_merges.get(row_id, (None, None, None))[2]
+                    row_merges[row_id] = (start_dt, end_dt, name)
+                else:
+                    spans[target_idx] = (start_dt, end_dt)
+                    holiday_names[target_idx] = items[idx].holiday_name or holiday_names.get(
+                        target_idx, items[target_idx].holiday_name
+                    )
+                merged_into[idx] = (row_id, target_idx)
+
+            if atomic and any(error is not None for _, error in results):
+                db.rollback()
+                return results
+
+            created: Dict[int, CalendarEvent] = {}
+            for idx, (start_dt, end_dt) in spans.items():
+                obj_in = items[idx]
+                created[idx] = self.model(
+                    event_date=start_dt,
+                    start_time=start_dt,
+                    end_time=end_dt,
+                    representative_name=obj_in.representative_name,
+                    phone_number=obj_in.phone_number,
+                    num_adults=obj_in.num_adults,
+                    num_children=obj_in.num_children,
+                    notes=obj_in.notes,
+                    plan=obj_in.plan,
+                    is_holiday=obj_in.is_holiday,
+                    holiday_name=holiday_names.get(idx, obj_in.holiday_name),
+                )
+            db.add_all(created.values())
+
+            merged: Dict[int, CalendarEvent] = {}
+            # 統合前の (日付, 開始, 終了, 休日名) と集計の増減
+            originals: Dict[int, Tuple[datetime, datetime, datetime, Optional[str]]] = {}
+            removed_deltas: Dict[int, Tuple[date, Delta]] = {}
+            if row_merges:
+                for row in db.query(self.model).filter(self.model.id.in_(list(row_merges))).all():
+                    start_dt, end_dt, name = row_merges[row.id]
+                    originals[row.id] = (row.event_date, row.start_time, row.end_time, row.holiday_name)
+                    removed_deltas[row.id] = self._summary_delta(row, sign=-1)
+                    row.holiday_name = name or row.holiday_name
+                    row.event_date = start_dt
+                    row.start_time = start_dt
+                    row.end_time = end_dt
+                    merged[row.id] = row
+            db.flush()
+            if settings.BOOKING_SLOT_MODE:
+                # 走査の後に、ロックを取らない単体の予約が同じ枠を登録していた項目だけを拒否します。
+                slot_targets = [(created, idx, obj, False) for idx, obj in created.items()]
+                slot_targets += [(merged, row_id, row, True) for row_id, row in merged.items()]
+                for targets, key, obj, replace in slot_targets:
+                    try:
+                        with db.begin_nested():
+                            if replace:
+                                booked_slot.replace(db, obj)
+                            else:
+                                booked_slot.occupy(db, obj)
+                    except IntegrityError:
+                        del targets[key]
+                        if not replace:
+                            results[key] = (None, "その時間枠はすでに予約されています。")
+                        if atomic:
+                            db.rollback()
+                            return results
+                        if replace:
+                            obj.event_date, obj.start_time, obj.end_time, obj.holiday_name = originals[key]
+                        else:
+                            db.delete(obj)
+            ids = [obj.id for obj in created.values()] + list(merged)
+            summary_changes = [self._summary_delta(obj) for obj in created.values()]
+            for row_id, row in merged.items():
+                summary_changes += [removed_deltas[row_id], self._summary_delta(row)]
+            daily_summary.apply(db, summary_changes)
+            if merged or any(obj.is_holiday for obj in created.values()):
+                resource_versions.bump(db, HOLIDAYS)
+            self._commit_indexed(
+                db,
+                [*created.values(), *merged.values()],
+                [(row_id, originals[row_id][1], originals[row_id][2]) for row_id in merged],
+            )
+
+            if ids:
+                # commit で失効した属性を1回のクエリでまとめて読み直します。
+                db.query(self.model).filter(self.model.id.in_(ids)).all()
+            for idx, db_obj in created.items():
+                results[idx] = (db_obj, None)
+            self._set_merged_results(results, merged_into, created, merged)
+            return results
+
+    @staticmethod
+    def _set_merged_results(
+        results: List[Tuple[Optional[CalendarEvent], Optional[str]]],
+        merged_into: Dict[int, Tuple[Optional[int], Optional[int]]],
+        created: Dict[int, CalendarEvent],
+        merged: Dict[int, CalendarEvent],
+    ) -> None:
+        """統合した休日の項目に、統合先の結果（統合後のイベント、または統合先が拒否された場合のエラー）を設定します。"""
+        for idx, (row_id, target_idx) in merged_into.items():
+            target = merged.get(row_id) if row_id is not None else created.get(target_idx)
+            results[idx] = (target, None) if target is not None else (None, "その時間枠はすでに予約されています。")
+
+    def remove(self, db: Session, *, id: int) -> CalendarEvent:
+        obj = db.query(self.model).get(id)
+        day = obj.event_date.date()
+        slot_mode = settings.BOOKING_SLOT_MODE
+        with self._day_lock(db, f"event:{day.isoformat()}", None, slot_mode=slot_mode):
+            if slot_mode:
+                booked_slot.release(db, event_id=id)
+            db.delete(obj)
+            try:
+                daily_summary.apply(db, [self._summary_delta(obj, sign=-1)])
+                if obj.is_holiday:
+                    resource_versions.bump(db, HOLIDAYS)
+                self._commit_indexed(db, removed=[(id, obj.start_time, obj.end_time)])
+            except StaleDataError:
+                # 読み込んだ後に別の日へ移動された場合など。集計を古い値で減らさないよう削除をやり直させます。
+                db.rollback()
+                raise EventVersionMismatch()
+        return obj
+
+    @staticmethod
+    def _summary_delta(obj: CalendarEvent, sign: int = 1) -> Tuple[date, Delta]:
+        """予定が daily_summary に与える (日付, 増減) を返します。"""
+        return obj.event_date.date(), event_delta(
+            is_holiday=bool(obj.is_holiday),
+            start_time=obj.start_time,
+            end_time=obj.end_time,
+            num_adults=obj.num_adults,
+            num_children=obj.num_children,
+            sign=sign,
+        )
 
 event = CRUDEvent(CalendarEvent)
\ No newline at end of file
@@ -0,0 +1,165 @@
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.idempotency_key import IdempotencyKey
+
+class CRUDIdempotencyKey:
+    """
+    Idempotency-Key ごとのレスポンスを読み書きします。
+    キーの登録・削除とエラーのレスポンスの保存は、予約のロックやトランザクションとは関係なく
+    別の接続で即座にコミットします（TableLeaseLock と同じ方式）。
+    予約を作成・更新したレスポンスは complete_in_session で予約と同じトランザクションに書き込みます。
+    """
+
+    def get(self, db: Session, *, scope: str, key: str) -> Optional[Row]:
+        """期限内の行を主キーで1回だけ引きます。"""
+        with db.get_bind().connect() as conn:
+            return conn.execute(
+                select(
+                    IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.body
+                ).where(
+                    IdempotencyKey.scope == scope,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.expires_at >= datetime.utcnow(),
+                )
+            ).first()
+
+    def claim(
+        self, db: Session, *, scope: str, key: str, request_hash: str, pending_seconds: float
+    ) -> Optional[str]:
+        """
+        キーを「処理中」として登録し、保存・削除に使う claim_token を返します。
+        ほかのリクエストが処理中・保存済みの場合は None を返します。
+        期限切れの行は上書きします。処理中の行を引き継いでも、元のリクエストの complete_in_session は
+        claim_token が一致しないため失敗し、予約はコミットされません。
+        """
+        now = datetime.utcnow()
+        token = secrets.token_hex(16)
+        values = dict(
+            request_hash=request_hash,
+            claim_token=token,
+            status_code=None,
+            body=None,
+            expires_at=now + timedelta(seconds=pending_seconds),
+        )
+        bind = db.get_bind()
+        try:
+            with bind.begin() as conn:
+                conn.execute(insert(IdempotencyKey).values(scope=scope, key=key, **values))
+            return token
+        except IntegrityError:
+            pass
+        with bind.begin() as conn:
+            result = conn.execute(
+                update(IdempotencyKey)
+                .where(
+                    IdempotencyKey.scope == scope,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.expires_at < now,
+                )
+                .values(**values)
+            )
+        return token if result.rowcount == 1 else None
+
+    def _complete_stmt(
+        self, *, scope: str, key: str, claim_token: str, status_code: int, body: bytes, ttl_seconds: float
+    ):
+        return (
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.claim_token == claim_token,
+                IdempotencyKey.status_code.is_(None),
+            )
+            .values(
+                status_code=status_code,
+                body=body,
+                expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def complete(
+        self,
+        db: Session,
+        *,
+        scope: str,
+        key: str,
+        claim_token: str,
+        status_code: int,
+        body: bytes,
+        ttl_seconds: float,
+    ) -> bool:
+        """
+        処理中の行にレスポンス（予約を変更しなかった 4xx）を別の接続で保存し、期限を TTL まで延ばします。
+        ほかのリクエストに引き継がれていた場合は何もせず False を返します。
+        """
+        with db.get_bind().begin() as conn:
+            result = conn.execute(
+                self._complete_stmt(
+                    scope=scope,
+                    key=key,
+                    claim_token=claim_token,
+                    status_code=status_code,
+                    body=body,
+                    ttl_seconds=ttl_seconds,
+                )
+            )
+        return result.rowcount == 1
+
+    def complete_in_session(
+        self,
+        db: Session,
+        *,
+        scope: str,
+        key: str,
+        claim_token: str,
+        status_code: int,
+        body: bytes,
+        ttl_seconds: float,
+    ) -> bool:
+        """
+        complete と同じ UPDATE を、呼び出し元（予約の作成・更新）のトランザクション内で実行します（コミットは呼び出し元が行います）。
+        予約とレスポンスは同時にコミットされるため、予約だけが登録されて再試行が二重に予約することはありません。
+        ほかのリクエストに引き継がれていた場合は False を返すので、呼び出し元はロールバックしてください。
+        """
+        result = db.execute(
+            self._complete_stmt(
+                scope=scope,
+                key=key,
+                claim_token=claim_token,
+                status_code=status_code,
+                body=body,
+                ttl_seconds=ttl_seconds,
+            )
+        )
+        return result.rowcount == 1
+
+    def release(self, db: Session, *, scope: str, key: str, claim_token: str) -> None:
+        """レスポンスを保存せずに終わった（サーバー側のエラーなど）処理中の行を削除し、再試行を受け付けます。"""
+        with db.get_bind().begin() as conn:
+            conn.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.scope == scope,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.claim_token == claim_token,
+                    IdempotencyKey.status_code.is_(None),
+                )
+            )
+
+    def purge_expired(self, db: Session) -> int:
+        """期限切れの行を削除します（削除された処理中の行のリクエストも、complete_in_session が失敗するためコミットされません）。"""
+        with db.get_bind().begin() as conn:
+            result = conn.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())
+            )
+        return result.rowcount
+
+idempotency_key = CRUDIdempotencyKey()
@@ -0,0 +1,25 @@
+from sqlalchemy.orm import Session
+
+from app.models.resource_version import ResourceVersion
+
+class CRUDResourceVersion:
+    """
+    リソースごとの更新番号を読み書きします。
+    bump は呼び出し元のトランザクション内で実行され、データの変更と同時にコミットされます。
+    """
+
+    def get(self, db: Session, *, name: str) -> int:
+        version = db.query(ResourceVersion.version).filter(ResourceVersion.name == name).scalar()
+        return version or 0
+
+    def bump(self, db: Session, *, name: str) -> None:
+        updated = (
+            db.query(ResourceVersion)
+            .filter(ResourceVersion.name == name)
+            .update({ResourceVersion.version: ResourceVersion.version + 1}, synchronize_session=False)
+        )
+        if not updated:
+            db.add(ResourceVersion(name=name, version=1))
+            db.flush()
+
+resource_version = CRUDResourceVersion()
@@ -1,20 +1,27 @@
-from typing import Optional
+from typing import Any, Dict, Optional, Union
 
 from sqlalchemy.orm import Session
 
-from app.core.security import get_password_hash, verify_password
+from app.core.password_pool import password_hasher
+from app.core.security import get_password_hash
 from app.crud.base import CRUDBase
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
+from app.services.auth_cache import active_users
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
         return db.query(User).filter(User.email == email).first()
 
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+    def create(self, db: Session, *, obj_in: UserCreate, hashed_password: Optional[str] = None) -> User:
+        """
+        ユーザーを作成します。
+        API からは app.core.password_pool でハッシュ化した hashed_password を渡してください
+        （省略した場合はこの場で bcrypt を実行します）。
+        """
         db_obj = User(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=hashed_password or get_password_hash(obj_in.password),
             full_name=obj_in.full_name,
             phone_number=obj_in.phone_number,
             is_superuser=obj_in.is_superuser,
@@ -24,11 +31,27 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         db.refresh(db_obj)
         return db_obj
 
+    def update(
+        self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> User:
+        user = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        active_users.invalidate(user.id)
+        return user
+
+    def remove(self, db: Session, *, id: int) -> User:
+        user = super().remove(db, id=id)
+        active_users.invalidate(id)
+        return user
+
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
+        """
+        パスワードの照合はプロセスプールで行い、このスレッドは結果を待ちます（上限を超えた場合は PasswordHashBusy）。
+        イベントループからは app.services.auth.authenticate を使ってください。
+        """
         user = self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not password_hasher.verify_sync(password, user.hashed_password):
             return None
         return user
 
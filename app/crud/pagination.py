@@ -0,0 +1,46 @@
+"""
+キーセット（カーソル）ページネーション用のカーソルの符号化・復号。
+
+カーソルは直前のページの最後の行のソートキーをJSONにしてBase64URLで符号化したもので、
+クライアントからは中身を解釈しない不透明な文字列として扱われます。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """ソートキーの値の並びをカーソル文字列に変換します。"""
+    payload = [
+        {"dt": v.isoformat()} if isinstance(v, datetime) else v
+        for v in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_value(value: Any, type_: type) -> Any:
+    if type_ is datetime:
+        if not isinstance(value, dict) or not isinstance(value.get("dt"), str):
+            raise ValueError
+        return datetime.fromisoformat(value["dt"])
+    # bool は int のサブクラスですが、カーソルの値としては不正です。
+    if type(value) is not type_:
+        raise ValueError
+    return value
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    カーソル文字列を、types（datetime・int など）の型の値の並びに戻します。
+    形式・個数・型のいずれかが不正な場合は ValueError を送出します。
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError
+        return [_decode_value(v, t) for v, t in zip(payload, types)]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("不正なカーソルです。")
@@ -5,12 +5,10 @@ sys.path.append(str(Path(__file__).parent.parent))
 import logging
 from typing import Any
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
 from app.core.config import settings
 from app.core.security import get_password_hash
 from app.db.base_class import Base
+from app.db.session import SessionLocal
 from app.models import User, CalendarEvent
 
 logging.basicConfig(level=logging.INFO)
@@ -39,8 +37,6 @@ def init_db(db: Any) -> None:
 
 def main() -> None:
     logger.info("Creating initial data")
-    engine = create_engine(settings.DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = SessionLocal()
     
     try:
@@ -0,0 +1,318 @@
+"""
+予約処理で日付ごとの排他制御に使うロックの実装。
+
+``BOOKING_LOCK_BACKEND`` で次のいずれかを選択します（auto は DATABASE_URL のDB種別から決定）。
+
+* ``mysql``: MySQL の名前付きロック（GET_LOCK / RELEASE_LOCK）
+* ``postgresql``: PostgreSQL のトランザクション単位のアドバイザリーロック
+* ``local``: プロセス内のストライプロック。ワーカーが1つの構成や SQLite 向け
+* ``table``: ``booking_locks`` テーブルの行による期限付きリース。DBの種類を問わず複数ワーカーで使えます
+
+どのバックエンドもタイムアウトまでに取得できなければ :class:`LockTimeoutError` を送出し、
+待ち時間・競合回数・タイムアウト回数を記録します。
+
+mysql・postgresql はセッション自身の接続でロックを取得し、ロックのために別の接続をプールから取りません
+（ロック待ちのリクエストどうしがプールの接続を取り合って止まらないようにするためです）。
+ロックは予約のコミット（またはロールバック）が終わるまで保持されます。
+"""
+import abc
+import asyncio
+import threading
+import time as timer
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import delete, event, insert, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError, MissingGreenlet
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+from app.core.config import settings
+from app.core.metrics import booking_lock_wait
+from app.models.booking_lock import BookingLock
+
+
+class LockTimeoutError(Exception):
+    """ロックをタイムアウトまでに取得できなかった場合に送出されます。"""
+
+    def __init__(self, key: str, timeout: float):
+        super().__init__(f"ロック '{key}' を{timeout:g}秒以内に取得できませんでした。")
+        self.key = key
+        self.timeout = timeout
+
+
+class LockStats:
+    """ロックの取得状況。値はこのプロセス内の累計です。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait: float, *, contended: bool, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.acquired += 1
+            if contended:
+                self.contended += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def as_dict(self) -> dict:
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+def _sleep(seconds: float) -> None:
+    """
+    ロックの再試行まで待機します。
+    非同期DBモード（AsyncSession.run_sync 内）ではイベントループを止めないよう asyncio.sleep で待ちます。
+    """
+    try:
+        await_only(asyncio.sleep(seconds))
+    except MissingGreenlet:
+        timer.sleep(seconds)
+
+
+class LockManager(abc.ABC):
+    """
+    日付などのキー単位で排他制御を行うロックの基底クラス。
+
+    サブクラスは ``_try_acquire`` で取得したロックを表す値（解放に必要な接続など）を返し、
+    取得できなかった場合は None を返します。
+    """
+
+    name = "base"
+    poll_interval = 0.05
+
+    def __init__(self) -> None:
+        self.stats = LockStats()
+
+    def _lock_names(self, keys: Sequence[str]) -> List[Any]:
+        """取得するロックの一覧。デッドロックを避けるため常に昇順で取得します。"""
+        return sorted(set(keys))
+
+    @abc.abstractmethod
+    def _try_acquire(self, db: Session, name: Any, timeout: float) -> Any:
+        ...
+
+    @abc.abstractmethod
+    def _release(self, db: Session, name: Any, handle: Any) -> None:
+        ...
+
+    def _poll(self, attempt: Callable[[], Any], timeout: float) -> Any:
+        """attempt が None 以外を返すまで、timeout 秒を上限に再試行します。"""
+        deadline = timer.monotonic() + timeout
+        while True:
+            handle = attempt()
+            if handle is not None or timer.monotonic() >= deadline:
+                return handle
+            _sleep(self.poll_interval)
+
+    def _acquire_one(self, db: Session, name: Any, timeout: float) -> Any:
+        started = timer.perf_counter()
+        # まず待たずに取得を試み、取得できなければ競合として記録してから待ちます。
+        handle = self._try_acquire(db, name, 0)
+        contended = handle is None
+        if handle is None and timeout > 0:
+            handle = self._try_acquire(db, name, timeout)
+        wait = timer.perf_counter() - started
+        self.stats.record(wait, contended=contended, timed_out=handle is None)
+        booking_lock_wait.observe(wait, self.name, "timeout" if handle is None else "acquired")
+        if handle is None:
+            raise LockTimeoutError(str(name), timeout)
+        return handle
+
+    @contextmanager
+    def acquire(
+        self, db: Session, keys: Union[str, Sequence[str]], *, timeout: Optional[float] = None
+    ) -> Iterator[None]:
+        """キー（複数可）のロックを取得し、ブロックを抜けると解放します。"""
+        if isinstance(keys, str):
+            keys = [keys]
+        if timeout is None:
+            timeout = settings.BOOKING_LOCK_TIMEOUT_SECONDS
+        held: List[Tuple[Any, Any]] = []
+        try:
+            for name in self._lock_names(keys):
+                held.append((name, self._acquire_one(db, name, timeout)))
+            yield
+        finally:
+            for name, handle in reversed(held):
+                self._release(db, name, handle)
+
+
+class _SessionNamedLock:
+    """
+    セッションの接続で取得した MySQL の名前付きロック。
+
+    名前付きロックはトランザクションではなく接続に属するため、コミットの前に解放すると、
+    ほかのリクエストがコミット前の予約を見ずに重複チェックをしてしまいます。
+    コミットの後では、セッションの接続はすでにプールに戻っています。
+    そこで、セッションのトランザクションが終わった直後（接続がプールに戻る前）に同じ接続で解放します。
+    """
+
+    def __init__(self, db: Session, conn: Connection, name: str):
+        self.db = db
+        self.conn = conn
+        self.name = name
+        # ロックを取得したときのトランザクション。解放の RELEASE_LOCK で次のトランザクションが始まっても区別できるようにします。
+        self.transaction = conn.get_transaction()
+        self.released = False
+        event.listen(db, "after_commit", self._on_transaction_end)
+        event.listen(db, "after_rollback", self._on_transaction_end)
+
+    def _on_transaction_end(self, session: Session) -> None:
+        # SAVEPOINT のコミット・ロールバックでは、取得したときのトランザクションはまだ続いています。
+        if not self.released and not self.transaction.is_active:
+            self.release()
+
+    def release(self) -> None:
+        self.released = True
+        self.conn.execute(text("SELECT RELEASE_LOCK(:k)"), {"k": self.name})
+
+    def close(self) -> None:
+        """ブロックを抜けるときに呼ばれます。コミット・ロールバックせずに抜けた場合は、ここで解放します。"""
+        event.remove(self.db, "after_commit", self._on_transaction_end)
+        event.remove(self.db, "after_rollback", self._on_transaction_end)
+        if not self.released and not self.conn.closed:
+            self.release()
+
+
+class MySQLNamedLock(LockManager):
+    """MySQL の名前付きロック。セッションの接続で取得し、トランザクションの終了後に同じ接続で解放します。"""
+
+    name = "mysql"
+
+    def _try_acquire(self, db: Session, name: str, timeout: float) -> Optional[_SessionNamedLock]:
+        conn = db.connection()
+        # GET_LOCK は取得できれば 1、タイムアウトで 0、エラーで NULL を返します。
+        result = conn.execute(text("SELECT GET_LOCK(:k, :t)"), {"k": name, "t": timeout}).scalar()
+        if result != 1:
+            return None
+        return _SessionNamedLock(db, conn, name)
+
+    def _release(self, db: Session, name: str, handle: _SessionNamedLock) -> None:
+        handle.close()
+
+
+class PostgresAdvisoryLock(LockManager):
+    """
+    PostgreSQL のトランザクション単位のアドバイザリーロック（pg_try_advisory_xact_lock）。
+    セッションの接続で取得し、予約のコミット・ロールバックで自動的に解放されます。
+    """
+
+    name = "postgresql"
+
+    def _try_acquire(self, db: Session, name: str, timeout: float) -> Optional[bool]:
+        def attempt() -> Optional[bool]:
+            ok = db.execute(text("SELECT pg_try_advisory_xact_lock(hashtext(:k))"), {"k": name}).scalar()
+            return True if ok else None
+
+        return self._poll(attempt, timeout)
+
+    def _release(self, db: Session, name: str, handle: bool) -> None:
+        # トランザクションの終了で解放されます。コミットせずに抜けた場合も、セッションを閉じるときのロールバックで解放されます。
+        pass
+
+
+class LocalStripedLock(LockManager):
+    """
+    キーのハッシュで選んだプロセス内ロック（ストライプ）による排他制御。
+    他のプロセスとは排他されないため、ワーカーが1つの構成でのみ使用してください。
+    """
+
+    name = "local"
+    poll_interval = 0.005
+
+    def __init__(self, stripes: int = 64) -> None:
+        super().__init__()
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+
+    def _lock_names(self, keys: Sequence[str]) -> List[Any]:
+        # 複数のキーが同じストライプに当たっても、ストライプは1回だけ取得します。
+        return sorted({zlib.crc32(key.encode()) % len(self._stripes) for key in keys})
+
+    def _try_acquire(self, db: Session, name: int, timeout: float) -> Optional[threading.Lock]:
+        lock = self._stripes[name]
+        # 非同期DBモードではイベントループのスレッドで呼ばれるため、ブロックせずに再試行します。
+        return self._poll(lambda: lock if lock.acquire(blocking=False) else None, timeout)
+
+    def _release(self, db: Session, name: int, handle: threading.Lock) -> None:
+        handle.release()
+
+
+class TableLeaseLock(LockManager):
+    """
+    ``booking_locks`` テーブルの行を期限付きのリースとして使う排他制御。
+    リースは呼び出し元とは別のトランザクションで即座にコミットされ、
+    解放されずに残った行は期限切れ後に他の取得者が引き継ぎます。
+    """
+
+    name = "table"
+
+    def __init__(self, lease_seconds: float = 30) -> None:
+        super().__init__()
+        self.lease_seconds = lease_seconds
+
+    def _claim(self, db: Session, name: str, owner: str) -> Optional[str]:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        bind = db.get_bind()
+        try:
+            with bind.begin() as conn:
+                conn.execute(insert(BookingLock).values(name=name, owner=owner, expires_at=expires_at))
+            return owner
+        except IntegrityError:
+            pass
+        with bind.begin() as conn:
+            result = conn.execute(
+                update(BookingLock)
+                .where(BookingLock.name == name, BookingLock.expires_at < now)
+                .values(owner=owner, expires_at=expires_at)
+            )
+        return owner if result.rowcount == 1 else None
+
+    def _try_acquire(self, db: Session, name: str, timeout: float) -> Optional[str]:
+        owner = uuid.uuid4().hex
+        return self._poll(lambda: self._claim(db, name, owner), timeout)
+
+    def _release(self, db: Session, name: str, handle: str) -> None:
+        with db.get_bind().begin() as conn:
+            conn.execute(delete(BookingLock).where(BookingLock.name == name, BookingLock.owner == handle))
+
+
+def create_lock_manager(backend: str, database_url: str) -> LockManager:
+    if backend == "auto":
+        if database_url.startswith("mysql"):
+            backend = "mysql"
+        elif database_url.startswith("postgresql"):
+            backend = "postgresql"
+        else:
+            backend = "local"
+    if backend == "mysql":
+        return MySQLNamedLock()
+    if backend == "postgresql":
+        return PostgresAdvisoryLock()
+    if backend == "local":
+        return LocalStripedLock(stripes=settings.BOOKING_LOCK_STRIPES)
+    if backend == "table":
+        return TableLeaseLock(lease_seconds=settings.BOOKING_LOCK_LEASE_SECONDS)
+    raise ValueError(f"Unknown BOOKING_LOCK_BACKEND: {backend}")
+
+
+booking_lock = create_lock_manager(settings.BOOKING_LOCK_BACKEND, settings.DATABASE_URL)
@@ -0,0 +1,92 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import argparse
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, create_engine, select
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.migrations import MIGRATIONS
+from app import models  # noqa: F401  全モデルを Base.metadata に登録します
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 適用済みのマイグレーションを記録するテーブル（アプリのモデルとは別管理）
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("revision", String(32), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def applied_revisions(engine: Engine) -> set:
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.revision)).scalars())
+
+def upgrade(engine: Engine, target: Optional[str] = None) -> None:
+    """
+    未適用のマイグレーションを番号順に適用します。target を指定した場合はその番号まで適用します。
+    まだ存在しないテーブルは先に create_all で作成されます。
+    """
+    Base.metadata.create_all(bind=engine)
+    applied = applied_revisions(engine)
+    for migration in MIGRATIONS:
+        if migration.revision in applied:
+            continue
+        with engine.begin() as conn:
+            logger.info("Applying %s: %s", migration.revision, migration.description)
+            migration.upgrade(conn)
+            conn.execute(
+                schema_migrations.insert().values(
+                    revision=migration.revision, applied_at=datetime.utcnow()
+                )
+            )
+        if migration.revision == target:
+            break
+
+def downgrade(engine: Engine, target: str) -> None:
+    """target より後のマイグレーションを逆順に取り消します。"""
+    applied = applied_revisions(engine)
+    for migration in reversed(MIGRATIONS):
+        if migration.revision <= target or migration.revision not in applied:
+            continue
+        with engine.begin() as conn:
+            logger.info("Reverting %s: %s", migration.revision, migration.description)
+            migration.downgrade(conn)
+            conn.execute(
+                schema_migrations.delete().where(schema_migrations.c.revision == migration.revision)
+            )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="データベースのスキーマ移行を適用・取り消します。")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upgrade", help="未適用のマイグレーションを適用します")
+    up.add_argument("target", nargs="?", help="この番号まで適用します（省略時は最新まで）")
+    down = sub.add_parser("downgrade", help="指定した番号より後のマイグレーションを取り消します")
+    down.add_argument("target", help="取り消し後に残す最後の番号（全て取り消す場合は 0000）")
+    sub.add_parser("status", help="マイグレーションの適用状況を表示します")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if args.command == "upgrade":
+        upgrade(engine, args.target)
+    elif args.command == "downgrade":
+        downgrade(engine, args.target)
+    else:
+        applied = applied_revisions(engine)
+        for migration in MIGRATIONS:
+            mark = "x" if migration.revision in applied else " "
+            print(f"[{mark}] {migration.revision} {migration.description}")
+
+if __name__ == "__main__":
+    main()
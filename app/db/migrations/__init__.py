@@ -0,0 +1,55 @@
+"""
+データベースのスキーマ移行（マイグレーション）。
+
+新しいテーブル・列・インデックスは、起動時の ``Base.metadata.create_all`` で新規DBに作成されますが、
+既存のDBには反映されません。既存DBへの変更はここに番号順のモジュールとして追加し、
+``python -m app.db.migrate upgrade`` で適用します。
+
+各モジュールは ``revision``・``description``・``upgrade(conn)``・``downgrade(conn)`` を定義します。
+``upgrade`` は新規DB（create_all で既に最新の状態）に対して実行しても安全でなければなりません。
+"""
+from typing import Iterable
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+
+def index_names(conn: Connection, table: str) -> set:
+    return {ix["name"] for ix in inspect(conn).get_indexes(table)}
+
+
+def column_names(conn: Connection, table: str) -> set:
+    return {col["name"] for col in inspect(conn).get_columns(table)}
+
+
+def create_index(conn: Connection, table: str, name: str, columns: Iterable[str], unique: bool = False) -> None:
+    if name in index_names(conn, table):
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"))
+
+
+def drop_index(conn: Connection, table: str, name: str) -> None:
+    if name not in index_names(conn, table):
+        return
+    if conn.dialect.name == "mysql":
+        conn.execute(text(f"DROP INDEX {name} ON {table}"))
+    else:
+        conn.execute(text(f"DROP INDEX {name}"))
+
+
+from . import (  # noqa: E402
+    m0001_calendar_event_indexes,
+    m0002_daily_summary,
+    m0003_calendar_event_version,
+    m0004_calendar_event_start_index,
+    m0005_calendar_event_updated_at,
+)
+
+MIGRATIONS = [
+    m0001_calendar_event_indexes,
+    m0002_daily_summary,
+    m0003_calendar_event_version,
+    m0004_calendar_event_start_index,
+    m0005_calendar_event_updated_at,
+]
@@ -0,0 +1,33 @@
+"""calendar_events の範囲検索用インデックスを作成し、単独の event_date インデックスを置き換えます。"""
+from sqlalchemy.engine import Connection
+
+from app.db.migrations import create_index, drop_index
+
+revision = "0001"
+description = "calendar_events の範囲検索用インデックス"
+
+TABLE = "calendar_events"
+INDEXES = {
+    # 日付範囲・重複チェック（event_date の範囲 + start_time / end_time の条件）
+    "ix_calendar_events_date_start_end": ("event_date", "start_time", "end_time"),
+    # 休日一覧（is_holiday の等価条件 + event_date の範囲）
+    "ix_calendar_events_holiday_date": ("is_holiday", "event_date"),
+    # ユーザーごとの一覧（user_id の等価条件 + start_time 順）
+    "ix_calendar_events_user_start": ("user_id", "start_time"),
+    # 変更検知（max(updated_at)）
+    "ix_calendar_events_updated_at": ("updated_at",),
+}
+# 複合インデックスの先頭列と重複するため削除します。
+LEGACY_INDEX = ("ix_calendar_events_event_date", ("event_date",))
+
+
+def upgrade(conn: Connection) -> None:
+    for name, columns in INDEXES.items():
+        create_index(conn, TABLE, name, columns)
+    drop_index(conn, TABLE, LEGACY_INDEX[0])
+
+
+def downgrade(conn: Connection) -> None:
+    create_index(conn, TABLE, *LEGACY_INDEX)
+    for name in INDEXES:
+        drop_index(conn, TABLE, name)
@@ -0,0 +1,19 @@
+"""既存の予約から daily_summary を集計します（テーブル自体は create_all で作成されます）。"""
+from sqlalchemy import delete
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.crud.crud_daily_summary import daily_summary
+from app.models.daily_summary import DailySummary
+
+revision = "0002"
+description = "daily_summary の初期集計"
+
+
+def upgrade(conn: Connection) -> None:
+    with Session(bind=conn) as session:
+        daily_summary.rebuild(session)
+
+
+def downgrade(conn: Connection) -> None:
+    conn.execute(delete(DailySummary))
@@ -0,0 +1,22 @@
+"""calendar_events に楽観的排他制御の版番号（version）を追加します。既存の予約は版 1 から始まります。"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from . import column_names
+
+revision = "0003"
+description = "calendar_events.version の追加"
+
+TABLE = "calendar_events"
+
+
+def upgrade(conn: Connection) -> None:
+    if "version" in column_names(conn, TABLE):
+        return
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def downgrade(conn: Connection) -> None:
+    if "version" not in column_names(conn, TABLE):
+        return
+    conn.execute(text(f"ALTER TABLE {TABLE} DROP COLUMN version"))
@@ -0,0 +1,18 @@
+"""calendar_events の一覧（start_time, id の順のキーセットページネーション）用インデックスを作成します。"""
+from sqlalchemy.engine import Connection
+
+from app.db.migrations import create_index, drop_index
+
+revision = "0004"
+description = "calendar_events の (start_time, id) インデックス"
+
+TABLE = "calendar_events"
+INDEX = ("ix_calendar_events_start_id", ("start_time", "id"))
+
+
+def upgrade(conn: Connection) -> None:
+    create_index(conn, TABLE, *INDEX)
+
+
+def downgrade(conn: Connection) -> None:
+    drop_index(conn, TABLE, INDEX[0])
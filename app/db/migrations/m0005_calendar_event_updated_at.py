@@ -0,0 +1,17 @@
+"""作成後に一度も更新されず updated_at が NULL の予約に、created_at を設定します（変更検知を max(updated_at) で行うため）。"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+revision = "0005"
+description = "calendar_events.updated_at の NULL を created_at で埋める"
+
+TABLE = "calendar_events"
+
+
+def upgrade(conn: Connection) -> None:
+    conn.execute(text(f"UPDATE {TABLE} SET updated_at = created_at WHERE updated_at IS NULL"))
+
+
+def downgrade(conn: Connection) -> None:
+    # 作成後に更新されていない行（updated_at = created_at）を元の NULL に戻します。
+    conn.execute(text(f"UPDATE {TABLE} SET updated_at = NULL WHERE updated_at = created_at"))
@@ -0,0 +1,161 @@
+"""
+DB の接続プールの設定と計測。
+
+* ``engine_options``: Settings の DB_POOL_* から create_engine の引数を作ります。
+  サイズ指定のできない接続先（NullPool を使う aiosqlite、メモリ上の SQLite など）ではサイズの指定を省きます。
+* ``InstrumentedQueuePool`` / ``AsyncInstrumentedQueuePool``: プールから接続を取り出すまでの待ち時間を計測する QueuePool。
+  待ち時間が DB_POOL_SLOW_CHECKOUT_SECONDS を超えた場合は、その時点のプールの状態とあわせて警告をログに出します。
+* ``instrument_pool``: プールのイベント（接続・取り出し・返却・無効化）を数えます。
+
+値はワーカーごとに集計されます（``/diagnostics/pool``、``/metrics``）。
+プールの大きさは「ワーカー数 × (DB_POOL_SIZE + DB_MAX_OVERFLOW)」が DB の最大接続数を超えないように決めてください。
+"""
+import logging
+import threading
+import time as timer
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.slow_checkouts = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+
+    def record_checkout_wait(self, elapsed: float) -> None:
+        with self._lock:
+            self.checkout_wait_seconds_total += elapsed
+            self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, elapsed)
+        metrics.db_pool_checkout_wait.observe(elapsed, self.name)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "soft_invalidations": self.soft_invalidations,
+            "slow_checkouts": self.slow_checkouts,
+            "checkout_wait_seconds_total": round(self.checkout_wait_seconds_total, 6),
+            "checkout_wait_seconds_max": round(self.checkout_wait_seconds_max, 6),
+        }
+
+
+class _CheckoutTimingMixin:
+    """QueuePool の接続の取り出し（空きがなければ新規接続、上限なら待機）にかかった時間を記録します。"""
+
+    stats: Optional[PoolStats] = None
+    slow_checkout_seconds: float = 0.0
+
+    def _do_get(self):
+        started = timer.perf_counter()
+        conn = super()._do_get()
+        elapsed = timer.perf_counter() - started
+        stats = self.stats
+        if stats is not None:
+            stats.record_checkout_wait(elapsed)
+            if self.slow_checkout_seconds and elapsed >= self.slow_checkout_seconds:
+                stats.slow_checkouts += 1
+                logger.warning(
+                    "Slow DB pool checkout (%s): waited %.3fs; %s",
+                    stats.name, elapsed, self.status(),
+                )
+        return conn
+
+    def recreate(self):
+        # engine.dispose() などでプールが作り直されても集計を引き継ぎます。
+        pool = super().recreate()
+        pool.stats = self.stats
+        pool.slow_checkout_seconds = self.slow_checkout_seconds
+        return pool
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class AsyncInstrumentedQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, *, is_async: bool = False) -> Dict[str, Any]:
+    """Settings のプール設定から create_engine / create_async_engine の引数を作ります。"""
+    options: Dict[str, Any] = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+    parsed = make_url(url)
+    default_pool = parsed.get_dialect().get_pool_class(parsed)
+    if issubclass(default_pool, QueuePool):
+        options.update(
+            poolclass=AsyncInstrumentedQueuePool if is_async else InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        )
+    return options
+
+
+def instrument_pool(engine: Engine, name: str) -> PoolStats:
+    """エンジンのプールのイベントを集計します。"""
+    stats = PoolStats(name)
+    pool = engine.pool
+    if isinstance(pool, _CheckoutTimingMixin):
+        pool.stats = stats
+        pool.slow_checkout_seconds = settings.DB_POOL_SLOW_CHECKOUT_SECONDS
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        stats.checkins += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+        metrics.db_pool_invalidations.inc(name, "hard")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def _soft_invalidate(dbapi_connection, connection_record, exception):
+        stats.soft_invalidations += 1
+        metrics.db_pool_invalidations.inc(name, "soft")
+
+    return stats
+
+
+def pool_status(engine: Engine, stats: PoolStats) -> Dict[str, Any]:
+    """プールの設定・現在の状態・集計をまとめて返します。"""
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    for method in ("size", "checkedout", "checkedin", "overflow"):
+        fn = getattr(pool, method, None)
+        if fn is not None:
+            status[method] = fn()
+    if isinstance(pool, QueuePool):
+        status["max_overflow"] = pool._max_overflow
+        status["timeout_seconds"] = pool.timeout()
+    status["recycle_seconds"] = pool._recycle
+    status.update(stats.as_dict())
+    return status
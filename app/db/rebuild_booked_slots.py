@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import argparse
+import logging
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_booked_slot import CRUDBookedSlot
+from app.db.base_class import Base
+from app import models  # noqa: F401  全モデルを Base.metadata に登録します
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ログに ID を列挙する最大件数
+MAX_LISTED = 20
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="calendar_events から booked_slots（枠モードの予約枠）を作り直します。BOOKING_SLOT_MODE を有効にする前に実行してください。"
+    )
+    parser.add_argument("--start", type=date.fromisoformat, help="作り直す最初の日（YYYY-MM-DD、省略時は全期間）")
+    parser.add_argument("--end", type=date.fromisoformat, help="作り直す最後の日（YYYY-MM-DD、省略時は全期間）")
+    parser.add_argument("--slot-minutes", type=int, default=settings.BOOKING_SLOT_MINUTES, help="枠の長さ（分）")
+    parser.add_argument("--dry-run", action="store_true", help="結果を表示するだけで、変更をコミットしません")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    try:
+        slots = CRUDBookedSlot(minutes=args.slot_minutes)
+    except ValueError as e:
+        parser.error(str(e))
+    with Session(engine) as session:
+        result = slots.rebuild(session, start_date=args.start, end_date=args.end)
+        if args.dry_run:
+            session.rollback()
+        else:
+            session.commit()
+
+    logger.info(
+        "%s booked_slots: %d events, %d slots (%d-minute slots)",
+        "Checked" if args.dry_run else "Rebuilt", result.events, result.slots, slots.minutes,
+    )
+    if result.unaligned:
+        logger.warning(
+            "%d bookings are not aligned to %d-minute slots and were rounded outward: ids %s",
+            len(result.unaligned), slots.minutes, result.unaligned[:MAX_LISTED],
+        )
+    if result.conflicts:
+        logger.error(
+            "%d events overlap an earlier event's slots and have no slots: (id, earlier id) %s",
+            len(result.conflicts), result.conflicts[:MAX_LISTED],
+        )
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import argparse
+import logging
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_daily_summary import daily_summary
+from app.db.base_class import Base
+from app import models  # noqa: F401  全モデルを Base.metadata に登録します
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="calendar_events から daily_summary を集計し直します。")
+    parser.add_argument("--start", type=date.fromisoformat, help="集計し直す最初の日（YYYY-MM-DD、省略時は全期間）")
+    parser.add_argument("--end", type=date.fromisoformat, help="集計し直す最後の日（YYYY-MM-DD、省略時は全期間）")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        count = daily_summary.rebuild(session, start_date=args.start, end_date=args.end)
+    logger.info("Rebuilt daily_summary: %d days", count)
+
+if __name__ == "__main__":
+    main()
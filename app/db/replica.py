@@ -0,0 +1,90 @@
+"""
+読み取り専用のリクエストをリードレプリカに振り分けるための仕組み（DATABASE_REPLICA_URL を設定した場合のみ有効）。
+
+* ``ReplicaRoutingMiddleware``: GET / HEAD のリクエストを「レプリカで読んでよい」とマークします。
+  書き込み（POST・PUT・PATCH・DELETE）が成功したレスポンスには Cookie を付け、その後
+  DB_REPLICA_STICKY_SECONDS 秒間は同じクライアントの読み取りもプライマリで行います（自分の書き込みを確実に読めるように）。
+* ``RoutingSession``: SELECT をレプリカで、それ以外（書き込み・ロック・text() の SQL）をプライマリで実行するセッション。
+  一度でも SELECT 以外を実行したセッションは、以降の SELECT もプライマリで実行します。
+
+レプリカの遅延のあいだは、営業ルールなどのキャッシュも古い値を読み込むことがあります（最大で各キャッシュの TTL まで）。
+"""
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Any, Optional
+
+from sqlalchemy import Select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+STICKY_COOKIE = "db_primary_until"
+READ_METHODS = ("GET", "HEAD")
+
+# 現在のリクエストがレプリカを使ってよいかどうか（ミドルウェアがない場合は常に False = プライマリ）
+replica_allowed: ContextVar[bool] = ContextVar("replica_allowed", default=False)
+
+
+class RoutingSession(Session):
+    def __init__(self, *args: Any, replica: Optional[Engine] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+        self.stuck_to_primary = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.replica is not None
+            and not self.stuck_to_primary
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+        ):
+            return self.replica
+        # SELECT 以外（flush・DML・ロック・get_bind() の直接呼び出し）の後は、このセッションではプライマリだけを使います。
+        self.stuck_to_primary = True
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+def _sticky(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(STICKY_COOKIE)
+            if morsel is not None:
+                try:
+                    return float(morsel.value) > time.time()
+                except ValueError:
+                    return False
+    return False
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, app, *, sticky_seconds: float):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        is_read = scope["method"] in READ_METHODS
+        token = replica_allowed.set(is_read and not _sticky(scope))
+
+        async def send_wrapper(message):
+            if (
+                not is_read
+                and self.sticky_seconds > 0
+                and message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                until = time.time() + self.sticky_seconds
+                cookie = (
+                    f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(self.sticky_seconds + 0.999)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            replica_allowed.reset(token)
@@ -1,15 +1,125 @@
+import abc
+from typing import Any, AsyncIterator, Callable, TypeVar
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.db.pool import engine_options, instrument_pool
+from app.db.replica import RoutingSession, replica_allowed
+
+T = TypeVar("T")
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+# セッションはすべて SessionLocal（非同期モードでは AsyncSessionLocal）から作ります。
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+pool_stats = {"sync": instrument_pool(engine, "sync")}
+
+# DB_ASYNC=true の場合のみ非同期ドライバ（aiomysql など）でエンジンを作成します。
+# expire_on_commit=False: コミット後にイベントループ上で属性を遅延読み込みしないようにするためです。
+async_engine = (
+    create_async_engine(settings.ASYNC_DATABASE_URL, **engine_options(settings.ASYNC_DATABASE_URL, is_async=True))
+    if settings.DB_ASYNC
+    else None
+)
+if async_engine is not None:
+    pool_stats["async"] = instrument_pool(async_engine.sync_engine, "async")
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if async_engine is not None
+    else None
+)
+
+# リードレプリカ（DATABASE_REPLICA_URL を設定した場合のみ）。
+# 読み取り専用のリクエストでは、SELECT をレプリカに送る RoutingSession を使います（app/db/replica.py）。
+replica_engine = None
+async_replica_engine = None
+ReadSessionLocal = SessionLocal
+AsyncReadSessionLocal = AsyncSessionLocal
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(
+        settings.DATABASE_REPLICA_URL, **engine_options(settings.DATABASE_REPLICA_URL)
+    )
+    pool_stats["replica"] = instrument_pool(replica_engine, "replica")
+    ReadSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=engine, class_=RoutingSession, replica=replica_engine
+    )
+    if async_engine is not None:
+        async_replica_engine = create_async_engine(
+            settings.ASYNC_DATABASE_REPLICA_URL,
+            **engine_options(settings.ASYNC_DATABASE_REPLICA_URL, is_async=True),
+        )
+        pool_stats["async_replica"] = instrument_pool(async_replica_engine.sync_engine, "async_replica")
+        AsyncReadSessionLocal = async_sessionmaker(
+            async_engine,
+            autoflush=False,
+            expire_on_commit=False,
+            sync_session_class=RoutingSession,
+            replica=async_replica_engine.sync_engine,
+        )
+
+def new_session() -> Session:
+    """
+    エンドポイントの外（ストリーミングの途中など）で使う同期セッションを作ります。
+    読み取り専用のリクエストの中ではレプリカを使うセッションになります。
+    """
+    return ReadSessionLocal() if replica_allowed.get() else SessionLocal()
 
 def get_db():
-    """Dependency for getting async DB session"""
+    """Dependency for getting a sync DB session"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+class Database(abc.ABC):
+    """
+    エンドポイントから CRUD を呼び出すためのDBハンドル。
+
+    CRUD のメソッドは同期の ``Session`` を第1引数に取る関数として書かれており、
+    ``await db.run(crud.event.get, id=1)`` のように呼び出すと、設定に応じて次のどちらかで実行されます。
+
+    * 同期モード（既定）: PyMySQL の ``Session`` をスレッドプールで使用します
+    * 非同期モード（DB_ASYNC=true）: ``AsyncSession.run_sync`` により、非同期ドライバ上でイベントループを塞がずに実行します
+    """
+
+    @abc.abstractmethod
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        ...
+
+
+class SyncDatabase(Database):
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+
+class AsyncDatabase(Database):
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+
+async def get_database() -> AsyncIterator[Database]:
+    """
+    Dependency for getting a DB handle (sync or async, depending on DB_ASYNC).
+    Read-only requests get a session that reads from the replica when one is configured.
+    """
+    read_only = replica_allowed.get()
+    if AsyncSessionLocal is not None:
+        async with (AsyncReadSessionLocal if read_only else AsyncSessionLocal)() as session:
+            yield AsyncDatabase(session)
+    else:
+        db = (ReadSessionLocal if read_only else SessionLocal)()
+        try:
+            yield SyncDatabase(db)
+        finally:
+            await run_in_threadpool(db.close)
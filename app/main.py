@@ -1,10 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.api.v1.api import api_router
+from app.core import metrics, query_budget
+from app.core.password_pool import PasswordHashBusy, password_hasher
 from app.core.config import settings
 from app.db.base_class import Base
-from app.db.session import engine
+from app.db.locks import LockTimeoutError
+from app.db.replica import ReplicaRoutingMiddleware
+from app.db.session import async_engine, async_replica_engine, engine, replica_engine
 
 # APIドキュメントの各セクション（タグ）の定義
 # nameを日本語にすることで、ドキュメントのセクションタイトル自体が日本語になります。
@@ -33,6 +38,14 @@ tags_metadata = [
         "name": "営業時間",
         "description": "曜日ごとの営業時間を管理するAPI。",
     },
+    {
+        "name": "カレンダー",
+        "description": "月表示など、カレンダー表示用の集計を取得するAPI。",
+    },
+    {
+        "name": "診断",
+        "description": "キャッシュやロックなど、サーバー内部の状態を確認するAPI。",
+    },
 ]
 
 app = FastAPI(
@@ -56,8 +69,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "ETag"],
 )
 
+@app.exception_handler(LockTimeoutError)
+async def _lock_timeout_handler(request: Request, exc: LockTimeoutError) -> JSONResponse:
+    """予約の日付ロックを取得できなかった場合は、混雑として 503 を返します。"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "予約処理が混み合っています。しばらくしてから再度お試しください。"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(PasswordHashBusy)
+async def _password_hash_busy_handler(request: Request, exc: PasswordHashBusy) -> JSONResponse:
+    """パスワード処理の待ちが上限を超えた場合も、混雑として 503 を返します。"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "処理が混み合っています。しばらくしてから再度お試しください。"},
+        headers={"Retry-After": "1"},
+    )
+
+# メトリクス・クエリ予算の計測対象のエンジン（非同期エンジンは内部の同期エンジンにイベントを登録します）
+engines = {"sync": engine}
+if async_engine is not None:
+    engines["async"] = async_engine.sync_engine
+if replica_engine is not None:
+    engines["replica"] = replica_engine
+if async_replica_engine is not None:
+    engines["async_replica"] = async_replica_engine.sync_engine
+
+# メトリクス（/metrics）
+if settings.METRICS_ENABLED:
+    for instrumented in engines.values():
+        metrics.instrument_engine(instrumented)
+    metrics.register_pool_gauges(engines)
+    app.add_middleware(metrics.MetricsMiddleware, routes_app=app)
+
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        """Prometheus のテキスト形式でメトリクスを返します。"""
+        return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# リクエストごとの SQL の回数チェック（開発・テスト向け）
+if settings.QUERY_BUDGET_ENABLED:
+    for budgeted in engines.values():
+        query_budget.instrument_engine(budgeted)
+    app.add_middleware(
+        query_budget.QueryBudgetMiddleware,
+        default_budget=settings.QUERY_BUDGET_DEFAULT or None,
+        n_plus_one_threshold=settings.QUERY_BUDGET_N_PLUS_ONE_THRESHOLD,
+        strict=settings.QUERY_BUDGET_STRICT,
+    )
+
+# リードレプリカへの振り分け（GET / HEAD の SELECT をレプリカへ、書き込み直後はプライマリへ）
+if replica_engine is not None:
+    app.add_middleware(ReplicaRoutingMiddleware, sticky_seconds=settings.DB_REPLICA_STICKY_SECONDS)
+
 # APIルーターの読み込み
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -69,6 +137,11 @@ def _create_tables() -> None:
     except Exception as e:
         print(f"[startup] テーブル作成に失敗しました: {e}")
 
+@app.on_event("shutdown")
+def _shutdown_password_pool() -> None:
+    """パスワード処理用のワーカープロセスを停止します。"""
+    password_hasher.shutdown()
+
 @app.get("/")
 def root():
     return {"message": "カレンダー予約APIへようこそ (認証無効版)"}
\ No newline at end of file
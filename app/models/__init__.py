@@ -1,4 +1,9 @@
 # app/models/__init__.py
 from .user import User
 from .event import CalendarEvent
-from .business import WeeklyHolidayRule, BusinessHours
\ No newline at end of file
+from .business import WeeklyHolidayRule, BusinessHours
+from .resource_version import ResourceVersion
+from .booking_lock import BookingLock
+from .daily_summary import DailySummary
+from .idempotency_key import IdempotencyKey
+from .booked_slot import BookedSlot
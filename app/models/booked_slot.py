@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, SmallInteger
+from app.db.base_class import Base
+
+class BookedSlot(Base):
+    """
+    BOOKING_SLOT_MODE で使う、予定が占有する予約枠（BOOKING_SLOT_MINUTES 分単位）。
+    (slot_date, slot_index) が主キーなので、同じ枠を2件目の予定が INSERT すると一意制約の違反になります。
+    slot_index はその日の 0:00 からの枠の番号です（15分単位なら 10:00 は 40）。
+    """
+    __tablename__ = "booked_slots"
+
+    slot_date = Column(Date, primary_key=True)
+    slot_index = Column(SmallInteger, primary_key=True, autoincrement=False)
+    event_id = Column(
+        Integer, ForeignKey("calendar_events.id", ondelete="CASCADE"), nullable=False, index=True
+    )
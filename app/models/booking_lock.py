@@ -0,0 +1,10 @@
+from sqlalchemy import Column, DateTime, String
+from app.db.base_class import Base
+
+class BookingLock(Base):
+    """BOOKING_LOCK_BACKEND=table で使う予約ロックのリース。行が存在し expires_at を過ぎていない間はロック中です。"""
+    __tablename__ = "booking_locks"
+
+    name = Column(String(64), primary_key=True)
+    owner = Column(String(32), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Date, Integer
+from app.db.base_class import Base
+
+class DailySummary(Base):
+    """
+    日ごとの予約集計。予約の作成・更新・削除と同じトランザクションで差分更新されます。
+    休日設定（is_holiday の予定）は予約数・分数・人数に含めず、holiday_count に数えます。
+    """
+    __tablename__ = "daily_summary"
+
+    day = Column(Date, primary_key=True)
+    booking_count = Column(Integer, nullable=False, default=0)
+    booked_minutes = Column(Integer, nullable=False, default=0)
+    total_guests = Column(Integer, nullable=False, default=0)
+    holiday_count = Column(Integer, nullable=False, default=0)
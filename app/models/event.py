@@ -1,13 +1,22 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
 class CalendarEvent(Base):
     __tablename__ = "calendar_events"
+    # 範囲検索用の複合インデックス（app/db/migrations/m0001_calendar_event_indexes.py で既存DBにも作成します）
+    __table_args__ = (
+        Index("ix_calendar_events_date_start_end", "event_date", "start_time", "end_time"),
+        Index("ix_calendar_events_holiday_date", "is_holiday", "event_date"),
+        Index("ix_calendar_events_user_start", "user_id", "start_time"),
+        Index("ix_calendar_events_updated_at", "updated_at"),
+        # 一覧のキーセットページネーション（start_time, id の順）。m0004_calendar_event_start_index.py で既存DBにも作成します。
+        Index("ix_calendar_events_start_id", "start_time", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    event_date = Column(DateTime, nullable=False, index=True)
+    event_date = Column(DateTime, nullable=False)
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=False)
     representative_name = Column(String(255), nullable=False)
@@ -24,7 +33,15 @@ class CalendarEvent(Base):
     user = relationship("User", back_populates="events")
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # 作成時にも設定し、変更検知（max(updated_at)）が ix_calendar_events_updated_at だけで求まるようにします。
+    # 以前の作成で NULL のままの行は m0005_calendar_event_updated_at.py で created_at に揃えます。
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    # 楽観的排他制御の版番号（app/db/migrations/m0003_calendar_event_version.py で既存DBにも追加します）。
+    # 更新・削除は「UPDATE/DELETE ... WHERE id = ? AND version = ?」で実行され、読み込んだ後に
+    # ほかの処理が更新していた場合は StaleDataError になります。版番号は更新のたびに1増えます。
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
     
     def __repr__(self):
         return f"<CalendarEvent {self.representative_name} - {self.event_date}>"
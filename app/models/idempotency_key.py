@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, LargeBinary, SmallInteger, String
+from app.db.base_class import Base
+
+class IdempotencyKey(Base):
+    """
+    Idempotency-Key ごとに保存したレスポンス。status_code が NULL の行は最初のリクエストを処理中であることを表します。
+    expires_at を過ぎた行は無視され、同じキーの新しいリクエストが引き継ぎます。
+    引き継がれた処理中の行には新しい claim_token が入り、元のリクエストはレスポンスを保存（＝予約をコミット）できなくなります。
+    """
+    __tablename__ = "idempotency_keys"
+
+    # エンドポイント（"POST /events" など）とクライアントが指定したキー
+    scope = Column(String(64), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # リクエストの内容（パスのパラメータと本文）の SHA-256。同じキーで内容が違うリクエストを見分けます。
+    request_hash = Column(String(64), nullable=False)
+    # キーを登録（claim）したリクエストごとの乱数。保存・削除はこの値が一致する場合だけ行います。
+    claim_token = Column(String(32), nullable=False)
+    status_code = Column(SmallInteger, nullable=True)
+    # レスポンスの本文（JSON）
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, String
+from app.db.base_class import Base
+
+class ResourceVersion(Base):
+    """リソース（営業ルールなど）ごとの更新番号。書き込みのたびに1増え、ワーカー間のキャッシュ無効化に使います。"""
+    __tablename__ = "resource_versions"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,13 @@
+from datetime import time, date as Date
+from typing import List
+from pydantic import BaseModel, Field
+
+class AvailabilitySlot(BaseModel):
+    start_time: time = Field(..., description="枠の開始時刻")
+    end_time: time = Field(..., description="枠の終了時刻")
+
+class DayAvailability(BaseModel):
+    date: Date = Field(..., description="日付")
+    weekday: int = Field(..., description="曜日（0=月曜, ..., 6=日曜）")
+    is_closed: bool = Field(..., description="定休日かどうか")
+    slots: List[AvailabilitySlot] = Field(default_factory=list, description="予約可能な枠の一覧")
@@ -0,0 +1,17 @@
+from datetime import date as Date
+from typing import List
+from pydantic import BaseModel, Field
+
+class DaySummary(BaseModel):
+    date: Date = Field(..., description="日付")
+    weekday: int = Field(..., description="曜日（0=月曜, ..., 6=日曜）")
+    booking_count: int = Field(0, description="予約数（休日設定を除く）")
+    booked_minutes: int = Field(0, description="予約されている合計時間（分）")
+    total_guests: int = Field(0, description="予約の合計人数（大人＋子供）")
+    is_holiday: bool = Field(False, description="休日設定があるかどうか")
+    is_closed: bool = Field(False, description="定休日かどうか")
+
+class MonthSummary(BaseModel):
+    year: int
+    month: int
+    days: List[DaySummary] = Field(default_factory=list, description="月の各日の集計（1日から月末まで）")
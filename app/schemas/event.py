@@ -1,5 +1,5 @@
 from datetime import datetime, date, time
-from typing import Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field, field_validator
 
 class EventBase(BaseModel):
@@ -32,6 +32,7 @@ class EventInDBBase(EventBase):
     created_at: datetime = Field(..., description="作成日時")
     updated_at: Optional[datetime] = Field(None, description="更新日時")
     user_id: Optional[int] = Field(None, description="関連付けられたユーザーID")
+    version: int = Field(..., description="版番号（更新のたびに増えます。PUT の If-Match に使う ETag の元）")
 
     class Config:
         from_attributes = True
@@ -54,4 +55,26 @@ class Event(EventInDBBase):
     pass
 
 class EventInDB(EventInDBBase):
-    pass
\ No newline at end of file
+    pass
+
+# ---------- 一括予約 ----------
+class EventBatchCreate(BaseModel):
+    items: List[EventCreate] = Field(..., min_length=1, max_length=200, description="作成する予約のリスト")
+    atomic: bool = Field(
+        True,
+        description="trueの場合、1件でもエラーがあれば全件を登録しません。falseの場合、エラーのない項目だけを登録します。",
+    )
+
+class EventBatchItemResult(BaseModel):
+    index: int = Field(..., description="リクエスト内の項目の位置（0始まり）")
+    status: Literal["created", "rejected", "skipped"] = Field(
+        ..., description="created=登録済み, rejected=エラー, skipped=他の項目のエラーにより未登録"
+    )
+    event: Optional[Event] = Field(None, description="登録されたイベント")
+    error: Optional[str] = Field(None, description="エラー内容")
+
+class EventBatchResult(BaseModel):
+    atomic: bool = Field(..., description="all-or-nothing モードで処理したかどうか")
+    created: int = Field(..., description="登録された件数")
+    rejected: int = Field(..., description="エラーになった件数")
+    items: List[EventBatchItemResult] = Field(..., description="項目ごとの結果")
@@ -5,9 +5,10 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
+from app import crud
 from app.core.config import settings
-from app.core.security import verify_password
-from app.db.session import get_db
+from app.core.password_pool import password_hasher
+from app.db.session import Database, get_db
 from app.models.user import User
 from app.schemas.token import TokenPayload
 
@@ -25,7 +26,16 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     user = get_user_by_email(db, email=email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not password_hasher.verify_sync(password, user.hashed_password):
+        return None
+    return user
+
+async def authenticate(db: Database, *, email: str, password: str) -> Optional[User]:
+    """authenticate_user と同じ判定を、パスワードの照合だけプロセスプールで行います。"""
+    user = await db.run(crud.user.get_by_email, email=email)
+    if not user:
+        return None
+    if not await password_hasher.verify(password, user.hashed_password):
         return None
     return user
 
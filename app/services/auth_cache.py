@@ -0,0 +1,148 @@
+"""
+認証（``deps.get_current_user``）のプロセス内キャッシュ。
+
+* ``token_cache``: 検証済みの JWT のペイロード。トークンの SHA-256 をキーにし、最大 ``AUTH_TOKEN_CACHE_TTL_SECONDS`` 秒、
+  ただしトークンの ``exp``・署名鍵の ``key_exp`` を過ぎないあいだだけ保持します。期限切れ後は通常どおり検証し直すため、
+  期限切れのエラーはキャッシュがない場合と同じように返ります。検証に失敗したトークンは保持しません。
+* ``active_users``: 有効なユーザーの列の値。``CRUDUser`` での更新・削除時にこのワーカーの分は即座に破棄され、
+  他のワーカーでは最大 ``AUTH_USER_CACHE_TTL_SECONDS`` 秒後に読み直されます。無効なユーザーは保持しないため、
+  再び有効にした場合もすぐに反映されます。
+
+どちらも TTL に 0 を指定すると無効になります。
+"""
+import hashlib
+import threading
+import time as timer
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models.user import User
+
+
+class TokenPayloadCache:
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # トークンのダイジェスト -> (ペイロード, 破棄する時刻（UNIX 時刻）)
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def verify(self, token: str, verify: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        キャッシュにあればそのペイロードを、なければ verify(token) で検証した結果を返します。
+        verify が送出した例外はそのまま伝わります。
+        """
+        if self.ttl_seconds <= 0:
+            return verify(token)
+        key = self._key(token)
+        now = timer.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry[1]:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+        self.misses += 1
+
+        payload = verify(token)
+        # exp・key_exp の判定（verify_jwt_token と jose）と同じく、その時刻を過ぎたら検証し直します。
+        expires_at = now + self.ttl_seconds
+        for claim in ("exp", "key_exp"):
+            if isinstance(payload.get(claim), (int, float)):
+                expires_at = min(expires_at, payload[claim])
+        if expires_at > now:
+            with self._lock:
+                self._entries[key] = (payload, expires_at)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return payload
+
+    def clear(self) -> None:
+        """署名鍵を入れ替えた場合などに、保持しているペイロードをすべて破棄します。"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class ActiveUserCache:
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # ユーザーID -> (列の値, 読み込んだ時刻)
+        self._entries: "OrderedDict[int, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[User]:
+        """
+        キャッシュにある有効なユーザーを返します。
+        リクエストごとに別のインスタンスを作り、DB から読み込んだ直後と同じ detached 状態で返します
+        （セッションに add すれば通常どおり更新できます）。
+        """
+        if self.ttl_seconds <= 0:
+            return None
+        now = timer.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or now - entry[1] >= self.ttl_seconds:
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+        user = User(**entry[0])
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User) -> None:
+        if self.ttl_seconds <= 0 or not user.is_active:
+            return
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        with self._lock:
+            self._entries[user.id] = (values, timer.monotonic())
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+token_cache = TokenPayloadCache(
+    ttl_seconds=settings.AUTH_TOKEN_CACHE_TTL_SECONDS, max_entries=settings.AUTH_CACHE_MAX_ENTRIES
+)
+active_users = ActiveUserCache(
+    ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS, max_entries=settings.AUTH_CACHE_MAX_ENTRIES
+)
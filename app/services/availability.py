@@ -0,0 +1,144 @@
+"""
+空き枠（予約可能な時間帯）の計算。
+
+期間内の全日を「日 × 分」の2次元配列として扱い、予約済み・営業時間外・定休日・過去日を
+まとめて塗りつぶしてから、累積和で長さ ``duration`` 分の連続した空きを一括で判定します。
+判定ルールは ``CRUDEvent.create_with_overlap_check`` と同じです。
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+# 予約の終了時刻は同じ日の time で表せる必要があるため、23:59 が最後の分境界になります。
+LAST_MINUTE = MINUTES_PER_DAY - 1
+
+
+def _seconds_of_day(t: time) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _minute_to_time(minute: int) -> time:
+    return time(minute // 60, minute % 60)
+
+
+def compute_availability(
+    *,
+    start_date: date,
+    end_date: date,
+    duration: int,
+    step: int,
+    intervals: Iterable[Tuple[datetime, datetime]],
+    closed_weekdays: Iterable[int],
+    hours_by_weekday: Dict[int, Tuple[time, time]],
+    today: Optional[date] = None,
+    slot_minutes: int = 1,
+) -> List[dict]:
+    """
+    期間内の各日について、長さ ``duration`` 分の予約可能な枠を返します。
+
+    Args:
+        start_date, end_date: 対象期間（両端を含む）
+        duration: 枠の長さ（分）
+        step: 枠の開始時刻の刻み（分）。営業開始時刻（営業時間未設定の日は0:00）以降の最初の
+            予約枠の区切りを起点にします
+        intervals: 既存イベントの (開始日時, 終了日時) の列。休日イベントも含みます
+        closed_weekdays: 有効な定休日ルールの曜日
+        hours_by_weekday: 曜日ごとの (開店時刻, 閉店時刻)
+        today: 過去日判定の基準日（省略時は ``date.today()``）
+        slot_minutes: 予約枠の長さ（枠モードの BOOKING_SLOT_MINUTES）。duration と step はこの倍数に切り上げ、
+            開始時刻は枠の区切りに揃えます。既定の 1 では分単位です
+
+    Returns:
+        日付順の ``{"date", "weekday", "is_closed", "slots"}`` のリスト。
+        ``slots`` は ``(開始時刻, 終了時刻)`` のリストです。
+    """
+    if today is None:
+        today = date.today()
+    # 枠モードでは、区切りに合っていない枠は予約作成時に拒否されるため、返さないようにします。
+    duration = -(-duration // slot_minutes) * slot_minutes
+    step = -(-step // slot_minutes) * slot_minutes
+
+    num_days = (end_date - start_date).days + 1
+    if num_days <= 0:
+        return []
+
+    days = [start_date + timedelta(days=i) for i in range(num_days)]
+    weekdays = (start_date.weekday() + np.arange(num_days)) % 7
+
+    # 曜日ごとの「予約の開始・終了に使える分」の範囲
+    open_minute = np.zeros(7, dtype=np.int64)
+    close_minute = np.full(7, LAST_MINUTE, dtype=np.int64)
+    for wd, (open_t, close_t) in hours_by_weekday.items():
+        open_minute[wd] = -(-_seconds_of_day(open_t) // 60)
+        close_minute[wd] = min(_seconds_of_day(close_t) // 60, LAST_MINUTE)
+
+    closed = np.zeros(7, dtype=bool)
+    closed[list(set(closed_weekdays))] = True
+
+    # 既存イベントを差分配列に書き込み、分単位の占有数に変換します。
+    # [s, e) 秒の予約は、分 [floor(s/60), ceil(e/60)) と重なる枠を全て塞ぎます。
+    diff = np.zeros((num_days, MINUTES_PER_DAY + 1), dtype=np.int32)
+    rows: List[int] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    for start_dt, end_dt in intervals:
+        row = (start_dt.date() - start_date).days
+        if row < 0 or row >= num_days:
+            continue
+        s = _seconds_of_day(start_dt.time()) // 60
+        if end_dt.date() > start_dt.date():
+            e = MINUTES_PER_DAY
+        else:
+            e = -(-_seconds_of_day(end_dt.time()) // 60)
+        if e <= s:
+            e = s + 1
+        rows.append(row)
+        starts.append(s)
+        ends.append(min(e, MINUTES_PER_DAY))
+    if rows:
+        row_arr = np.asarray(rows)
+        np.add.at(diff, (row_arr, np.asarray(starts)), 1)
+        np.add.at(diff, (row_arr, np.asarray(ends)), -1)
+    occupied = np.cumsum(diff, axis=1)[:, :MINUTES_PER_DAY] > 0
+
+    minutes = np.arange(MINUTES_PER_DAY)
+    day_open = open_minute[weekdays][:, None]
+    # 開始時刻の起点（営業開始時刻以降の最初の枠の区切り）
+    day_anchor = -(-day_open // slot_minutes) * slot_minutes
+    day_close = close_minute[weekdays][:, None]
+    blocked = occupied | (minutes < day_open) | (minutes >= day_close)
+
+    past = np.array([d < today for d in days])
+    unavailable_day = closed[weekdays] | past
+    blocked[unavailable_day] = True
+
+    # blocked_prefix[:, m] = 0..m-1 分のうち塞がっている分の数
+    blocked_prefix = np.zeros((num_days, MINUTES_PER_DAY + 1), dtype=np.int32)
+    np.cumsum(blocked, axis=1, out=blocked_prefix[:, 1:])
+
+    candidates = np.arange(max(MINUTES_PER_DAY - duration, 0) + 1)
+    window = blocked_prefix[:, candidates + duration] - blocked_prefix[:, candidates]
+    offset = candidates[None, :] - day_anchor
+    free = (
+        (window == 0)
+        & (offset >= 0)
+        & (offset % step == 0)
+        & (candidates[None, :] + duration <= day_close)
+    )
+
+    result: List[dict] = [
+        {
+            "date": d,
+            "weekday": int(weekdays[i]),
+            "is_closed": bool(closed[weekdays[i]]),
+            "slots": [],
+        }
+        for i, d in enumerate(days)
+    ]
+    for row, minute in zip(*np.nonzero(free)):
+        result[row]["slots"].append(
+            (_minute_to_time(int(minute)), _minute_to_time(int(minute) + duration))
+        )
+    return result
@@ -0,0 +1,191 @@
+"""
+予約の重複判定用のプロセス内インデックス。
+
+日付ごとに開始時刻の昇順で並べた (開始, 終了, ID) の配列を保持し、二分探索で重なる予約を探します。
+日付は初めて参照されたときにDBから読み込まれ、作成・更新・削除のたびに差分で更新されます。
+他のワーカーによる書き込みは反映されないため、既定ではDBの重複チェックを最終確認として残します。
+
+DBの重複チェックを残す場合（CONFLICT_INDEX_SKIP_DB_CHECK=false）に減るのは、重なりが見つかったときの処理だけです
+（範囲検索の代わりに、見つかった予約を主キーで1件確認します）。重なりがない予約では範囲検索が残るため、
+空いている枠の予約を速くするには SKIP_DB_CHECK が必要です（ワーカーが1つの構成のみ）。
+"""
+import logging
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.event import CalendarEvent
+
+logger = logging.getLogger(__name__)
+
+Interval = Tuple[datetime, datetime, int]
+
+
+class DayIntervals:
+    """1日分の予約区間。``starts``/``ends``/``ids`` は開始時刻の昇順に並んだ平行配列です。"""
+
+    __slots__ = ("starts", "ends", "ids", "_max_end")
+
+    def __init__(self, intervals: List[Interval]):
+        intervals = sorted(intervals)
+        self.starts: List[datetime] = [s for s, _, _ in intervals]
+        self.ends: List[datetime] = [e for _, e, _ in intervals]
+        self.ids: List[int] = [i for _, _, i in intervals]
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        # _max_end[i] = ends[0..i] の最大値。既存データに重なりがあっても正しく判定するために使います。
+        self._max_end: List[datetime] = []
+        for end in self.ends:
+            self._max_end.append(end if not self._max_end or end > self._max_end[-1] else self._max_end[-1])
+
+    def _update_max_end(self, pos: int) -> None:
+        """pos 以降の _max_end を更新します。値が変わらなくなった位置から先は以前のままで正しいため、そこで止めます。"""
+        prev = self._max_end[pos - 1] if pos else None
+        for i in range(pos, len(self.ends)):
+            end = self.ends[i]
+            current = end if prev is None or end > prev else prev
+            if self._max_end[i] == current:
+                break
+            self._max_end[i] = current
+            prev = current
+
+    def add(self, event_id: int, start: datetime, end: datetime) -> None:
+        pos = bisect_left(self.starts, start)
+        self.starts.insert(pos, start)
+        self.ends.insert(pos, end)
+        self.ids.insert(pos, event_id)
+        self._max_end.insert(pos, None)
+        self._update_max_end(pos)
+
+    def remove(self, event_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None) -> None:
+        """event_id の区間を削除します。start・end を指定した場合は、その区間だけを削除します。"""
+        lo = 0 if start is None else bisect_left(self.starts, start)
+        for pos in range(lo, len(self.ids)):
+            if start is not None and self.starts[pos] != start:
+                return
+            if self.ids[pos] == event_id and (end is None or self.ends[pos] == end):
+                del self.starts[pos], self.ends[pos], self.ids[pos], self._max_end[pos]
+                self._update_max_end(pos)
+                return
+
+    def find_overlap(self, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> Optional[int]:
+        """[start, end) と重なる予約のIDを返します。なければ None。"""
+        # starts[:hi] が end より前に始まる予約。その中で start より後に終わるものが重なりです。
+        hi = bisect_left(self.starts, end)
+        if hi == 0 or self._max_end[hi - 1] <= start:
+            return None
+        for pos in range(hi - 1, -1, -1):
+            if self._max_end[pos] <= start:
+                break
+            if self.ends[pos] > start and self.ids[pos] != exclude_id:
+                return self.ids[pos]
+        return None
+
+    def as_set(self) -> set:
+        return set(zip(self.starts, self.ends, self.ids))
+
+
+class ConflictIndex:
+    """日付ごとの :class:`DayIntervals` を遅延読み込みで保持します。読み込む日数は ``max_days`` で制限します。"""
+
+    def __init__(self, max_days: int = 366):
+        self.max_days = max_days
+        self._days: "OrderedDict[date, DayIntervals]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_from_db(db: Session, day: date) -> List[Interval]:
+        rows = (
+            db.query(CalendarEvent.start_time, CalendarEvent.end_time, CalendarEvent.id)
+            .filter(
+                CalendarEvent.event_date >= datetime.combine(day, time.min),
+                CalendarEvent.event_date < datetime.combine(day + timedelta(days=1), time.min),
+            )
+            .all()
+        )
+        return [(row.start_time, row.end_time, row.id) for row in rows]
+
+    def _get_day(self, db: Session, day: date) -> DayIntervals:
+        with self._lock:
+            intervals = self._days.get(day)
+            if intervals is not None:
+                self._days.move_to_end(day)
+                return intervals
+        intervals = DayIntervals(self._load_from_db(db, day))
+        with self._lock:
+            self._days[day] = intervals
+            self._days.move_to_end(day)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        return intervals
+
+    def find_conflict(
+        self,
+        db: Session,
+        *,
+        start: datetime,
+        end: datetime,
+        exclude_id: Optional[int] = None,
+    ) -> Optional[int]:
+        """[start, end) と重なる予約のIDを返します。その日が未読み込みならDBから読み込みます。"""
+        intervals = self._get_day(db, start.date())
+        with self._lock:
+            return intervals.find_overlap(start, end, exclude_id=exclude_id)
+
+    def add(self, event_id: int, start: datetime, end: datetime) -> None:
+        with self._lock:
+            intervals = self._days.get(start.date())
+            if intervals is not None:
+                intervals.add(event_id, start, end)
+
+    def remove(
+        self,
+        event_id: int,
+        day: date,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> None:
+        with self._lock:
+            intervals = self._days.get(day)
+            if intervals is not None:
+                intervals.remove(event_id, start, end)
+
+    def invalidate(self, day: Optional[date] = None) -> None:
+        """指定日（省略時は全日）を破棄し、次回参照時にDBから読み直させます。"""
+        with self._lock:
+            if day is None:
+                self._days.clear()
+            else:
+                self._days.pop(day, None)
+
+    def verify_day(self, db: Session, day: date) -> bool:
+        """
+        インデックスの内容をDBと比較します。
+        不一致があれば警告を記録してDBの内容で置き換え、False を返します。未読み込みの日は True です。
+        """
+        with self._lock:
+            intervals = self._days.get(day)
+            if intervals is None:
+                return True
+            cached = intervals.as_set()
+        actual = self._load_from_db(db, day)
+        if cached == set(actual):
+            return True
+        logger.warning(
+            "conflict index mismatch on %s: missing=%s stale=%s",
+            day,
+            sorted(set(actual) - cached),
+            sorted(cached - set(actual)),
+        )
+        with self._lock:
+            self._days[day] = DayIntervals(actual)
+        return False
+
+
+conflict_index = ConflictIndex(max_days=settings.CONFLICT_INDEX_MAX_DAYS)
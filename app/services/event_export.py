@@ -0,0 +1,120 @@
+"""
+予約（calendar_events）の一括エクスポート。
+
+ORM オブジェクトやスキーマを経由せず、Core の select で取得した行を ``yield_per`` 件ずつ
+サーバーサイドカーソルから読み出して NDJSON / CSV の文字列にします。
+ジェネレーターなので、期間が1日でも10年でもメモリ使用量は一定です。
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Any, Iterator, Optional, Sequence
+
+from sqlalchemy import select
+
+from app.db.session import new_session
+from app.models.event import CalendarEvent
+
+# 出力する列（Event スキーマのフィールドと同じ順序）
+COLUMNS = (
+    "event_date",
+    "start_time",
+    "end_time",
+    "representative_name",
+    "phone_number",
+    "num_adults",
+    "num_children",
+    "notes",
+    "plan",
+    "is_holiday",
+    "holiday_name",
+    "id",
+    "created_at",
+    "updated_at",
+    "user_id",
+    "version",
+)
+# DB上は日時で保存され、Event スキーマでは日付・時刻として返す列
+_DATE_COLUMNS = {"event_date"}
+_TIME_COLUMNS = {"start_time", "end_time"}
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def iter_event_rows(
+    *,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[Sequence[Sequence[Any]]]:
+    """
+    期間内（両端を含む、省略時は全期間）の予約を開始日時順に batch_size 行ずつ返します。
+    レスポンスの送信中ずっと接続を使うため、リクエストのセッションとは別に専用のセッションを開きます。
+    """
+    table = CalendarEvent.__table__
+    stmt = select(*(table.c[name] for name in COLUMNS)).order_by(table.c.start_time, table.c.id)
+    if start_date is not None:
+        stmt = stmt.where(table.c.event_date >= datetime.combine(start_date, time.min))
+    if end_date is not None:
+        stmt = stmt.where(table.c.event_date < datetime.combine(end_date + timedelta(days=1), time.min))
+
+    with new_session() as session:
+        result = session.execute(
+            stmt.execution_options(stream_results=True, yield_per=batch_size)
+        )
+        for partition in result.partitions():
+            yield partition
+
+
+def _to_json(name: str, value: Any) -> Any:
+    """値を Event スキーマの JSON 出力と同じ表現に変換します。"""
+    if value is None:
+        return None
+    if name in _DATE_COLUMNS:
+        return value.date().isoformat()
+    if name in _TIME_COLUMNS:
+        return value.time().isoformat()
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        # pydantic は UTC を "Z" で出力します。
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return value
+
+
+def _to_csv(name: str, value: Any) -> Any:
+    value = _to_json(name, value)
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def iter_ndjson(batches: Iterator[Sequence[Sequence[Any]]]) -> Iterator[str]:
+    for rows in batches:
+        yield "".join(
+            json.dumps(
+                {name: _to_json(name, value) for name, value in zip(COLUMNS, row)},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            + "\n"
+            for row in rows
+        )
+
+
+def iter_csv(batches: Iterator[Sequence[Sequence[Any]]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in batches:
+        writer.writerows(
+            [_to_csv(name, value) for name, value in zip(COLUMNS, row)]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,111 @@
+"""
+予約・休日の iCalendar（RFC 5545）フィードの生成。
+
+予約は開始・終了日時を持つ VEVENT、休日設定は終日の VEVENT として出力します。
+日時はDBに保存されている店舗の現地時刻のまま、タイムゾーン指定のない時刻として出力します。
+行は :func:`app.services.event_export.iter_event_rows` から少しずつ受け取り、逐次文字列にします。
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from app.core.config import settings
+from app.services.event_export import COLUMNS
+
+CRLF = "\r\n"
+# 1行の最大オクテット数（これを超える行は折り返します）
+MAX_LINE_OCTETS = 75
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """75オクテットを超える行を、UTF-8 の文字の途中で切らないように折り返します。"""
+    if len(line.encode()) <= MAX_LINE_OCTETS:
+        return line + CRLF
+    parts = []
+    current = ""
+    size = 0
+    limit = MAX_LINE_OCTETS
+    for ch in line:
+        width = len(ch.encode())
+        if size + width > limit:
+            parts.append(current)
+            # 継続行は先頭の空白1文字分だけ短くなります。
+            current, size, limit = "", 0, MAX_LINE_OCTETS - 1
+        current += ch
+        size += width
+    parts.append(current)
+    return (CRLF + " ").join(parts) + CRLF
+
+
+def _local(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def _utc(value: Optional[datetime]) -> str:
+    if value is None:
+        value = datetime.now(timezone.utc)
+    elif value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _vevent(event: Dict[str, Any]) -> str:
+    modified = event["updated_at"] or event["created_at"]
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event['id']}@calendar-booking-api",
+        f"DTSTAMP:{_utc(modified)}",
+    ]
+    if modified is not None:
+        lines.append(f"LAST-MODIFIED:{_utc(modified)}")
+    if event["is_holiday"]:
+        day = event["event_date"].date()
+        lines += [
+            f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(day + timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{_escape(event['holiday_name'] or '休日')}",
+            "TRANSP:TRANSPARENT",
+        ]
+    else:
+        guests = f"大人{event['num_adults'] or 0}名・子供{event['num_children'] or 0}名"
+        description = [f"電話番号: {event['phone_number']}", f"人数: {guests}"]
+        if event["plan"]:
+            description.append(f"プラン: {event['plan']}")
+        if event["notes"]:
+            description.append(f"備考: {event['notes']}")
+        description_text = "\n".join(description)
+        lines += [
+            f"DTSTART:{_local(event['start_time'])}",
+            f"DTEND:{_local(event['end_time'])}",
+            f"SUMMARY:{_escape(event['representative_name'] + '（' + guests + '）')}",
+            f"DESCRIPTION:{_escape(description_text)}",
+        ]
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def iter_ics(batches: Iterator[Sequence[Sequence[Any]]]) -> Iterator[str]:
+    """iter_event_rows の出力から iCalendar のテキストを逐次生成します。"""
+    yield "".join(
+        _fold(line)
+        for line in (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:-//{settings.PROJECT_NAME}//JA",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{_escape(settings.PROJECT_NAME)}",
+        )
+    )
+    for rows in batches:
+        yield "".join(_vevent(dict(zip(COLUMNS, row))) for row in rows)
+    yield "END:VCALENDAR" + CRLF
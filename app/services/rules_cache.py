@@ -0,0 +1,125 @@
+"""
+営業ルール（定休日ルール・営業時間）のプロセス内キャッシュ。
+
+両テーブルは最大でも7行程度でほとんど変更されないため、曜日を添字にした配列として丸ごと保持します。
+書き込みは ``CRUDWeeklyHolidayRule`` / ``CRUDBusinessHours`` 経由で ``resource_versions`` の更新番号を上げ、
+各ワーカーは最大 ``BUSINESS_RULES_CACHE_TTL_SECONDS`` 秒ごとに番号を確認して変更を取り込みます。
+"""
+import threading
+import time as timer
+from dataclasses import dataclass
+from datetime import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_resource_version import resource_version
+from app.models.business import BusinessHours, WeeklyHolidayRule
+
+RESOURCE_NAME = "business_rules"
+
+
+@dataclass(frozen=True)
+class CachedRule:
+    id: int
+    weekday: int
+    name: Optional[str]
+    active: bool
+
+
+@dataclass(frozen=True)
+class CachedHours:
+    id: int
+    weekday: int
+    open_time: time
+    close_time: time
+
+
+@dataclass(frozen=True)
+class BusinessRules:
+    version: int
+    # 有効な定休日ルール（id順）
+    rules: Tuple[CachedRule, ...]
+    # 添字=曜日（0=月曜 ... 6=日曜）
+    closed: Tuple[bool, ...]
+    hours: Tuple[Optional[CachedHours], ...]
+
+    @property
+    def closed_weekdays(self) -> FrozenSet[int]:
+        return frozenset(wd for wd, closed in enumerate(self.closed) if closed)
+
+    @property
+    def hours_by_weekday(self) -> Dict[int, CachedHours]:
+        return {bh.weekday: bh for bh in self.hours if bh is not None}
+
+
+class BusinessRulesCache:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._rules: Optional[BusinessRules] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session) -> BusinessRules:
+        """
+        現在の営業ルールを返します。
+        前回の確認から TTL 以内ならDBに問い合わせず、超えていれば更新番号だけを確認し、変わっていた場合のみ読み直します。
+        """
+        rules = self._rules
+        now = timer.monotonic()
+        if rules is not None and now - self._checked_at < self.ttl_seconds:
+            self.hits += 1
+            return rules
+
+        version = resource_version.get(db, name=RESOURCE_NAME)
+        if rules is not None and rules.version == version:
+            self._checked_at = now
+            self.hits += 1
+            return rules
+
+        self.misses += 1
+        rules = self._load(db, version)
+        with self._lock:
+            self._rules = rules
+            self._checked_at = now
+        return rules
+
+    @staticmethod
+    def _load(db: Session, version: int) -> BusinessRules:
+        rule_rows = (
+            db.query(WeeklyHolidayRule)
+            .filter(WeeklyHolidayRule.active == True)
+            .order_by(WeeklyHolidayRule.id.asc())
+            .all()
+        )
+        rules = tuple(CachedRule(r.id, r.weekday, r.name, r.active) for r in rule_rows)
+        hours: list = [None] * 7
+        for bh in db.query(BusinessHours).all():
+            if 0 <= bh.weekday <= 6:
+                hours[bh.weekday] = CachedHours(bh.id, bh.weekday, bh.open_time, bh.close_time)
+        closed = tuple(any(r.weekday == wd for r in rules) for wd in range(7))
+        return BusinessRules(version=version, rules=rules, closed=closed, hours=tuple(hours))
+
+    def invalidate(self, db: Session) -> None:
+        """
+        営業ルールの変更を記録します。書き込みと同じトランザクション内で、コミット前に呼び出してください。
+        このワーカーのキャッシュは即座に、他のワーカーは TTL 以内に破棄されます。
+        """
+        resource_version.bump(db, name=RESOURCE_NAME)
+        with self._lock:
+            self._rules = None
+
+    def stats(self) -> dict:
+        rules = self._rules
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": rules.version if rules is not None else None,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+business_rules_cache = BusinessRulesCache(ttl_seconds=settings.BUSINESS_RULES_CACHE_TTL_SECONDS)
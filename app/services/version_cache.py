@@ -0,0 +1,58 @@
+"""
+``resource_versions`` の更新番号のプロセス内キャッシュ。
+
+設定系の GET エンドポイントは更新番号から ETag を作り、If-None-Match が一致すれば DB に問い合わせずに 304 を返します。
+書き込みは ``bump`` で番号を上げ、このワーカーのキャッシュは即座に、他のワーカーは最大 TTL 秒後に新しい番号を読み直します。
+営業ルール（定休日・営業時間）の番号は ``business_rules_cache`` が同じ仕組みで保持しています。
+"""
+import threading
+import time as timer
+from typing import Dict, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_resource_version import resource_version
+
+HOLIDAYS = "holidays"
+
+
+class ResourceVersionCache:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, name: str) -> int:
+        """リソースの更新番号を返します。前回の確認から TTL 以内ならDBに問い合わせません。"""
+        entry = self._versions.get(name)
+        now = timer.monotonic()
+        if entry is not None and now - entry[1] < self.ttl_seconds:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        version = resource_version.get(db, name=name)
+        with self._lock:
+            self._versions[name] = (version, now)
+        return version
+
+    def bump(self, db: Session, name: str) -> None:
+        """
+        リソースの変更を記録します。書き込みと同じトランザクション内で、コミット前に呼び出してください。
+        """
+        resource_version.bump(db, name=name)
+        with self._lock:
+            self._versions.pop(name, None)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "versions": {name: version for name, (version, _) in self._versions.items()},
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+resource_versions = ResourceVersionCache(ttl_seconds=settings.RESOURCE_VERSION_CACHE_TTL_SECONDS)
@@ -0,0 +1,44 @@
+"""
+定休日ルールの発生日の展開。
+
+日付を1日ずつ走査せず、ルールごとに期間内の最初の該当日を求めて7日刻みで進め、
+全ルールの列を日付順にマージします。ジェネレーターなので、長い期間でもメモリ使用量は一定です。
+"""
+import heapq
+from datetime import date, timedelta
+from typing import Iterator, Sequence, Tuple
+
+from app.services.rules_cache import BusinessRules, CachedRule
+
+WEEK = timedelta(days=7)
+
+
+def _iter_rule_dates(
+    order: int, rule: CachedRule, start_date: date, end_date: date
+) -> Iterator[Tuple[date, int, CachedRule]]:
+    day = start_date + timedelta(days=(rule.weekday - start_date.weekday()) % 7)
+    while day <= end_date:
+        yield day, order, rule
+        day += WEEK
+
+
+def iter_weekly_occurrences(
+    rules: BusinessRules, *, start_date: date, end_date: date
+) -> Iterator[dict]:
+    """
+    期間内（両端を含む）で定休日ルールに該当する日を日付順に返します。
+    同じ日に複数のルールが該当する場合はルールの並び順に返します。
+    """
+    streams = [
+        _iter_rule_dates(order, rule, start_date, end_date)
+        for order, rule in enumerate(rules.rules)
+    ]
+    for day, _, rule in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+        bh = rules.hours[rule.weekday]
+        yield {
+            "date": day,
+            "weekday": rule.weekday,
+            "name": rule.name,
+            "open_time": bh.open_time if bh else None,
+            "close_time": bh.close_time if bh else None,
+        }
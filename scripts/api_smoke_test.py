@@ -178,6 +178,33 @@ class APITester:
         self._print("POST /events (outside BH)", {"status": r.status_code, "text": r.text})
         self._expect(r, 409)
 
+    # -------- Availability --------
+    def test_availability(self):
+        # Every slot listed as free must be bookable (also with BOOKING_SLOT_MODE, where an
+        # unaligned step/duration would otherwise list slots that POST /events rejects).
+        today = dt.date.today()
+        offset = (3 - today.weekday() + 7) % 7 + 7  # same Thursday as test_events
+        day = today + dt.timedelta(days=offset)
+        params = {"start_date": day.isoformat(), "end_date": day.isoformat(), "duration": 20, "step": 10}
+        r = requests.get(self._url("/events/availability"), params=params)
+        self._expect(r, 200)
+        slots = r.json()[0]["slots"]
+        self._print("GET /events/availability", {"slots": len(slots)})
+        if not slots:
+            raise AssertionError("Expected free slots on the test day")
+        for slot in slots:
+            payload = {
+                "event_date": day.isoformat(),
+                "start_time": slot["start_time"],
+                "end_time": slot["end_time"],
+                "representative_name": "空き枠 確認",
+                "phone_number": "090-3333-4444",
+            }
+            r = requests.post(self._url("/events"), json=payload)
+            if r.status_code != 200:
+                raise AssertionError(f"Free slot {slot} was rejected: {r.status_code} {r.text}")
+            requests.delete(self._url(f"/events/{r.json()['id']}"))
+
     # -------- Cleanup --------
     def cleanup(self):
         # Delete created events
@@ -280,6 +307,7 @@ class APITester:
             self.test_weekly_holidays()
             self.test_holidays()
             self.test_events()
+            self.test_availability()
             self._print("All tests finished successfully ✅")
         except Exception as e:
             self._print("Test failed ❌", {"error": str(e)})
@@ -0,0 +1,131 @@
+"""
+同期DBモードと非同期DBモード（DB_ASYNC）のスループットを同時接続数ごとに比較するスクリプト。
+
+Usage:
+  python scripts/benchmark_db_modes.py --concurrency 8 32 128 --duration 15 --output bench_db_modes.json
+
+Notes:
+- 各モードごとに uvicorn（1ワーカー）を子プロセスとして起動し、同じ DATABASE_URL に対して負荷をかけます。
+  非同期モードでは ASYNC_DATABASE_URL（未指定時は DATABASE_URL から自動変換）の非同期ドライバが必要です。
+- 計測するのは参照系のエンドポイント（GET /events, /business-hours, /weekly-holidays）です。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import requests
+
+PROJECT_ROOT = Path(__file__).parent.parent
+PATHS = [
+    "/events/?limit=50",
+    "/business-hours/",
+    "/weekly-holidays/",
+]
+
+
+def start_server(db_async: bool, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DB_ASYNC="true" if db_async else "false")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+def run_load(base_url: str, concurrency: int, duration: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(worker_id: int) -> None:
+        nonlocal errors
+        session = requests.Session()
+        i = worker_id
+        local: List[float] = []
+        local_errors = 0
+        while time.perf_counter() < stop_at:
+            path = PATHS[i % len(PATHS)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                resp = session.get(base_url + path, timeout=30)
+                if resp.status_code != 200:
+                    local_errors += 1
+            except requests.RequestException:
+                local_errors += 1
+            local.append((time.perf_counter() - t0) * 1000)
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / duration, 1),
+        "p50_ms": round(statistics.median(latencies), 2) if count else None,
+        "p95_ms": round(latencies[int(count * 0.95) - 1], 2) if count else None,
+        "p99_ms": round(latencies[int(count * 0.99) - 1], 2) if count else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="同期/非同期DBモードのスループットを比較します。")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--duration", type=float, default=15.0, help="各計測の秒数")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--api-prefix", default="/api/v1")
+    parser.add_argument("--output", default="bench_db_modes.json")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"duration": args.duration, "paths": PATHS, "modes": {}}
+    for mode, db_async in (("sync", False), ("async", True)):
+        proc = start_server(db_async, args.port)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}{args.api_prefix}"
+            run_load(base_url, 4, 2.0)  # ウォームアップ
+            report["modes"][mode] = [
+                run_load(base_url, concurrency, args.duration) for concurrency in args.concurrency
+            ]
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+    print(f"{'mode':<6} {'conc':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode, rows in report["modes"].items():
+        for row in rows:
+            print(
+                f"{mode:<6} {row['concurrency']:>5} {row['rps']:>9} {row['p50_ms']:>9} "
+                f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
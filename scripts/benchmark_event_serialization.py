@@ -0,0 +1,136 @@
+"""
+イベント一覧のシリアライズ処理を、従来の経路（response_model による検証＋JSONResponse）と
+app/api/responses.py の高速な経路で比較するスクリプト。
+
+Usage:
+  python scripts/benchmark_event_serialization.py --rows 100 1000 --repeat 50 --output bench_serialization.json
+
+Notes:
+- DB は使わず、メモリ上に作った CalendarEvent オブジェクトをシリアライズします。
+- 従来の経路は FastAPI がエンドポイントの戻り値に対して行う処理（serialize_response）をそのまま呼び出します。
+- 計測の前に、両方の経路の出力がバイト単位で一致することを確認します。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time as timer
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.responses import event_list_response, msgpack
+from app.models import CalendarEvent
+from app.schemas.event import Event
+
+
+def make_events(rows: int) -> List[CalendarEvent]:
+    rnd = random.Random(42)
+    start = date(2025, 1, 1)
+    events = []
+    for i in range(rows):
+        day = start + timedelta(days=i // 8)
+        start_dt = datetime.combine(day, time(9 + i % 8, rnd.choice((0, 15, 30, 45))))
+        is_holiday = i % 50 == 0
+        events.append(
+            CalendarEvent(
+                id=i + 1,
+                event_date=start_dt,
+                start_time=start_dt,
+                end_time=start_dt + timedelta(minutes=rnd.choice((30, 60, 90))),
+                representative_name=f"予約者 {i}",
+                phone_number="090-0000-0000",
+                num_adults=rnd.randrange(1, 5),
+                num_children=rnd.randrange(0, 3),
+                notes="窓際の席を希望 \"常連\"" if i % 3 == 0 else None,
+                plan="ランチ" if i % 2 else None,
+                is_holiday=is_holiday,
+                holiday_name="臨時休業" if is_holiday else None,
+                user_id=i % 7 or None,
+                version=1 + i % 3,
+                created_at=start_dt - timedelta(days=30, microseconds=rnd.randrange(1_000_000)),
+                updated_at=(
+                    datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc) if i % 4 == 0 else None
+                ),
+            )
+        )
+    return events
+
+
+def make_request(accept: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        t0 = timer.perf_counter()
+        fn()
+        timings.append((timer.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="イベント一覧のシリアライズ処理の速度を比較します。")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", default="bench_serialization.json")
+    args = parser.parse_args()
+
+    json_request = make_request("application/json")
+    msgpack_request = make_request("application/msgpack")
+    field = create_response_field(name="response", type_=List[Event])
+
+    def legacy(events: List[CalendarEvent]) -> bytes:
+        # asyncio.run の起動コストを計測に含めないよう、ループを使い回します。
+        content = loop.run_until_complete(
+            serialize_response(field=field, response_content=events, is_coroutine=True)
+        )
+        return JSONResponse(content=content).body
+
+    loop = asyncio.new_event_loop()
+    report: Dict[str, Any] = {"repeat": args.repeat, "msgpack": msgpack is not None, "results": []}
+    for rows in args.rows:
+        events = make_events(rows)
+        fast_body = event_list_response(json_request, events).body
+        if fast_body != legacy(events):
+            raise SystemExit(f"rows={rows}: fast path output differs from the baseline")
+
+        result: Dict[str, Any] = {
+            "rows": rows,
+            "bytes": len(fast_body),
+            "baseline": measure(lambda: legacy(events), args.repeat),
+            "orjson": measure(lambda: event_list_response(json_request, events), args.repeat),
+        }
+        if msgpack is not None:
+            result["msgpack"] = measure(lambda: event_list_response(msgpack_request, events), args.repeat)
+            result["msgpack_bytes"] = len(event_list_response(msgpack_request, events).body)
+        result["speedup"] = round(result["baseline"]["median_ms"] / result["orjson"]["median_ms"], 1)
+        report["results"].append(result)
+    loop.close()
+
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+    print(f"{'rows':>6} {'baseline ms':>12} {'orjson ms':>10} {'msgpack ms':>11} {'speedup':>8}")
+    for r in report["results"]:
+        mp = r["msgpack"]["median_ms"] if "msgpack" in r else "-"
+        print(
+            f"{r['rows']:>6} {r['baseline']['median_ms']:>12} {r['orjson']['median_ms']:>10} "
+            f"{mp:>11} {r['speedup']:>7}x"
+        )
+    print("Output is byte-identical to the baseline for all sizes.")
+
+
+if __name__ == "__main__":
+    main()
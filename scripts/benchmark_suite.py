@@ -0,0 +1,365 @@
+"""
+CRUD・検証・シリアライズなどの処理時間を計測するマイクロベンチマーク。
+
+Usage:
+  python scripts/benchmark_suite.py run --output bench_baseline.json
+  python scripts/benchmark_suite.py run --output bench_current.json --only create_ serialize_
+  python scripts/benchmark_suite.py compare bench_baseline.json bench_current.json --threshold 0.15
+  python scripts/benchmark_suite.py run --strict-queries
+
+Notes:
+- 一時ディレクトリの SQLite をDBとして使い、アプリをプロセス内で読み込んで計測します（サーバーやMySQLは不要です）。
+- 各ケースは準備処理を計測に含めず、指定回数実行した処理時間の中央値・最小値・p95 を JSON に記録します。
+- compare は中央値が threshold（割合）より遅くなったケースを表示し、1件でもあれば終了コード 1 で終了します。
+- --strict-queries を付けると、クエリ予算のチェックを厳格モードで有効にし、各ケースの最初の1回で N+1 の疑いも確認します。
+  違反したケースはエラーとして記録され、終了コード 1 で終了します。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time as timer
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+Case = Callable[[], Callable[[], Any]]
+
+
+def setup_database(strict_queries: bool = False) -> None:
+    """アプリを読み込む前に、DB の接続先を一時ディレクトリの SQLite に切り替えます。"""
+    workdir = tempfile.mkdtemp(prefix="calendar-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ["DB_ASYNC"] = "false"
+    os.environ.setdefault("BOOKING_LOCK_BACKEND", "local")
+    if strict_queries:
+        os.environ["QUERY_BUDGET_ENABLED"] = "true"
+        os.environ["QUERY_BUDGET_STRICT"] = "true"
+
+
+def build_cases() -> Dict[str, Case]:
+    """ケース名 -> 準備処理。準備処理は計測対象の関数（引数なし）を返します。"""
+    from fastapi import Request
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.testclient import TestClient
+    from fastapi.utils import create_response_field
+    from sqlalchemy import delete, insert
+
+    from app import crud
+    from app.api.responses import event_list_response
+    from app.core.password_pool import password_hasher
+    from app.core.security import get_password_hash
+    from app.db.base_class import Base
+    from app.db.session import SessionLocal, engine
+    from app.main import app
+    from app.models import BookedSlot, CalendarEvent
+    from app.schemas.event import Event, EventCreate
+    from app.services.rules_cache import BusinessRules, CachedRule
+    from app.services.weekly_occurrences import iter_weekly_occurrences
+
+    Base.metadata.create_all(bind=engine)
+    # 未来の日付を使い、曜日は定休日・営業時間の影響を受けない範囲に散らします。
+    base_day = date.today() + timedelta(days=400)
+
+    def reset_events() -> None:
+        with engine.begin() as conn:
+            conn.execute(delete(CalendarEvent))
+            conn.execute(delete(BookedSlot))
+
+    def seed_events(rows: int, days: int) -> None:
+        batch = []
+        for i in range(rows):
+            start_dt = datetime.combine(base_day + timedelta(days=i % days), time(0, 0)) + timedelta(
+                minutes=15 * (i // days % 90)
+            )
+            batch.append(
+                {
+                    "event_date": start_dt,
+                    "start_time": start_dt,
+                    "end_time": start_dt + timedelta(minutes=10),
+                    "representative_name": f"bench {i}",
+                    "phone_number": "000-0000-0000",
+                    "num_adults": 2,
+                    "num_children": 0,
+                    "is_holiday": False,
+                }
+            )
+        with engine.begin() as conn:
+            for chunk in range(0, len(batch), 5000):
+                conn.execute(insert(CalendarEvent), batch[chunk:chunk + 5000])
+
+    def booking(day: date, start: time, minutes: int = 10) -> EventCreate:
+        end = (datetime.combine(day, start) + timedelta(minutes=minutes)).time()
+        return EventCreate(
+            event_date=day,
+            start_time=start,
+            end_time=end,
+            representative_name="bench",
+            phone_number="000-0000-0000",
+        )
+
+    def create_empty_day() -> Callable[[], Any]:
+        reset_events()
+        days = iter(base_day + timedelta(days=i) for i in range(10_000))
+
+        def run() -> None:
+            with SessionLocal() as db:
+                crud.event.create_with_overlap_check(db, obj_in=booking(next(days), time(10, 0)))
+        return run
+
+    def create_crowded_day() -> Callable[[], Any]:
+        # 10分の予約と10分の空きが交互に並ぶ日に、空いている枠を順に予約します。
+        reset_events()
+        day = base_day
+        with SessionLocal() as db:
+            for slot in range(0, 24 * 60, 20):
+                crud.event.create_with_overlap_check(
+                    db, obj_in=booking(day, (datetime.min + timedelta(minutes=slot)).time())
+                )
+        gaps = iter((datetime.min + timedelta(minutes=slot + 10)).time() for slot in range(0, 24 * 60, 20))
+
+        def run() -> None:
+            with SessionLocal() as db:
+                crud.event.create_with_overlap_check(db, obj_in=booking(day, next(gaps)))
+        return run
+
+    def create_conflict() -> Callable[[], Any]:
+        reset_events()
+        seed_events(72, 1)
+
+        def run() -> None:
+            with SessionLocal() as db:
+                try:
+                    crud.event.create_with_overlap_check(db, obj_in=booking(base_day, time(12, 0), 60))
+                except ValueError:
+                    pass
+        return run
+
+    def date_range(rows: int) -> Case:
+        def setup() -> Callable[[], Any]:
+            reset_events()
+            seed_events(rows, 365)
+
+            def run() -> None:
+                with SessionLocal() as db:
+                    crud.event.get_events_in_date_range(
+                        db, start_date=base_day + timedelta(days=30), end_date=base_day + timedelta(days=36),
+                        limit=1000,
+                    )
+            return run
+        return setup
+
+    def weekly_occurrences() -> Callable[[], Any]:
+        rule_list = (CachedRule(1, 1, "火曜定休", True), CachedRule(2, 2, "水曜定休", True))
+        rules = BusinessRules(
+            version=1,
+            rules=rule_list,
+            closed=tuple(wd in (1, 2) for wd in range(7)),
+            hours=(None,) * 7,
+        )
+        start = date(2025, 1, 1)
+
+        def run() -> None:
+            list(iter_weekly_occurrences(rules, start_date=start, end_date=start + timedelta(days=3650)))
+        return run
+
+    def sample_events() -> List[CalendarEvent]:
+        return [
+            CalendarEvent(
+                id=i,
+                event_date=datetime(2025, 1, 1, 10),
+                start_time=datetime(2025, 1, 1, 10),
+                end_time=datetime(2025, 1, 1, 11),
+                representative_name=f"予約者 {i}",
+                phone_number="090-0000-0000",
+                num_adults=2,
+                num_children=1,
+                is_holiday=False,
+                version=1,
+                created_at=datetime(2024, 12, 1, 9, 30, 15),
+            )
+            for i in range(1000)
+        ]
+
+    def serialize_baseline() -> Callable[[], Any]:
+        events = sample_events()
+        field = create_response_field(name="response", type_=List[Event])
+        loop = asyncio.new_event_loop()
+
+        def run() -> bytes:
+            content = loop.run_until_complete(
+                serialize_response(field=field, response_content=events, is_coroutine=True)
+            )
+            return JSONResponse(content=content).body
+        return run
+
+    def serialize_fast() -> Callable[[], Any]:
+        events = sample_events()
+        request = Request({"type": "http", "headers": [(b"accept", b"application/json")]})
+        return lambda: event_list_response(request, events).body
+
+    def api_list_events() -> Callable[[], Any]:
+        reset_events()
+        seed_events(10_000, 365)
+        client = TestClient(app)
+        return lambda: client.get("/api/v1/events/", params={"limit": 100})
+
+    def password_hash() -> Callable[[], Any]:
+        return lambda: get_password_hash("benchmark-password")
+
+    def password_hash_pool() -> Callable[[], Any]:
+        # プロセスプール経由（プロセス間の受け渡しを含む）。ワーカーの起動は最初の1回（ウォームアップ）で済ませます。
+        loop = asyncio.new_event_loop()
+        return lambda: loop.run_until_complete(password_hasher.hash("benchmark-password"))
+
+    return {
+        "create_empty_day": create_empty_day,
+        "create_crowded_day": create_crowded_day,
+        "create_conflict_rejected": create_conflict,
+        "date_range_1k": date_range(1_000),
+        "date_range_10k": date_range(10_000),
+        "date_range_50k": date_range(50_000),
+        "weekly_occurrences_10y": weekly_occurrences,
+        "serialize_1000_baseline": serialize_baseline,
+        "serialize_1000_fast": serialize_fast,
+        "api_list_events_100": api_list_events,
+        "password_hash": password_hash,
+        "password_hash_pool": password_hash_pool,
+    }
+
+
+# 1回が重いケースの実行回数の上限
+MAX_REPEAT = {"password_hash": 5, "password_hash_pool": 5, "create_crowded_day": 50}
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    # timeit と同様に、GC による揺れを避けるため計測中は GC を止めます。
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = timer.perf_counter()
+            fn()
+            timings.append((timer.perf_counter() - t0) * 1000)
+    finally:
+        gc.enable()
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "median_ms": round(statistics.median(timings), 4),
+        "min_ms": round(timings[0], 4),
+        "p95_ms": round(timings[max(0, int(len(timings) * 0.95) - 1)], 4),
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    setup_database(strict_queries=args.strict_queries)
+    cases = build_cases()
+
+    # --strict-queries のときは、アプリの読み込み時に SQL の記録が有効になっています。
+    from app.core.config import settings
+    from app.core.query_budget import track_queries
+
+    results: Dict[str, Any] = {}
+    for name, setup in cases.items():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        repeat = min(args.repeat, MAX_REPEAT.get(name, args.repeat))
+        try:
+            fn = setup()
+            if args.strict_queries:
+                with track_queries(
+                    name, n_plus_one_threshold=settings.QUERY_BUDGET_N_PLUS_ONE_THRESHOLD, strict=True
+                ):
+                    fn()
+            results[name] = measure(fn, repeat)
+        except Exception as e:
+            # 1つのケースの失敗で全体を止めず、エラーとして記録します。
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"{name:<28} {'error':>10}    {results[name]['error']}")
+            continue
+        print(f"{name:<28} {results[name]['median_ms']:>10.3f} ms (median of {repeat})")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"\nResults written to {args.output}")
+    if args.strict_queries and any("error" in result for result in results.values()):
+        sys.exit(1)
+
+
+def _median(result: Optional[dict]) -> str:
+    if result is None:
+        return "-"
+    if "error" in result:
+        return "error"
+    return f"{result['median_ms']:.3f}"
+
+
+def compare(args: argparse.Namespace) -> None:
+    baseline = json.loads(Path(args.baseline).read_text())["results"]
+    current = json.loads(Path(args.current).read_text())["results"]
+    regressions: List[str] = []
+    print(f"{'case':<28} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for name in sorted(set(baseline) | set(current)):
+        before: Optional[dict] = baseline.get(name)
+        after: Optional[dict] = current.get(name)
+        if before is None or after is None or "error" in before or "error" in after:
+            print(f"{name:<28} {_median(before):>12} {_median(after):>12} {'n/a':>8}")
+            continue
+        change = after["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        mark = ""
+        if change > args.threshold:
+            regressions.append(name)
+            mark = "  REGRESSION"
+        print(f"{name:<28} {before['median_ms']:>12.3f} {after['median_ms']:>12.3f} {change:>+8.1%}{mark}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}.")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="処理時間のマイクロベンチマークを実行・比較します。")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="ベンチマークを実行して JSON に書き出します")
+    run_parser.add_argument("--output", default="bench_results.json")
+    run_parser.add_argument("--repeat", type=int, default=30, help="各ケースの実行回数")
+    run_parser.add_argument("--only", nargs="*", help="指定した接頭辞で始まるケースだけを実行します")
+    run_parser.add_argument(
+        "--strict-queries", action="store_true", help="クエリ予算・N+1 の違反をエラーにし、1件でもあれば終了コード 1 にします"
+    )
+    compare_parser = sub.add_parser("compare", help="2つの結果を比較し、遅くなったケースを表示します")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.15, help="中央値がこの割合より遅くなったら回帰とみなします"
+    )
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()